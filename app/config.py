@@ -1,8 +1,15 @@
 import os
 from dotenv import load_dotenv
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from .services.metrics import LOG_RECORDS_DROPPED
 
 load_dotenv()
 
@@ -18,17 +25,207 @@ class AppOnlyFilter(logging.Filter):
         )
 
 
+class DebugSamplingFilter(logging.Filter):
+    """Deja pasar 1 de cada `every` mensajes DEBUG por lugar de llamada.
+
+    La primera ocurrencia de cada lugar (archivo, línea) siempre pasa; INFO y
+    superiores no se muestrean. Los contadores viven en un LRU acotado a
+    `max_keys` entradas y se actualizan bajo lock (varios hilos loguean).
+    """
+    def __init__(self, every, max_keys=1024):
+        super().__init__()
+        self.every = max(1, int(every))
+        self.max_keys = max(1, int(max_keys))
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno != logging.DEBUG or self.every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.pop(key, 0)
+            self._counts[key] = count + 1
+            if len(self._counts) > self.max_keys:
+                self._counts.popitem(last=False)
+        return count % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como una línea JSON (incluye campos de `extra`)."""
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler que descarta registros si la cola está llena en vez de bloquear.
+
+    Los descartes se exponen como `finanzas_log_records_dropped_total`.
+    """
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+
+_log_listener = None
+
+
+def _stop_log_listener():
+    """Detiene el writer de logs en segundo plano vaciando la cola pendiente."""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+atexit.register(_stop_log_listener)
+
+
+def _engine_options(uri):
+    """Opciones de `create_engine` según el motor de `SQLALCHEMY_DATABASE_URI`.
+
+    SQLite: `timeout` del driver (espera ante locks); los PRAGMA se aplican al
+    conectar (ver `database.configure_engine`). Postgres/otros: pool de
+    conexiones con pre-ping y reciclaje.
+    """
+    if uri.startswith('sqlite'):
+        return {'connect_args': {'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')) / 1000}}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() not in ('0', 'false', 'no'),
+    }
+
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-change-me')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///finanzas.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+    # Aplicar migraciones pendientes al crear la app (desactivar con varios workers web)
+    DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'true').lower() not in ('0', 'false', 'no')
+    # PRAGMA de SQLite por conexión: WAL permite leer mientras se escribe
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # ms
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # bytes
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))  # negativo = KiB (64 MiB)
+    # Moneda de los montos sin moneda explícita (ISO 4217)
+    DEFAULT_CURRENCY = os.getenv('DEFAULT_CURRENCY', 'CLP').upper()
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+    # Modo webhook (opcional): URL pública de /telegram/webhook y secreto compartido
+    TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL')
+    TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET')
+    # Updates del webhook persistidos por los workers web: lote, lease de reclamo, espera del
+    # bot al consumirlos (se duplica con la tabla vacía hasta _MAX) y retención tras procesarlos
+    TELEGRAM_INBOUND_BATCH = int(os.getenv('TELEGRAM_INBOUND_BATCH', '100'))
+    TELEGRAM_INBOUND_CLAIM_SECONDS = int(os.getenv('TELEGRAM_INBOUND_CLAIM_SECONDS', '120'))
+    TELEGRAM_INBOUND_POLL_INTERVAL = float(os.getenv('TELEGRAM_INBOUND_POLL_INTERVAL', '0.25'))  # seconds
+    TELEGRAM_INBOUND_POLL_MAX = float(os.getenv('TELEGRAM_INBOUND_POLL_MAX', '2'))  # seconds
+    TELEGRAM_INBOUND_RETENTION = int(os.getenv('TELEGRAM_INBOUND_RETENTION', '86400'))  # seconds
+    # URL base de la Bot API (p.ej. app.scripts.fake_telegram en pruebas)
+    TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL')
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     IMAP_HOST = os.getenv('IMAP_HOST')
     IMAP_PORT = int(os.getenv('IMAP_PORT', '993'))
     IMAP_FOLDER = os.getenv('IMAP_FOLDER', 'INBOX')
+    # IMAP sin TLS solo para servidores locales de prueba (app.scripts.fake_imap)
+    IMAP_USE_SSL = os.getenv('IMAP_USE_SSL', 'true').lower() not in ('0', 'false', 'no')
     APP_ENCRYPTION_KEY = os.getenv('APP_ENCRYPTION_KEY')
+    # Contraseñas: costo de bcrypt y pool de procesos para verificar/hashear (0 = en línea)
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+    PASSWORD_WORKERS = int(os.getenv('PASSWORD_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+    PASSWORD_MAX_PENDING = int(os.getenv('PASSWORD_MAX_PENDING', '32'))
+    PASSWORD_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_QUEUE_TIMEOUT', '5'))  # seconds
+    # Segundos que se mantienen en memoria las credenciales IMAP descifradas (0 desactiva)
+    CREDENTIALS_CACHE_TTL = int(os.getenv('CREDENTIALS_CACHE_TTL', '900'))
     POLL_INTERVAL = int(os.getenv('POLL_INTERVAL', '60'))  # seconds
+    # Polling adaptativo por cuenta (ver app.services.scheduler)
+    POLL_MIN_INTERVAL = int(os.getenv('POLL_MIN_INTERVAL', '30'))  # seconds, tras actividad
+    POLL_MAX_INTERVAL = int(os.getenv('POLL_MAX_INTERVAL', '900'))  # seconds, cuentas inactivas
+    POLL_IDLE_FACTOR = float(os.getenv('POLL_IDLE_FACTOR', '1.5'))
+    POLL_TIMEZONE = os.getenv('POLL_TIMEZONE', 'America/Santiago')
+    POLL_NIGHT_HOURS = os.getenv('POLL_NIGHT_HOURS', '0-7')  # rango [inicio, fin) en hora local
+    POLL_NIGHT_INTERVAL = int(os.getenv('POLL_NIGHT_INTERVAL', '1800'))  # seconds
+    POLL_AUTH_MAX_FAILURES = int(os.getenv('POLL_AUTH_MAX_FAILURES', '5'))
+    POLL_AUTH_BACKOFF_MAX = int(os.getenv('POLL_AUTH_BACKOFF_MAX', '21600'))  # seconds
+    # Leases en DB (bot único y reparto de cuentas entre pollers): validez en segundos
+    LEASE_TTL = float(os.getenv('LEASE_TTL', '30'))
+    # Bot de Telegram: updates concurrentes y workers para trabajo bloqueante (DB/LLM)
+    BOT_CONCURRENT_UPDATES = int(os.getenv('BOT_CONCURRENT_UPDATES', '16'))
+    BOT_BLOCKING_WORKERS = int(os.getenv('BOT_BLOCKING_WORKERS', '8'))
+    # Límites de envío de Telegram (mensajes/segundo) y envíos simultáneos
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+    TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+    TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+    TELEGRAM_MAX_CONCURRENT_SENDS = int(os.getenv('TELEGRAM_MAX_CONCURRENT_SENDS', '8'))
+    # Outbox de notificaciones: lote por ciclo, reintentos y agrupación en resumen
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+    OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '15'))  # seconds
+    OUTBOX_CLAIM_SECONDS = int(os.getenv('OUTBOX_CLAIM_SECONDS', '600'))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+    OUTBOX_BACKOFF_BASE = int(os.getenv('OUTBOX_BACKOFF_BASE', '30'))  # seconds
+    OUTBOX_BACKOFF_MAX = int(os.getenv('OUTBOX_BACKOFF_MAX', '3600'))  # seconds
+    NOTIFICATION_DIGEST_THRESHOLD = int(os.getenv('NOTIFICATION_DIGEST_THRESHOLD', '5'))
+    # Tras un aviso del poller, esperar a que la ráfaga se calme antes de reclamar (tope en _MAX)
+    NOTIFICATION_GATHER_SECONDS = float(os.getenv('NOTIFICATION_GATHER_SECONDS', '2'))
+    NOTIFICATION_GATHER_MAX_SECONDS = float(os.getenv('NOTIFICATION_GATHER_MAX_SECONDS', '10'))
+    # Etiquetado rápido (/pendientes): página, lote de commit y sugerencias
+    PENDING_PAGE_SIZE = int(os.getenv('PENDING_PAGE_SIZE', '20'))
+    PENDING_LABEL_BATCH = int(os.getenv('PENDING_LABEL_BATCH', '10'))
+    PENDING_LABEL_FLUSH_SECONDS = float(os.getenv('PENDING_LABEL_FLUSH_SECONDS', '30'))
+    PENDING_SUGGESTIONS = int(os.getenv('PENDING_SUGGESTIONS', '3'))
+    # Máximo de ítems por request en /api/transactions/bulk_update
+    BULK_UPDATE_MAX_ITEMS = int(os.getenv('BULK_UPDATE_MAX_ITEMS', '500'))
+    # Rate limiting: storage compartido entre procesos (memory:// es por proceso).
+    # sqlite:///ratelimit.db (local, sin servicios) o redis://host:6379/0 (requiere `redis`)
+    RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URI', 'memory://')
+    RATELIMIT_STRATEGY = os.getenv('RATELIMIT_STRATEGY', 'moving-window')
+    # /metrics: token Bearer y/o IPs permitidas explícitamente (separadas por coma).
+    # Sin ninguno de los dos el endpoint responde 403: detrás de un proxy local
+    # todos los clientes llegan como 127.0.0.1, así que no se permite localhost por defecto.
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+    # Métricas de `app.worker` (poller, bot, outbox): listener HTTP propio, mismo acceso que /metrics.
+    # Puerto 0 lo desactiva; con varios workers en un host, un puerto distinto por worker
+    WORKER_METRICS_HOST = os.getenv('WORKER_METRICS_HOST', '127.0.0.1')
+    WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', '9101'))
+    # Proxies inversos delante de la app: con N > 0 se confía en N saltos de
+    # X-Forwarded-For/Proto/Host (ProxyFix) para la IP real del cliente
+    PROXY_FIX_HOPS = int(os.getenv('PROXY_FIX_HOPS', '0'))
+    # Profiling opcional (fracción 0-1 de ciclos/requests) y Server-Timing en /api/*
+    PROFILE_POLL_RATE = float(os.getenv('PROFILE_POLL_RATE', '0'))
+    PROFILE_REQUEST_RATE = float(os.getenv('PROFILE_REQUEST_RATE', '0'))
+    PROFILE_FORMAT = os.getenv('PROFILE_FORMAT', 'pstats').lower()  # pstats | speedscope | html
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '50'))
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() not in ('0', 'false', 'no')
+    # Límites del cuerpo de correo extraído para el LLM
+    EMAIL_BODY_MAX_CHARS = int(os.getenv('EMAIL_BODY_MAX_CHARS', '8000'))
+    EMAIL_HTML_MAX_BYTES = int(os.getenv('EMAIL_HTML_MAX_BYTES', '262144'))
     _senders = (os.getenv('BANK_SENDERS') or '').strip().lower()
     ALLOWED_BANK_SENDERS = [s.strip() for s in _senders.split(',') if s.strip()]
 
@@ -47,37 +244,72 @@ class Config:
 
     @staticmethod
     def configure_logging():
-        """Configura el logging global para toda la aplicación."""
-        level_name = os.getenv('LOG_LEVEL', 'DEBUG').upper()
+        """Configura el logging global para toda la aplicación.
+
+        Variables de entorno:
+            LOG_LEVEL: Nivel de logs de la app (default INFO).
+            LOG_FILE: Archivo rotativo de logs (default finanzas_app.log).
+            LOG_FORMAT: `text` (default) o `json` (una línea JSON por registro).
+            LOG_QUEUE: Si es verdadero (default), los handlers de archivo y
+                stdout corren en un hilo writer (`QueueListener`) y los hilos
+                de la app solo encolan el registro.
+            LOG_QUEUE_SIZE: Tamaño máximo de la cola; al llenarse se descartan
+                registros en vez de bloquear (default 10000).
+            LOG_DEBUG_SAMPLE_EVERY: Registrar 1 de cada N mensajes DEBUG por
+                plantilla (default 1, sin muestreo).
+        """
+        global _log_listener
+        level_name = os.getenv('LOG_LEVEL', 'INFO').upper()
         level = getattr(logging, level_name, logging.INFO)
+        use_queue = os.getenv('LOG_QUEUE', 'true').lower() not in ('0', 'false', 'no')
+        sample_every = int(os.getenv('LOG_DEBUG_SAMPLE_EVERY', '1'))
 
         # Configurar el logger raíz
         root_logger = logging.getLogger()
         root_logger.setLevel(logging.DEBUG)  # Capturar todo, filtrado por handlers
 
-        # Evitar duplicados
+        # Evitar duplicados (y detener el writer de una configuración previa)
+        _stop_log_listener()
         if root_logger.handlers:
             root_logger.handlers.clear()
 
-        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+        if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
 
-        # File handler - solo logs de nuestra app
-        file_handler = RotatingFileHandler('finanzas_app.log', maxBytes=1_000_000, backupCount=5)
+        # File handler
+        file_handler = RotatingFileHandler(os.getenv('LOG_FILE', 'finanzas_app.log'),
+                                           maxBytes=1_000_000, backupCount=5)
         file_handler.setFormatter(formatter)
         file_handler.setLevel(level)
-        file_handler.addFilter(AppOnlyFilter())
-        root_logger.addHandler(file_handler)
 
-        # Stream handler (stdout) - solo logs de nuestra app
+        # Stream handler (stdout)
         stream_handler = logging.StreamHandler()
         stream_handler.setFormatter(formatter)
         stream_handler.setLevel(level)
-        stream_handler.addFilter(AppOnlyFilter())
-        root_logger.addHandler(stream_handler)
+
+        if use_queue:
+            # Los filtros corren en el hilo que loguea, antes de encolar
+            queue_handler = DroppingQueueHandler(queue.Queue(int(os.getenv('LOG_QUEUE_SIZE', '10000'))))
+            queue_handler.setLevel(level)
+            queue_handler.addFilter(AppOnlyFilter())
+            queue_handler.addFilter(DebugSamplingFilter(sample_every))
+            root_logger.addHandler(queue_handler)
+            _log_listener = QueueListener(queue_handler.queue, file_handler, stream_handler,
+                                          respect_handler_level=True)
+            _log_listener.start()
+        else:
+            # Solo logs de nuestra app, escritos desde el hilo que loguea
+            for handler in (file_handler, stream_handler):
+                handler.addFilter(AppOnlyFilter())
+                handler.addFilter(DebugSamplingFilter(sample_every))
+                root_logger.addHandler(handler)
 
         # Configurar loggers específicos para nuestros módulos
         app_loggers = [
             '__main__',
+            'app',
             'app.services.email_poller',
             'app.services.telegram_bot',
             'app.services.database',
@@ -103,5 +335,5 @@ class Config:
             logging.getLogger(logger_name).setLevel(logging.ERROR)
 
         logging.getLogger(__name__).info(
-            "Logging configurado - nivel: %s, filtrado solo app", level_name
+            "Logging configurado - nivel: %s, filtrado solo app, cola: %s", level_name, use_queue
         )
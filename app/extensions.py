@@ -0,0 +1,33 @@
+"""Extensiones de Flask compartidas (se inicializan en `app.factory.create_app`)."""
+from flask import jsonify, redirect, request, url_for
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from flask_login import LoginManager
+from flask_wtf.csrf import CSRFProtect
+
+from .services import ratelimit  # noqa: F401  (registra el storage sqlite:// de Flask-Limiter)
+from .services.database import db  # noqa: F401  (re-export)
+
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
+
+csrf = CSRFProtect()
+# Storage y estrategia desde RATELIMIT_STORAGE_URI / RATELIMIT_STRATEGY (ver Config)
+limiter = Limiter(key_func=get_remote_address)
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    from .models import User
+    try:
+        return db.session.get(User, int(user_id))
+    except Exception:
+        return None
+
+
+@login_manager.unauthorized_handler
+def unauthorized():
+    # Responder JSON para endpoints API
+    if request.path.startswith('/api/'):
+        return jsonify({'ok': False, 'error': 'unauthorized'}), 401
+    return redirect(url_for('main.login'))
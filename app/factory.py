@@ -0,0 +1,152 @@
+"""Application factory y arranque de servicios en segundo plano.
+
+`create_app()` solo construye la app web: no importa python-telegram-bot ni
+el poller y no lanza hilos. Los servicios (bot de Telegram y poller de
+correos) se arrancan explícitamente con `start_background_services(app)`, desde
+`python -m app.worker` o `python main.py`.
+"""
+import logging
+import os
+import threading
+
+from flask import Flask, Response, send_from_directory
+from flask_wtf.csrf import generate_csrf
+from sqlalchemy.orm import Session
+
+from . import models  # noqa: F401  (registra las tablas en la metadata)
+from .config import Config
+from .extensions import csrf, db, limiter, login_manager
+from .routes import bp
+from .services import migrations, profiling
+from .services.database import DatabaseManager, configure_engine
+from .services.metrics import OUTBOX_PENDING, instrument_db_commits, instrument_flask
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def create_app(start_services: bool = False, migrate=None):
+    """Crea y configura la aplicación Flask.
+
+    Args:
+        start_services: Si es True, además arranca el bot y el poller en
+            hilos daemon de este proceso (ver `start_background_services`).
+        migrate: Aplicar las migraciones pendientes (`migrations.upgrade`).
+            None usa `DB_AUTO_MIGRATE`; si es False solo se advierte cuando
+            el esquema no está al día.
+
+    Returns:
+        La aplicación Flask.
+    """
+    Config.configure_logging()
+
+    app = Flask(
+        __name__,
+        template_folder=os.path.join(_BASE_DIR, 'templates'),
+        static_folder=os.path.join(_BASE_DIR, 'static'),
+        static_url_path='/static'
+    )
+    app.config.from_object(Config)
+    if Config.PROXY_FIX_HOPS > 0:
+        # IP/esquema reales del cliente (rate limiting, allowlist de /metrics)
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_FIX_HOPS,
+                                x_proto=Config.PROXY_FIX_HOPS, x_host=Config.PROXY_FIX_HOPS)
+
+    # Inicializar extensiones
+    db.init_app(app)
+    configure_engine(app)
+    login_manager.init_app(app)
+
+    # CSRF
+    csrf.init_app(app)
+
+    @app.context_processor
+    def inject_csrf_token():
+        # Permite usar {{ csrf_token() }} en templates
+        return dict(csrf_token=generate_csrf)
+
+    # Métricas: latencia por endpoint y duración de commits
+    instrument_flask(app)
+    instrument_db_commits(Session)
+
+    def _count_pending_outbox():
+        # El gauge se lee también fuera de requests (listener de métricas del worker)
+        with app.app_context():
+            return DatabaseManager.count_pending_notifications()
+
+    OUTBOX_PENDING.set_function(_count_pending_outbox)
+    # Profiling opcional por request y Server-Timing en /api/*
+    profiling.init_app(app, db)
+
+    # Registrar blueprints primero para que existan endpoints
+    app.register_blueprint(bp)
+
+    # Eximir endpoints API de CSRF (llamados via fetch) y el webhook de Telegram
+    # (autenticado por secret token)
+    for endpoint, view in app.view_functions.items():
+        if endpoint.startswith('main.api_') or endpoint == 'main.telegram_webhook':
+            csrf.exempt(view)
+
+    # Rate limiting básico (después de registrar blueprint)
+    limiter.init_app(app)
+    if 'main.login' in app.view_functions:
+        # El decorador retorna una vista nueva: hay que reemplazarla para que aplique
+        app.view_functions['main.login'] = limiter.limit("5/minute;20/hour")(app.view_functions['main.login'])
+
+    @app.route('/favicon.ico')
+    def favicon():
+        """Serve favicon to avoid 404s"""
+        try:
+            return send_from_directory(app.static_folder, 'favicon.ico', mimetype='image/x-icon')
+        except Exception:
+            # Fallback: 204 No Content to avoid log noise if file missing
+            return Response(status=204)
+
+    # Esquema vía Alembic (ver app.services.migrations); create_all no altera tablas existentes
+    if Config.DB_AUTO_MIGRATE if migrate is None else migrate:
+        migrations.upgrade(app)
+    else:
+        migrations.check(app)
+    # Si no hay cuenta, el admin deberá crearla manualmente por ahora.
+
+    if start_services:
+        start_background_services(app)
+
+    logger.info('Aplicación iniciada (services=%s)', start_services)
+    return app
+
+
+def start_background_services(app, bot: bool = True, poller: bool = True):
+    """Arranca el bot de Telegram y/o el poller de correos en hilos daemon.
+
+    Los módulos pesados (python-telegram-bot, IMAP) se importan recién aquí.
+    El bot arranca solo en el proceso que tome el lease `telegram-bot`; el
+    poller se registra en la DB y revisa únicamente su shard de cuentas.
+
+    Args:
+        app: Aplicación Flask creada con `create_app`.
+        bot: Arrancar el bot de Telegram (y el dispatcher de notificaciones).
+        poller: Arrancar el poller de correos.
+
+    Returns:
+        Lista de hilos arrancados.
+    """
+    threads = []
+    if bot:
+        from .services.telegram_bot import build_and_run_bot, stop_bot
+        if Config.TELEGRAM_BOT_TOKEN:
+            # Una sola instancia del bot entre todos los procesos
+            from .services.coordination import BOT_LEASE, start_as_leader
+            threads.append(start_as_leader(app, BOT_LEASE, lambda: build_and_run_bot(app),
+                                           lambda thread: stop_bot(app, thread)))
+        else:
+            build_and_run_bot(app)  # solo registra la advertencia
+    if poller:
+        from .services.email_poller import run_poller
+        t = threading.Thread(target=run_poller, args=(app,), daemon=True, name='email-poller')
+        t.start()
+        threads.append(t)
+    return threads
@@ -1,19 +1,14 @@
 from .services.database import db
+from .services.credentials import CREDENTIALS, get_fernet
+from .services import money, passwords
+from .config import Config
+from dataclasses import dataclass, fields
 from datetime import datetime, timezone
-import os
-import bcrypt
-from cryptography.fernet import Fernet, InvalidToken
 from flask_login import UserMixin
 
-# Utilidad de cifrado simétrico para credenciales sensibles (IMAP password)
-# Generar clave una vez y ponerla en variable de entorno APP_ENCRYPTION_KEY (32 url-safe base64 bytes de Fernet)
-
-def _get_fernet():
-    key = os.getenv('APP_ENCRYPTION_KEY')
-    if not key:
-        # En ausencia de clave se lanza excepción para evitar guardar en claro
-        raise RuntimeError('APP_ENCRYPTION_KEY faltante')
-    return Fernet(key)
+# Cifrado simétrico para credenciales sensibles (IMAP password)
+# Generar clave una vez y ponerla en variable de entorno APP_ENCRYPTION_KEY (32 url-safe base64 bytes de Fernet);
+# admite varias separadas por coma para rotación (ver app.services.credentials)
 
 
 class Account(db.Model):
@@ -30,18 +25,15 @@ class Account(db.Model):
 
     # Métodos helper para set/get seguros
     def set_imap_credentials(self, imap_user: str, imap_password: str):
-        f = _get_fernet()
+        f = get_fernet()
         self.imap_user_encrypted = f.encrypt(imap_user.encode())
         self.imap_password_encrypted = f.encrypt(imap_password.encode())
+        if self.id is not None:
+            CREDENTIALS.invalidate(self.id)
 
     def get_imap_credentials(self):
-        f = _get_fernet()
-        try:
-            user = f.decrypt(self.imap_user_encrypted).decode()
-            pw = f.decrypt(self.imap_password_encrypted).decode()
-            return user, pw
-        except InvalidToken:
-            raise RuntimeError('No se pudo descifrar credenciales (clave incorrecta)')
+        # Descifra una vez y reutiliza desde el caché del proceso mientras no cambien los blobs
+        return CREDENTIALS.get(self)
 
 
 class User(UserMixin, db.Model):
@@ -57,34 +49,154 @@ class User(UserMixin, db.Model):
     transactions = db.relationship('Transaction', backref='user', cascade='all,delete', lazy='dynamic')
 
     def set_password(self, password: str):
-        # bcrypt genera salt incorporado
-        self.password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+        # bcrypt genera salt incorporado; costo según BCRYPT_ROUNDS
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        if not self.password_hash:
-            return False
-        return bcrypt.checkpw(password.encode(), self.password_hash)
+        # Se verifica en el pool de procesos de bcrypt (ver app.services.passwords)
+        return passwords.verify_password(password, self.password_hash)
+
+    def password_needs_rehash(self) -> bool:
+        return passwords.needs_rehash(self.password_hash)
 
 
 class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.DateTime(timezone.utc), default=datetime.now(timezone.utc), index=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount_minor = db.Column(db.BigInteger, nullable=False)  # unidades menores de `currency` (ver app.services.money)
+    currency = db.Column(db.String(3), nullable=False, default=lambda: Config.DEFAULT_CURRENCY, server_default='CLP')
     merchant = db.Column(db.String(255))
     type = db.Column(db.String(50))  # Debito / Credito / Transferencia
     description = db.Column(db.Text)  # User free-text answer
     category = db.Column(db.String(100))
+    labelled_at = db.Column(db.DateTime(timezone.utc))  # categoría confirmada por el usuario en /pendientes
     raw_email_id = db.Column(db.String(255), unique=True)  # UID or message-id to avoid duplicates
     created_at = db.Column(db.DateTime(timezone.utc), default=datetime.now(timezone.utc))
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
 
+    __table_args__ = (
+        db.Index('ix_transaction_user_date', 'user_id', 'date'),
+    )
+
+    @property
+    def amount(self):
+        # Monto en unidades mayores, solo para mostrar; las sumas se hacen sobre amount_minor
+        return money.from_minor(self.amount_minor, self.currency)
+
+    @amount.setter
+    def amount(self, value):
+        # Asignar `currency` antes que `amount`
+        self.amount_minor = money.to_minor(value, self.currency or Config.DEFAULT_CURRENCY)
+
     def to_dict(self):
         return {
             'id': self.id,
             'date': self.date.isoformat(),
             'amount': self.amount,
+            'amount_minor': self.amount_minor,
+            'currency': self.currency,
             'merchant': self.merchant,
             'type': self.type,
             'description': self.description,
             'category': self.category
         }
+
+
+@dataclass(frozen=True, slots=True)
+class TransactionRow:
+    """Fila de solo lectura de `Transaction` para listados.
+
+    Se construye desde un `select()` de columnas, sin pasar por el identity
+    map de la sesión ni crear estado ORM por fila (decenas de bytes en vez de
+    kilobytes). Expone los mismos atributos que usa `Transaction.to_dict`.
+    """
+    id: int
+    date: datetime
+    amount_minor: int
+    currency: str
+    merchant: str | None
+    type: str | None
+    description: str | None
+    category: str | None
+
+    @classmethod
+    def columns(cls):
+        """Columnas de `Transaction` a seleccionar, en el orden de los campos."""
+        return [getattr(Transaction, f.name) for f in fields(cls)]
+
+    amount = Transaction.amount
+    to_dict = Transaction.to_dict
+
+
+class NotificationOutbox(db.Model):
+    """Notificación de Telegram pendiente de envío (patrón outbox).
+
+    Se escribe en la misma transacción de DB que la `Transaction` pendiente,
+    de modo que un reinicio o un fallo de envío no la pierde. El dispatcher
+    del bot la reclama, la envía y la marca como enviada, o la reprograma con
+    backoff exponencial hasta agotar los intentos.
+    """
+    __tablename__ = 'notification_outbox'
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    chat_id = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending / sent / failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime(timezone.utc), nullable=False, default=lambda: datetime.now(timezone.utc))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone.utc), default=lambda: datetime.now(timezone.utc))
+    sent_at = db.Column(db.DateTime(timezone.utc))
+
+    transaction = db.relationship('Transaction')
+
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+
+
+class TelegramMessage(db.Model):
+    """Índice (chat_id, message_id) de Telegram → transacción notificada.
+
+    Se escribe al enviar la notificación de una transacción, para resolver
+    las respuestas (reply) del usuario con una búsqueda por clave primaria.
+    """
+    __tablename__ = 'telegram_messages'
+    chat_id = db.Column(db.String(50), primary_key=True)
+    message_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime(timezone.utc), default=lambda: datetime.now(timezone.utc))
+
+
+class TelegramInboundUpdate(db.Model):
+    """Update de Telegram recibido por webhook.
+
+    Cualquier worker web lo persiste y responde 200 de inmediato; el proceso
+    que tiene el lease `telegram-bot` (en `app.worker`) lo reclama en orden
+    de `update_id` (lease `claimed_until`) y, al terminar los handlers, marca
+    `processed_at`. Si el bot muere a mitad, el lease vence y el update se
+    vuelve a entregar; los ya procesados se saltan. La fila se conserva un
+    tiempo tras procesarse para que la clave primaria descarte reintentos
+    tardíos de Telegram.
+    """
+    __tablename__ = 'telegram_inbound_updates'
+    update_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON del update
+    received_at = db.Column(db.DateTime(timezone.utc), default=lambda: datetime.now(timezone.utc))
+    claimed_until = db.Column(db.DateTime(timezone.utc))
+    processed_at = db.Column(db.DateTime(timezone.utc), index=True)
+
+
+class WorkerLease(db.Model):
+    """Lease con nombre para coordinar procesos a través de la DB.
+
+    Un proceso es dueño del lease mientras lo renueve (heartbeat) antes de
+    `expires_at`; si muere, otro puede tomarlo al vencer. Se usa para elegir
+    una única instancia del bot (`telegram-bot`) y para registrar los
+    pollers vivos (`poller:<worker>`) entre los que se reparten las cuentas.
+    """
+    __tablename__ = 'worker_leases'
+    name = db.Column(db.String(100), primary_key=True)
+    holder = db.Column(db.String(255), nullable=False)
+    expires_at = db.Column(db.DateTime(timezone.utc), nullable=False, index=True)
+    heartbeat_at = db.Column(db.DateTime(timezone.utc), nullable=False)
@@ -1,6 +1,10 @@
-from flask import Blueprint, jsonify, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, current_app, jsonify, render_template, request, redirect, url_for, flash, session
 from flask_login import login_user, logout_user, login_required, current_user
 from .services.database import DatabaseManager
+from .services.passwords import PasswordHasherBusy
+from .services.profiling import timing
+import hmac
+import json
 import logging
 from datetime import datetime, date, time, timedelta, timezone
 from urllib.parse import urlparse, urljoin
@@ -20,16 +24,23 @@ def _is_safe_url(target):
         return False
 
 
+def _render_dashboard():
+    # La moneda por defecto y los decimales por moneda los decide el servidor
+    from .services.money import CURRENCY_EXPONENTS
+    return render_template('dashboard.html', default_currency=current_app.config['DEFAULT_CURRENCY'],
+                           currency_exponents=CURRENCY_EXPONENTS)
+
+
 @bp.route('/')
 @login_required
 def index():
-    return render_template('dashboard.html')
+    return _render_dashboard()
 
 
 @bp.route('/dashboard')
 @login_required
 def dashboard():
-    return render_template('dashboard.html')
+    return _render_dashboard()
 
 
 @bp.route('/login', methods=['GET', 'POST'])
@@ -38,7 +49,20 @@ def login():
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '').strip()
         user = DatabaseManager.get_user_by_username(username)
-        if user and user.check_password(password):
+        try:
+            valid = bool(user and user.check_password(password))
+        except PasswordHasherBusy:
+            logger.warning('⚠️ Login rechazado: cola de verificación de contraseñas llena')
+            flash('Servidor ocupado, intenta nuevamente en unos segundos', 'warning')
+            return render_template('login.html'), 503
+        if valid:
+            if user.password_needs_rehash():
+                # Costo de bcrypt cambiado (BCRYPT_ROUNDS): actualizar el hash de forma transparente
+                try:
+                    DatabaseManager.rehash_user_password(user, password)
+                    logger.info('🔐 Hash de contraseña actualizado para usuario %s', user.id)
+                except PasswordHasherBusy:
+                    pass  # se reintentará en el próximo login
             session.clear()  # previene fijación de sesión
             login_user(user)
             next_url = request.args.get('next')
@@ -133,7 +157,8 @@ def api_transactions():
         limit=2000,
     )
 
-    return jsonify([t.to_dict() for t in txs])
+    with timing('serialize'):
+        return jsonify([t.to_dict() for t in txs])
 
 
 @bp.route('/api/update_transaction', methods=['POST'])
@@ -158,3 +183,104 @@ def api_update_transaction():
         return jsonify({'ok': False, 'error': 'no encontrado'}), 404
 
     return jsonify({'ok': True, 'transaction': tx.to_dict()})
+
+
+@bp.route('/api/transactions/bulk_update', methods=['POST'])
+@login_required
+def api_bulk_update_transactions():
+    """Aplica varias ediciones `{id, description?, category?}` en un solo commit.
+
+    Acepta una lista JSON o `{"changes": [...]}` y responde con el resultado
+    de cada ítem (ver `DatabaseManager.bulk_update_transactions_for_user`).
+    """
+    data = request.get_json(silent=True)
+    changes = data.get('changes') if isinstance(data, dict) else data
+    if not isinstance(changes, list):
+        return jsonify({'ok': False, 'error': 'se espera una lista de cambios'}), 400
+    max_items = current_app.config['BULK_UPDATE_MAX_ITEMS']
+    if len(changes) > max_items:
+        return jsonify({'ok': False, 'error': f'máximo {max_items} cambios por request'}), 413
+
+    results = DatabaseManager.bulk_update_transactions_for_user(current_user.id, changes)
+    updated = sum(1 for r in results if r['ok'])
+    logger.info("Edición masiva de usuario %s: %d/%d aplicadas", current_user.id, updated, len(changes))
+    return jsonify({'ok': True, 'updated': updated, 'results': results})
+
+
+@bp.route('/api/transactions/recategorize', methods=['POST'])
+@login_required
+def api_recategorize_transactions():
+    """Asigna una categoría a todas las transacciones que calzan con los filtros.
+
+    Los filtros van en la query string, igual que en `GET /api/transactions`;
+    la categoría nueva en el cuerpo JSON (`{"category": "..."}`). Con
+    `{"dry_run": true}` solo responde cuántas calzan (`matched`), sin límite
+    de filas, para confirmar antes de aplicar.
+    """
+    data = request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+    dry_run = bool(data.get('dry_run'))
+    new_category = (data.get('category') or '').strip()
+    if not new_category and not dry_run:
+        return jsonify({'ok': False, 'error': 'category requerida'}), 400
+
+    start, end = _parse_date_filters(request.args)
+    ttypes = [t for t in request.args.getlist('type') if t]
+    count = DatabaseManager.recategorize_transactions_for_user(
+        user_id=current_user.id,
+        new_category=new_category,
+        q=(request.args.get('q') or '').strip().lower(),
+        category=(request.args.get('category') or '').strip().lower(),
+        ttypes=ttypes if ttypes else None,
+        start=start,
+        end=end,
+        dry_run=dry_run,
+    )
+    if dry_run:
+        return jsonify({'ok': True, 'matched': count})
+    logger.info("Recategorización de usuario %s: %d transacciones → %s", current_user.id, count, new_category)
+    return jsonify({'ok': True, 'updated': count})
+
+
+@bp.route('/telegram/webhook', methods=['POST'])
+def telegram_webhook():
+    """Recibe updates de Telegram en modo webhook.
+
+    Verifica el header `X-Telegram-Bot-Api-Secret-Token` contra
+    `TELEGRAM_WEBHOOK_SECRET` y persiste el update en
+    `telegram_inbound_updates`. Cualquier worker web puede recibirlo: el bot
+    corre en `app.worker` (lease `telegram-bot`) y consume la tabla.
+    """
+    secret = current_app.config.get('TELEGRAM_WEBHOOK_SECRET')
+    received = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not secret or not hmac.compare_digest(received, secret):
+        return jsonify({'ok': False, 'error': 'forbidden'}), 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('update_id'), int):
+        return jsonify({'ok': False, 'error': 'update inválido'}), 400
+
+    try:
+        if not DatabaseManager.store_inbound_update(data['update_id'], json.dumps(data)):
+            logger.debug('Update de Telegram %s repetido', data['update_id'])
+    except Exception as e:
+        # Telegram reintenta el webhook ante un error
+        logger.error('Error guardando update de Telegram: %s', e)
+        return jsonify({'ok': False, 'error': 'no disponible'}), 503
+    return jsonify({'ok': True})
+
+
+@bp.route('/metrics')
+def metrics():
+    """Expone las métricas en formato de texto de Prometheus.
+
+    Acceso permitido con `Authorization: Bearer <METRICS_TOKEN>` o desde una
+    IP incluida en `METRICS_ALLOWED_IPS` (vacía por defecto: sin token ni IPs
+    configuradas responde 403). Detrás de un proxy, configurar
+    `PROXY_FIX_HOPS` para que `remote_addr` sea la IP real del cliente.
+    """
+    from .services.metrics import CONTENT_TYPE, REGISTRY, is_authorized
+    if not is_authorized(request.headers.get('Authorization', ''), request.remote_addr,
+                         current_app.config.get('METRICS_TOKEN'), current_app.config.get('METRICS_ALLOWED_IPS', [])):
+        return jsonify({'ok': False, 'error': 'forbidden'}), 403
+    return current_app.response_class(REGISTRY.expose(), content_type=CONTENT_TYPE)
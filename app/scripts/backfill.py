@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""Backfill offline de transacciones desde archivos de correo locales.
+
+Procesa correos desde un mbox, un Maildir, un directorio de archivos .eml o
+un .eml individual por el mismo camino que el poller (filtro de remitente y
+asunto, extracción de cuerpo, parseo con el LLM y creación de transacciones
+pendientes), sin IMAP.
+
+Características:
+  - Workers paralelos para el parseo (el LLM domina el tiempo por correo)
+  - Verificación de duplicados e inserción por lotes (un commit por lote)
+  - Notificaciones opcionales (--no-notify para no poblar el outbox)
+  - Checkpoint reanudable: se guarda la posición tras cada lote confirmado
+
+Uso:
+  python -m app.scripts.backfill ~/export/banco.mbox --account 1
+  python -m app.scripts.backfill ~/Maildir --account 1 --workers 8 --no-notify
+  python -m app.scripts.backfill ./correos_eml --account 1 --restart
+"""
+import argparse
+import email
+import json
+import mailbox
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Agregar el directorio padre al path para importar la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.services.database import db, DatabaseManager
+from app.services.email_poller import EmailProcessor
+from app.models import Account
+from app.factory import create_app
+
+
+def iter_source(path):
+    """Itera `(clave, bytes)` de los correos de una fuente local en orden estable.
+
+    Soporta mbox (archivo), Maildir (directorio con `cur/`/`new/`), un
+    directorio con archivos .eml (recursivo) o un único .eml.
+    """
+    p = Path(path)
+    if p.is_dir() and (p / 'cur').is_dir() and (p / 'new').is_dir():
+        box = mailbox.Maildir(str(p), factory=None, create=False)
+        for key in sorted(box.keys()):
+            yield key, box.get_bytes(key)
+    elif p.is_dir():
+        for f in sorted(p.rglob('*.eml')):
+            yield str(f.relative_to(p)), f.read_bytes()
+    elif p.suffix.lower() == '.eml':
+        yield p.name, p.read_bytes()
+    else:
+        box = mailbox.mbox(str(p), factory=None, create=False)
+        for key in box.iterkeys():
+            yield str(key), box.get_bytes(key)
+
+
+def load_checkpoint(path, source):
+    """Lee el checkpoint si corresponde a la misma fuente."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('source') != str(Path(source).resolve()):
+        return None
+    return data
+
+
+def save_checkpoint(path, data):
+    """Escribe el checkpoint de forma atómica."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def backfill(source, account_id, workers=4, batch_size=200, notify=True,
+             checkpoint_path=None, restart=False, update_last_checked=False):
+    """Importa correos de una fuente local como transacciones pendientes.
+
+    Args:
+        source: Ruta al mbox/Maildir/directorio .eml/archivo .eml.
+        account_id: ID de la cuenta a la que pertenecen los correos.
+        workers: Hilos para el parseo (extracción de cuerpo + LLM).
+        batch_size: Correos por lote (verificación de duplicados e inserción).
+        notify: Si se encolan notificaciones de Telegram para lo importado.
+        checkpoint_path: Archivo de checkpoint (default `<fuente>.backfill.json`).
+        restart: Ignorar el checkpoint existente y empezar desde el inicio.
+        update_last_checked: Avanzar `last_checked` de la cuenta a la fecha
+            del correo más reciente importado.
+
+    Returns:
+        Diccionario con estadísticas del proceso.
+    """
+    app = create_app(start_services=False)
+    checkpoint_path = checkpoint_path or f"{Path(source).resolve()}.backfill.json"
+    state = None if restart else load_checkpoint(checkpoint_path, source)
+    state = state or {
+        'source': str(Path(source).resolve()),
+        'account_id': account_id,
+        'position': 0,
+        'stats': {'read': 0, 'candidates': 0, 'duplicates': 0, 'created': 0, 'errors': 0},
+    }
+    stats = state['stats']
+    start_position = state['position']
+    if start_position:
+        print(f"⏩ Reanudando desde el correo {start_position} (checkpoint {checkpoint_path})")
+
+    with app.app_context():
+        account = db.session.get(Account, account_id)
+        if not account:
+            raise SystemExit(f"❌ Cuenta {account_id} no existe")
+        user = DatabaseManager.get_user_for_account(account)
+        if not user:
+            raise SystemExit(f"❌ Cuenta {account_id} sin usuarios")
+        processor = EmailProcessor(account, load_credentials=False)
+        max_date_seen = None
+        t0 = time.perf_counter()
+
+        # Los workers no deben tocar instancias ORM (no tienen app context)
+        def _screen(item):
+            key, raw = item
+            msg = email.message_from_bytes(raw)
+            subject = processor.screen_message(msg)
+            if subject is None:
+                return None
+            return msg, subject, key
+
+        def _parse(candidate):
+            msg, subject, msg_id = candidate
+            try:
+                return processor.parse_message(msg, subject, msg_id)
+            except Exception as e:
+                print(f"  ⚠️  Error parseando {msg_id}: {e}")
+                return None
+
+        messages = iter_source(source)
+        for _ in range(start_position):
+            next(messages, None)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for chunk in _chunks(messages, batch_size):
+                candidates = [
+                    (msg, subject, processor.message_key(msg, key))
+                    for msg, subject, key in filter(None, pool.map(_screen, chunk))
+                ]
+                existing = DatabaseManager.get_existing_email_ids([c[2] for c in candidates])
+                seen, fresh = set(), []
+                for c in candidates:
+                    if c[2] in existing or c[2] in seen:
+                        continue
+                    seen.add(c[2])
+                    fresh.append(c)
+
+                parsed = list(pool.map(_parse, fresh))
+                email_data_list = [d for d in parsed if d]
+                created = DatabaseManager.create_pending_transactions(email_data_list, user, notify=notify)
+                for d in email_data_list:
+                    if d['email_date'] and (max_date_seen is None or d['email_date'] > max_date_seen):
+                        max_date_seen = d['email_date']
+
+                stats['read'] += len(chunk)
+                stats['candidates'] += len(candidates)
+                stats['duplicates'] += len(candidates) - len(fresh)
+                stats['errors'] += len(fresh) - len(email_data_list)
+                stats['created'] += len(created)
+                state['position'] += len(chunk)
+                state['updated_at'] = datetime.now().isoformat(timespec='seconds')
+                save_checkpoint(checkpoint_path, state)
+
+                elapsed = time.perf_counter() - t0
+                rate = (state['position'] - start_position) / elapsed if elapsed else 0
+                print(f"📦 {state['position']} correos | candidatos={stats['candidates']} "
+                      f"duplicados={stats['duplicates']} creadas={stats['created']} "
+                      f"errores={stats['errors']} | {rate:.1f} correos/s")
+
+        if update_last_checked and max_date_seen:
+            DatabaseManager.update_last_checked(account, max_date_seen)
+
+    if notify and stats['created']:
+        print("📲 Notificaciones encoladas en el outbox; el bot las enviará al estar activo.")
+    print(f"🎉 Backfill completo: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa transacciones desde mbox/Maildir/.eml")
+    parser.add_argument("source", help="Ruta a mbox, Maildir, directorio con .eml o archivo .eml")
+    parser.add_argument("--account", "-a", type=int, required=True, help="ID de la cuenta")
+    parser.add_argument("--workers", "-w", type=int, default=4, help="Workers de parseo en paralelo")
+    parser.add_argument("--batch-size", "-b", type=int, default=200, help="Correos por lote")
+    parser.add_argument("--no-notify", action="store_true", help="No encolar notificaciones de Telegram")
+    parser.add_argument("--checkpoint", help="Archivo de checkpoint (default: <fuente>.backfill.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignorar checkpoint y empezar desde cero")
+    parser.add_argument("--update-last-checked", action="store_true",
+                        help="Avanzar last_checked de la cuenta al correo más reciente")
+    args = parser.parse_args()
+
+    backfill(
+        args.source,
+        args.account,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        notify=not args.no_notify,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+        update_last_checked=args.update_last_checked,
+    )
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Benchmark de carga de `GET /api/transactions`.
+
+Ejecuta en proceso (cliente de pruebas de Flask, sesión del usuario ya
+iniciada) las combinaciones de filtros que genera `filters.js`: modo año/mes,
+modo rango, búsqueda libre `q`, categoría y múltiples tipos. Por escenario
+registra percentiles de latencia, filas devueltas por la DB y por la API,
+tamaño de la respuesta y el plan de la consulta (EXPLAIN; en Postgres con
+filas escaneadas reales).
+
+Genera un reporte JSON comparable entre commits:
+  python -m app.scripts.bench_api --user bench --json base.json
+  git checkout otra-rama
+  python -m app.scripts.bench_api --user bench --json nuevo.json --compare base.json
+
+Para poblar la base usar `gen_transactions.py`.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Agregar el directorio raíz al path para importar la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+ALL_TYPES = ['debito', 'credito', 'transferencia']
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano (sin dependencias)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[k]
+
+
+def build_scenarios(latest):
+    """Combinaciones de filtros típicas de la UI, relativas a la última transacción.
+
+    Args:
+        latest: Fecha de la transacción más reciente del usuario.
+
+    Returns:
+        Lista de `(nombre, params)` con params como lista de pares (tipos múltiples).
+    """
+    year, month = latest.year, latest.month
+    end = latest.date()
+    ym_month = [('dateMode', 'ym'), ('year', year), ('month', month)] + [('type', t) for t in ALL_TYPES]
+    ym_year = [('dateMode', 'ym'), ('year', year)] + [('type', t) for t in ALL_TYPES]
+
+    def date_range(days):
+        return [('dateMode', 'range'), ('start', (end - timedelta(days=days)).isoformat()),
+                ('end', end.isoformat())]
+
+    return [
+        ('ym_month_default', ym_month),
+        ('ym_year', ym_year),
+        ('range_30d', date_range(30)),
+        ('range_365d', date_range(365)),
+        ('no_dates', [('dateMode', 'range')]),
+        ('q_month', ym_month + [('q', 'lider')]),
+        ('q_all', [('dateMode', 'range'), ('q', 'uber')]),
+        ('q_nomatch_all', [('dateMode', 'range'), ('q', 'zzz-sin-resultados')]),
+        ('category_year', ym_year + [('category', 'comida')]),
+        ('multitype_year', [('dateMode', 'ym'), ('year', year), ('type', 'debito'), ('type', 'credito')]),
+        ('combo_90d', date_range(90) + [('type', 'credito'), ('category', 'transporte'), ('q', 'uber')]),
+    ]
+
+
+class QueryCapture:
+    """Captura la última consulta SELECT sobre la tabla de transacciones."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.statement = None
+        self.parameters = None
+        self.active = False
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and statement.lstrip().upper().startswith('SELECT') and 'transaction' in statement:
+            self.statement, self.parameters = statement, parameters
+
+
+def explain(engine, statement, parameters):
+    """Plan de ejecución de la consulta capturada.
+
+    Returns:
+        Tupla `(plan, rows_fetched, rows_scanned)`. `rows_scanned` solo se
+        obtiene en Postgres (EXPLAIN ANALYZE); en SQLite es None.
+    """
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute(statement, parameters)
+        rows_fetched = len(cur.fetchall())
+        if engine.dialect.name == 'postgresql':
+            cur.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + statement, parameters)
+            plan = cur.fetchone()[0][0]['Plan']
+            scanned = 0
+            lines = []
+            stack = [(plan, 0)]
+            while stack:
+                node, depth = stack.pop()
+                lines.append(f"{'  ' * depth}{node['Node Type']}"
+                             f"{' on ' + node['Relation Name'] if 'Relation Name' in node else ''}"
+                             f"{' using ' + node['Index Name'] if 'Index Name' in node else ''}"
+                             f" (rows={node.get('Actual Rows')})")
+                if 'Relation Name' in node:
+                    loops = node.get('Actual Loops', 1)
+                    scanned += (node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)) * loops
+                stack.extend((child, depth + 1) for child in reversed(node.get('Plans', [])))
+            return lines, rows_fetched, scanned
+        cur.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [row[-1] for row in cur.fetchall()], rows_fetched, None
+    finally:
+        raw.close()
+
+
+def git_revision():
+    """Commit actual del repositorio (para identificar el reporte)."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(username, iterations, warmup, only=None):
+    """Ejecuta todos los escenarios y retorna el reporte."""
+    from urllib.parse import urlencode
+    from app.services.database import db
+    from app.models import Transaction, User
+    from app.factory import create_app
+
+    app = create_app(start_services=False)
+    client = app.test_client()
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            raise SystemExit(f"❌ Usuario {username} no existe (ver gen_transactions.py)")
+        total = Transaction.query.filter_by(user_id=user.id).count()
+        latest = db.session.query(db.func.max(Transaction.date)).filter_by(user_id=user.id).scalar()
+        if not latest:
+            raise SystemExit(f"❌ {username} no tiene transacciones")
+        if isinstance(latest, str):
+            latest = datetime.fromisoformat(latest)
+        engine = db.engine
+        capture = QueryCapture(engine)
+        user_id = user.id
+
+    # Sesión de Flask-Login sin pasar por /login (evita bcrypt, CSRF y rate limit)
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+    print(f"📊 {username}: {total} transacciones | {engine.dialect.name} | "
+          f"{iterations} iteraciones (+{warmup} warmup)")
+    print(f"{'escenario':<18}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'filas db':>10}{'filas api':>10}{'escan.':>10}{'KB':>9}")
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'dialect': engine.dialect.name,
+            'python': platform.python_version(),
+            'user_rows': total,
+            'iterations': iterations,
+        },
+        'scenarios': {},
+    }
+    for name, params in build_scenarios(latest):
+        if only and name not in only:
+            continue
+        url = '/api/transactions?' + urlencode(params)
+        for _ in range(warmup):
+            client.get(url)
+
+        capture.active = True
+        resp = client.get(url)
+        capture.active = False
+        if resp.status_code != 200:
+            print(f"⚠️  {name}: HTTP {resp.status_code}")
+            continue
+        size = len(resp.data)
+        returned = len(resp.get_json())
+        with app.app_context():
+            plan, fetched, scanned = explain(engine, capture.statement, capture.parameters)
+
+        latencies = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            client.get(url)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+        result = {
+            'url': url,
+            'p50_ms': percentile(latencies, 50),
+            'p90_ms': percentile(latencies, 90),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': max(latencies),
+            'mean_ms': sum(latencies) / len(latencies),
+            'rows_fetched': fetched,
+            'rows_returned': returned,
+            'rows_scanned': scanned,
+            'response_bytes': size,
+            'plan': plan,
+        }
+        report['scenarios'][name] = result
+        print(f"{name:<18}{result['p50_ms']:>9.1f}{result['p90_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+              f"{result['max_ms']:>9.1f}{fetched:>10}{returned:>10}"
+              f"{scanned if scanned is not None else '-':>10}{size / 1024:>9.1f}")
+    return report
+
+
+def compare(current, baseline_path, threshold):
+    """Compara p50/p99 contra un reporte previo. Retorna True si hay regresiones."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n🔍 Comparación vs {baseline_path} (rev {baseline['meta'].get('revision')}, "
+          f"{baseline['meta'].get('user_rows')} filas)")
+    regressions = False
+    for name, cur in current['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if not base:
+            continue
+        deltas, worse = [], False
+        for key in ('p50_ms', 'p99_ms'):
+            delta = (cur[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+            deltas.append(f"{key[:3]} {base[key]:.1f}→{cur[key]:.1f} ms ({delta:+.0f}%)")
+            worse = worse or delta > threshold
+        regressions = regressions or worse
+        mark = '🔴' if worse else '🟢'
+        print(f"  {mark} {name:<18} " + '  '.join(deltas))
+    return regressions
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark de /api/transactions")
+    p.add_argument('--user', default='bench', help='Usuario cuyas transacciones se consultan')
+    p.add_argument('--iterations', '-n', type=int, default=30, help='Requests medidos por escenario')
+    p.add_argument('--warmup', type=int, default=3, help='Requests de calentamiento por escenario')
+    p.add_argument('--scenario', action='append', help='Ejecutar solo estos escenarios (repetible)')
+    p.add_argument('--database-url', help='Base a usar (default: DATABASE_URL)')
+    p.add_argument('--json', help='Guardar el reporte en este archivo')
+    p.add_argument('--compare', help='Reporte JSON previo contra el cual comparar')
+    p.add_argument('--threshold', type=float, default=10.0,
+                   help='Porcentaje de empeoramiento considerado regresión (default 10)')
+    args = p.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    report = run(args.user, args.iterations, args.warmup, args.scenario)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\n💾 Reporte guardado en {args.json}")
+    if args.compare and compare(report, args.compare, args.threshold):
+        print("❌ Regresiones por sobre el umbral")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
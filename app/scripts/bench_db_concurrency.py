@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Benchmark de lecturas y escrituras concurrentes sobre la base de la app.
+
+Simula la carga mixta de un proceso real: hilos escritores que crean
+transacciones pendientes (como el poller) y las etiquetan (como el bot),
+y hilos lectores que listan transacciones (como `/api/transactions`), todos
+con `DatabaseManager` sobre una base SQLite temporal.
+
+Con `--mode compare` (default) ejecuta dos subprocesos, uno con los ajustes
+por defecto de SQLite (journal DELETE, synchronous FULL, sin mmap) y otro
+con los PRAGMA de `Config` (WAL, synchronous NORMAL, mmap, cache), y reporta
+throughput, p99 y errores "database is locked" de cada uno.
+
+Uso:
+  python -m app.scripts.bench_db_concurrency
+  python -m app.scripts.bench_db_concurrency --writers 4 --readers 8 --duration 20
+  python -m app.scripts.bench_db_concurrency --mode tuned --database-url postgresql://localhost/finanzas_bench
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+# Agregar el directorio raíz al path para importar la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+# PRAGMA por defecto de SQLite, para medir el "antes"
+BASELINE_ENV = {
+    'SQLITE_JOURNAL_MODE': 'DELETE',
+    'SQLITE_SYNCHRONOUS': 'FULL',
+    'SQLITE_MMAP_SIZE': '0',
+    'SQLITE_CACHE_SIZE': '-2000',
+}
+
+
+def run(args):
+    """Ejecuta la carga mixta en este proceso y retorna las estadísticas."""
+    from app.factory import create_app
+    from app.models import User
+    from app.scripts.bench_api import percentile
+    from app.scripts.gen_transactions import generate, get_or_create_user
+    from app.services.database import DatabaseManager, db
+
+    generate('bench-db', args.rows)
+    app = create_app()
+    with app.app_context():
+        user_id = get_or_create_user('bench-db').id
+        pragmas = {}
+        if db.engine.dialect.name == 'sqlite':
+            for name in ('journal_mode', 'synchronous', 'mmap_size', 'cache_size'):
+                pragmas[name] = db.session.execute(db.text(f'PRAGMA {name}')).scalar()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {'writes': [], 'reads': [], 'locked': 0, 'errors': 0}
+    seq = iter(range(10 ** 9))
+
+    def _record(kind, elapsed):
+        with lock:
+            stats[kind].append(elapsed)
+
+    def _failed(e):
+        with lock:
+            if 'locked' in str(e):
+                stats['locked'] += 1
+            else:
+                stats['errors'] += 1
+
+    def _writer(n):
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            while not stop.is_set():
+                i = next(seq)
+                t0 = time.perf_counter()
+                try:
+                    tx = DatabaseManager.create_pending_transaction({
+                        'date': datetime.now(timezone.utc), 'amount': 1000 + i, 'merchant': f'BENCH {n}',
+                        'type': 'debito', 'suggested_category': 'otros',
+                        'email_id': f'<bench-db-{os.getpid()}-{i}@bench>',
+                    }, user, notify=False)
+                    DatabaseManager.update_transaction_for_user(user_id, tx.id, description='bench')
+                    _record('writes', time.perf_counter() - t0)
+                except Exception as e:
+                    db.session.rollback()
+                    _failed(e)
+
+    def _reader():
+        with app.app_context():
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                try:
+                    DatabaseManager.get_transactions_for_user(user_id, limit=args.read_limit)
+                    _record('reads', time.perf_counter() - t0)
+                except Exception as e:
+                    db.session.rollback()
+                    _failed(e)
+                finally:
+                    db.session.remove()
+
+    threads = [threading.Thread(target=_writer, args=(n,)) for n in range(args.writers)]
+    threads += [threading.Thread(target=_reader) for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    ms = lambda v: round(v * 1000, 1)
+    return {
+        'pragmas': pragmas,
+        'writes_per_s': round(len(stats['writes']) / args.duration, 1),
+        'write_p50_ms': ms(percentile(stats['writes'], 50)),
+        'write_p99_ms': ms(percentile(stats['writes'], 99)),
+        'reads_per_s': round(len(stats['reads']) / args.duration, 1),
+        'read_p50_ms': ms(percentile(stats['reads'], 50)),
+        'read_p99_ms': ms(percentile(stats['reads'], 99)),
+        'locked_errors': stats['locked'],
+        'other_errors': stats['errors'],
+    }
+
+
+def temp_sqlite_url():
+    return f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_db_'), 'bench.db')}"
+
+
+def run_subprocess(mode, args):
+    """Ejecuta un modo en un proceso aparte (Config se lee al importar) sobre una base nueva."""
+    env = dict(os.environ)
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    if mode == 'baseline':
+        env.update(BASELINE_ENV)
+    cmd = [sys.executable, '-m', 'app.scripts.bench_db_concurrency', '--mode', mode, '--emit-json',
+           '--database-url', temp_sqlite_url(),
+           '--writers', str(args.writers), '--readers', str(args.readers), '--duration', str(args.duration),
+           '--rows', str(args.rows), '--read-limit', str(args.read_limit)]
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    out = subprocess.run(cmd, env=env, cwd=root, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def print_result(mode, r):
+    print(f"   {mode:<9} {r['writes_per_s']:>8} esc/s  p99 {r['write_p99_ms']:>7} ms | "
+          f"{r['reads_per_s']:>8} lect/s  p99 {r['read_p99_ms']:>7} ms | "
+          f"locked {r['locked_errors']} | otros {r['other_errors']} | {r['pragmas']}")
+
+
+def main():
+    p = argparse.ArgumentParser(description='Benchmark de lecturas/escrituras concurrentes (SQLite/Postgres)')
+    p.add_argument('--mode', choices=('compare', 'baseline', 'tuned'), default='compare',
+                   help='compare: ajustes por defecto vs Config (default); baseline/tuned: solo uno')
+    p.add_argument('--writers', type=int, default=2, help='Hilos escritores (default 2)')
+    p.add_argument('--readers', type=int, default=4, help='Hilos lectores (default 4)')
+    p.add_argument('--duration', type=float, default=10.0, help='Segundos de carga (default 10)')
+    p.add_argument('--rows', type=int, default=20000, help='Transacciones iniciales (default 20000)')
+    p.add_argument('--read-limit', type=int, default=200, help='Filas por lectura (default 200)')
+    p.add_argument('--database-url', help='Base a usar en modo baseline/tuned (default: SQLite temporal)')
+    p.add_argument('--json', help='Guardar el reporte en este archivo JSON')
+    p.add_argument('--emit-json', action='store_true', help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.mode == 'compare':
+        print(f"🗄️ {args.writers} escritores + {args.readers} lectores | {args.rows} filas | {args.duration:.0f}s")
+        report = {mode: run_subprocess(mode, args) for mode in ('baseline', 'tuned')}
+        for mode, r in report.items():
+            print_result(mode, r)
+    else:
+        # Config se lee al importar `app`: el entorno debe quedar listo antes de `run`
+        os.environ['DATABASE_URL'] = args.database_url or temp_sqlite_url()
+        if not os.getenv('APP_ENCRYPTION_KEY'):
+            from cryptography.fernet import Fernet
+            os.environ['APP_ENCRYPTION_KEY'] = Fernet.generate_key().decode()
+        if args.mode == 'baseline':
+            for k, v in BASELINE_ENV.items():
+                os.environ.setdefault(k, v)
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        report = {args.mode: run(args)}
+        if args.emit_json:
+            print(json.dumps(report[args.mode]))
+            return
+        print_result(args.mode, report[args.mode])
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Reporte guardado en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
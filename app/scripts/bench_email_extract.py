@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Microbenchmark de extracción de cuerpo de correos bancarios.
+
+Compara `extract_text_from_message` (tokenizador liviano de etiquetas)
+contra la implementación anterior basada en BeautifulSoup (si está
+instalada) sobre un corpus de correos sintéticos del Banco de Chile, o sobre
+un directorio de archivos .eml reales.
+
+Uso:
+  python -m app.scripts.bench_email_extract
+  python -m app.scripts.bench_email_extract --count 500 --repeat 5
+  python -m app.scripts.bench_email_extract --eml-dir ./muestras
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from email import message_from_bytes, policy
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.services.email_poller import extract_text_from_message
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:  # bs4 es opcional: solo se usa como línea base
+    BeautifulSoup = None
+
+
+SUBJECTS = ["Cargo en Cuenta", "Compra con Tarjeta de Crédito", "Transferencia a Terceros"]
+MERCHANTS = ["LIDER EXPRESS", "UBER TRIP", "COPEC", "FARMACIAS AHUMADA", "JUMBO", "STARBUCKS", "ENEL", "SANTA ISABEL"]
+
+_STYLE = "\n".join(
+    f".c{i} {{ font-family: Arial, sans-serif; font-size: {10 + i % 6}px; color: #{i * 97 % 0xffffff:06x}; }}"
+    for i in range(120)
+)
+
+
+def _bank_html(subject, merchant, amount, when, rng):
+    """Genera un HTML con la estructura típica de los correos del banco."""
+    filler_rows = "".join(
+        f'<tr><td class="c{i}" style="padding:4px;border:0"><img src="https://example.invalid/s{i}.png" width="1" height="1"></td>'
+        f'<td class="c{i}">&nbsp;</td></tr>'
+        for i in range(rng.randint(40, 90))
+    )
+    legal = " ".join(["Banco de Chile nunca te solicitará tus claves por correo electrónico."] * rng.randint(5, 15))
+    return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>{subject}</title>
+<style>{_STYLE}</style><script>var x = {rng.randint(0, 10**6)};</script></head>
+<body style="margin:0;padding:0">
+<table width="600" cellpadding="0" cellspacing="0" align="center">{filler_rows}
+<tr><td class="c1"><h1>{subject}</h1></td></tr>
+<tr><td class="c2">Estimado(a) cliente:</td></tr>
+<tr><td class="c3">Te informamos que se ha realizado una operación con tu cuenta por <b>${amount:,.0f}</b>
+en <b>{merchant}</b> el {when.strftime('%d/%m/%Y %H:%M')}.</td></tr>
+<tr><td class="c4">Cuenta: ****{rng.randint(1000, 9999)}</td></tr>
+{filler_rows}
+<tr><td class="c5"><small>{legal}</small></td></tr>
+</table></body></html>"""
+
+
+def build_corpus(count, seed=42):
+    """Genera `count` correos sintéticos (bytes RFC822) del Banco de Chile.
+
+    Aproximadamente el 70% son solo HTML y el resto multipart/alternative con
+    parte de texto plano.
+    """
+    rng = random.Random(seed)
+    base = datetime(2025, 8, 1, tzinfo=timezone.utc)
+    corpus = []
+    for i in range(count):
+        subject = rng.choice(SUBJECTS)
+        merchant = rng.choice(MERCHANTS)
+        amount = rng.randint(500, 250_000)
+        when = base + timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+        html = _bank_html(subject, merchant, amount, when, rng)
+        if rng.random() < 0.7:
+            msg = MIMEText(html, 'html', 'utf-8')
+        else:
+            msg = MIMEMultipart('alternative')
+            plain = f"{subject}\nMonto: ${amount:,.0f}\nComercio: {merchant}\nFecha: {when:%d/%m/%Y %H:%M}\n"
+            msg.attach(MIMEText(plain, 'plain', 'utf-8'))
+            msg.attach(MIMEText(html, 'html', 'utf-8'))
+        msg['Subject'] = subject
+        msg['From'] = 'enviodigital@bancochile.cl'
+        msg['Date'] = format_datetime(when)
+        msg['Message-ID'] = f"<bench-{seed}-{i}@bancochile.cl>"
+        corpus.append(msg.as_bytes())
+    return corpus
+
+
+def load_eml_dir(path):
+    """Carga todos los .eml de un directorio."""
+    return [p.read_bytes() for p in sorted(Path(path).glob('*.eml'))]
+
+
+def legacy_extract(msg):
+    """Implementación anterior: decodifica todas las partes y usa BeautifulSoup."""
+    text_content = None
+    html_content = None
+    for part in msg.walk():
+        content_type = part.get_content_type()
+        content_disposition = str(part.get("Content-Disposition"))
+        if content_type == "text/plain" and "attachment" not in content_disposition:
+            text_content = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
+        elif content_type == "text/html" and "attachment" not in content_disposition:
+            html_content = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
+    if not text_content and html_content:
+        soup = BeautifulSoup(html_content, "html.parser")
+        text_content = soup.get_text(separator="\n", strip=True)
+    return text_content
+
+
+def bench(name, func, messages, repeat):
+    """Ejecuta `func` sobre todos los mensajes `repeat` veces y reporta tiempos."""
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for msg in messages:
+            func(msg)
+        runs.append(time.perf_counter() - t0)
+    best = min(runs)
+    per_msg_us = best / len(messages) * 1e6
+    print(f"{name:<28} mejor={best * 1000:8.1f} ms  mediana={statistics.median(runs) * 1000:8.1f} ms  "
+          f"{per_msg_us:8.1f} µs/correo  {len(messages) / best:8.0f} correos/s")
+    return best
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark de extracción de cuerpo de correos")
+    p.add_argument('--count', type=int, default=300, help='Correos sintéticos a generar')
+    p.add_argument('--repeat', type=int, default=5, help='Repeticiones por implementación')
+    p.add_argument('--eml-dir', help='Directorio con archivos .eml reales (reemplaza el corpus sintético)')
+    p.add_argument('--max-chars', type=int, default=8000, help='Límite de caracteres del extractor nuevo')
+    args = p.parse_args()
+
+    raw = load_eml_dir(args.eml_dir) if args.eml_dir else build_corpus(args.count)
+    if not raw:
+        print("⚠️  Corpus vacío.")
+        return
+    messages = [message_from_bytes(r, policy=policy.compat32) for r in raw]
+    avg_kb = sum(len(r) for r in raw) / len(raw) / 1024
+    print(f"📬 Corpus: {len(messages)} correos (promedio {avg_kb:.1f} KB)")
+
+    new = bench('tokenizador (streaming)', lambda m: extract_text_from_message(m, args.max_chars), messages, args.repeat)
+    if BeautifulSoup is None:
+        print("ℹ️  BeautifulSoup no instalado: se omite la línea base.")
+        return
+    old = bench('BeautifulSoup (anterior)', legacy_extract, messages, args.repeat)
+    print(f"🚀 Speedup: {old / new:.2f}x")
+
+    # Verificar que el texto útil para el LLM coincide
+    mismatches = 0
+    for m in messages:
+        a = extract_text_from_message(m, args.max_chars) or ''
+        b = (legacy_extract(m) or '')[:args.max_chars]
+        if ' '.join(a.split()) != ' '.join(b.split()):
+            mismatches += 1
+    print(f"🔎 Diferencias de contenido vs anterior: {mismatches}/{len(messages)}")
+
+
+if __name__ == '__main__':
+    main()
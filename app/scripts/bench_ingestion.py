@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""Benchmark end-to-end de ingesta de correos (`poll_once`).
+
+Levanta en proceso un servidor IMAP falso con correos sintéticos del Banco de
+Chile, un endpoint compatible con OpenAI con latencia configurable y una Bot
+API de Telegram falsa, y ejecuta `poll_once` contra ellos. Reporta:
+
+  - correos/s por ronda
+  - p50/p99 de latencia por etapa (búsqueda y descarga IMAP, extracción,
+    verificación de duplicados, LLM, inserción en DB, notificación)
+  - escrituras a la DB (INSERT/UPDATE/DELETE) y commits por correo
+  - tiempo hasta entregar todas las notificaciones por Telegram
+
+La primera ronda procesa correos nuevos; las siguientes repiten el polling y
+miden el camino de duplicados (lo habitual en producción).
+
+Usa una base de datos dedicada (por defecto un SQLite temporal). No apuntar
+a la base real: el benchmark crea cuentas, usuarios y transacciones.
+
+Uso:
+  python -m app.scripts.bench_ingestion
+  python -m app.scripts.bench_ingestion --emails 500 --llm-latency 0.3 --rounds 3
+  python -m app.scripts.bench_ingestion --accounts 4 --no-telegram --json resultado.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from email.mime.text import MIMEText
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+# Agregar el directorio raíz al path para importar la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.scripts.fake_imap import FakeIMAP
+from app.scripts.fake_llm import FakeLLM
+from app.scripts.fake_telegram import FakeTelegram
+
+
+class StageTimer:
+    """Acumula duraciones por etapa desde varios hilos."""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def measure(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def wrap(self, stage, func):
+        """Retorna `func` envuelta para registrar su duración en `stage`."""
+        def timed(*args, **kwargs):
+            with self.measure(stage):
+                return func(*args, **kwargs)
+        timed.__wrapped__ = func
+        return timed
+
+    def reset(self):
+        with self._lock:
+            self.samples = {}
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano (sin dependencias)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[k]
+
+
+def build_noise(count, seed=7):
+    """Correos que no son del banco (newsletters), que la búsqueda IMAP debe descartar."""
+    base = datetime(2025, 8, 1, tzinfo=timezone.utc)
+    corpus = []
+    for i in range(count):
+        msg = MIMEText(f"<html><body><h1>Ofertas #{i}</h1><p>Hasta 50% de descuento</p></body></html>",
+                       'html', 'utf-8')
+        msg['Subject'] = f"Ofertas de la semana #{i}"
+        msg['From'] = 'novedades@tienda.example'
+        msg['Date'] = format_datetime(base + timedelta(hours=(i * 7 + seed) % (24 * 90)))
+        msg['Message-ID'] = f"<noise-{i}@tienda.example>"
+        corpus.append(msg.as_bytes())
+    return corpus
+
+
+def configure_environment(args, imap, llm):
+    """Apunta la app a los servicios falsos. Debe llamarse antes de importar `app`."""
+    db_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_ingestion_'), 'bench.db')}"
+    os.environ['DATABASE_URL'] = db_url
+    os.environ['IMAP_USE_SSL'] = 'false'
+    os.environ['IMAP_PORT'] = str(imap.port)
+    os.environ['OPENAI_BASE_URL'] = llm.base_url
+    os.environ['OPENAI_API_KEY'] = 'sk-fake'
+    os.environ.setdefault('BANK_SENDERS', 'bancochile.cl')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if not os.getenv('APP_ENCRYPTION_KEY'):
+        from cryptography.fernet import Fernet
+        os.environ['APP_ENCRYPTION_KEY'] = Fernet.generate_key().decode()
+    return db_url
+
+
+def instrument(timer):
+    """Envuelve las etapas del pipeline de ingesta con medición de tiempo."""
+    import imaplib
+    from app.services import email_poller, telegram_bot
+    from app.services.database import DatabaseManager
+
+    imaplib.IMAP4.search = timer.wrap('imap_search', imaplib.IMAP4.search)
+    imaplib.IMAP4.fetch = timer.wrap('imap_fetch', imaplib.IMAP4.fetch)
+    email_poller.EmailProcessor.extract_text_from_email = timer.wrap(
+        'extract', email_poller.EmailProcessor.extract_text_from_email)
+    email_poller.parse_email = timer.wrap('llm', email_poller.parse_email)
+    telegram_bot.notify_new_transaction = timer.wrap('notify', telegram_bot.notify_new_transaction)
+    email_poller.EmailProcessor._process_single_email = timer.wrap(
+        'email_total', email_poller.EmailProcessor._process_single_email)
+    for name, stage in (('is_duplicate_transaction', 'dedupe'),
+                        ('create_pending_transaction', 'db_insert'),
+                        ('update_last_checked', 'db_last_checked')):
+        setattr(DatabaseManager, name, staticmethod(timer.wrap(stage, getattr(DatabaseManager, name))))
+
+
+class WriteCounter:
+    """Cuenta sentencias de escritura y commits emitidos por el engine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.writes = 0
+        self.commits = 0
+        self.statements = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+        event.listen(engine, 'commit', self._on_commit)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        if statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            self.writes += 1
+
+    def _on_commit(self, conn):
+        self.commits += 1
+
+    def snapshot(self):
+        return self.writes, self.commits, self.statements
+
+
+def seed(app, imap, args):
+    """Crea cuentas y usuarios del benchmark y llena sus buzones."""
+    from app.services.database import db
+    from app.models import Account, User
+    from app.scripts.bench_email_extract import build_corpus
+
+    with app.app_context():
+        if Account.query.count():
+            raise SystemExit("❌ La base ya tiene cuentas; usa una base dedicada (o omite --database-url)")
+        for i in range(args.accounts):
+            imap_user = f"banco{i}@bench.test"
+            account = Account(imap_host=imap.host)
+            account.set_imap_credentials(imap_user, 'bench')
+            db.session.add(account)
+            db.session.flush()
+            user = User(username=f"bench{i}", account_id=account.id, chat_id=str(900000 + i))
+            user.set_password('bench')
+            db.session.add(user)
+            mails = build_corpus(args.emails, seed=i)
+            mails += build_noise(int(args.emails * args.noise), seed=i)
+            imap.add_messages(imap_user, mails)
+        db.session.commit()
+
+
+def wait_for_outbox(app, timeout):
+    """Espera a que el outbox quede vacío. Retorna segundos o None si expira."""
+    from app.services.database import DatabaseManager
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        with app.app_context():
+            if DatabaseManager.count_pending_notifications() == 0:
+                return time.perf_counter() - t0
+        time.sleep(0.05)
+    return None
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark end-to-end de ingesta de correos")
+    p.add_argument('--accounts', type=int, default=1, help='Cuentas (buzones) a simular')
+    p.add_argument('--emails', type=int, default=200, help='Correos del banco por cuenta')
+    p.add_argument('--noise', type=float, default=0.2, help='Correos no bancarios (fracción de --emails)')
+    p.add_argument('--rounds', type=int, default=2, help='Ejecuciones de poll_once (la 2a+ mide duplicados)')
+    p.add_argument('--llm-latency', type=float, default=0.05, help='Latencia del LLM falso (s)')
+    p.add_argument('--llm-jitter', type=float, default=0.2, help='Variación de latencia del LLM (fracción)')
+    p.add_argument('--imap-latency', type=float, default=0.0, help='Latencia por comando IMAP (s)')
+    p.add_argument('--telegram-latency', type=float, default=0.02, help='Latencia de la Bot API falsa (s)')
+    p.add_argument('--drain-timeout', type=float, default=30, help='Espera máxima por el outbox (s)')
+    p.add_argument('--no-telegram', action='store_true', help='No levantar el bot ni medir entregas')
+    p.add_argument('--database-url', help='Base dedicada (default: SQLite temporal)')
+    p.add_argument('--json', help='Guardar resultados en este archivo JSON')
+    args = p.parse_args()
+
+    imap = FakeIMAP(latency=args.imap_latency).start()
+    llm = FakeLLM(latency=args.llm_latency, jitter=args.llm_jitter, seed=1).start()
+    db_url = configure_environment(args, imap, llm)
+
+    from app.config import Config
+    from app.services.database import db
+    from app.services.email_poller import poll_once
+    from app.services.telegram_bot import build_and_run_bot
+    from app.factory import create_app
+
+    app = create_app(start_services=False)
+    seed(app, imap, args)
+
+    telegram = None
+    if not args.no_telegram:
+        telegram = FakeTelegram(latency=args.telegram_latency).start()
+        Config.TELEGRAM_BOT_TOKEN = '123456:bench'
+        Config.TELEGRAM_API_BASE_URL = telegram.base_url
+        Config.TELEGRAM_WEBHOOK_URL = None
+        build_and_run_bot(app)
+
+    timer = StageTimer()
+    instrument(timer)
+    with app.app_context():
+        writes = WriteCounter(db.engine)
+
+    print(f"📬 {args.accounts} cuenta(s) × {args.emails} correos (+{args.noise:.0%} ruido) | "
+          f"LLM {args.llm_latency * 1000:.0f} ms | DB {db_url}")
+    results = []
+    for rnd in range(1, args.rounds + 1):
+        timer.reset()
+        w0, c0, s0 = writes.snapshot()
+        t0 = time.perf_counter()
+        created = poll_once(app)
+        elapsed = time.perf_counter() - t0
+        w1, c1, s1 = writes.snapshot()
+        delivered = wait_for_outbox(app, timeout=args.drain_timeout) if telegram else None
+
+        emails = len(timer.samples.get('email_total', []))
+        stages = {
+            stage: {
+                'count': len(values),
+                'p50_ms': percentile(values, 50) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+                'total_s': sum(values),
+            }
+            for stage, values in sorted(timer.samples.items())
+        }
+        result = {
+            'round': rnd,
+            'emails': emails,
+            'created': len(created),
+            'elapsed_s': elapsed,
+            'emails_per_s': emails / elapsed if elapsed else 0.0,
+            'db_writes_per_email': (w1 - w0) / emails if emails else 0.0,
+            'db_commits_per_email': (c1 - c0) / emails if emails else 0.0,
+            'db_statements_per_email': (s1 - s0) / emails if emails else 0.0,
+            'notifications_drain_s': delivered,
+            'stages': stages,
+        }
+        results.append(result)
+
+        print(f"\n🔁 Ronda {rnd}: {emails} correos, {len(created)} transacciones en {elapsed:.2f}s "
+              f"→ {result['emails_per_s']:.1f} correos/s")
+        print(f"   DB por correo: {result['db_writes_per_email']:.2f} escrituras, "
+              f"{result['db_commits_per_email']:.2f} commits, {result['db_statements_per_email']:.2f} sentencias")
+        if telegram:
+            drain = f"{delivered:.2f}s" if delivered is not None else "timeout"
+            print(f"   Telegram: outbox vacío tras {drain} ({len(telegram.messages)} mensajes enviados en total)")
+        print(f"   {'etapa':<16}{'n':>7}{'p50 ms':>10}{'p99 ms':>10}{'total s':>10}")
+        for stage, s in stages.items():
+            print(f"   {stage:<16}{s['count']:>7}{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['total_s']:>10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'rounds': results}, f, indent=2)
+        print(f"\n💾 Resultados guardados en {args.json}")
+
+    imap.stop()
+    llm.stop()
+    if telegram:
+        telegram.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Benchmark de logins concurrentes y su efecto sobre `GET /api/transactions`.
+
+Levanta la app en un servidor HTTP local con hilos (rate limiting
+desactivado) sobre una base SQLite temporal y mide dos fases:
+
+  1. Base: lectores concurrentes de `/api/transactions`.
+  2. Ráfaga: los mismos lectores más clientes haciendo login en bucle.
+
+Reporta p50/p99 de login (POST), logins/s, rechazos 503 por cola llena y
+la latencia de la API en ambas fases. Comparar la verificación en línea
+con el pool de procesos:
+
+  python -m app.scripts.bench_login --password-workers 0
+  python -m app.scripts.bench_login --password-workers 2 --rounds 12
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+# Agregar el directorio raíz al path para importar la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+PASSWORD = 'bench-pass'
+_CSRF_RE = re.compile(r'name="csrf_token" value="([^"]+)"')
+
+
+def configure_environment(args):
+    """Base temporal y parámetros de bcrypt. Debe llamarse antes de importar `app`."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_login_'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['BCRYPT_ROUNDS'] = str(args.rounds)
+    os.environ['PASSWORD_WORKERS'] = str(args.password_workers)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if not os.getenv('APP_ENCRYPTION_KEY'):
+        from cryptography.fernet import Fernet
+        os.environ['APP_ENCRYPTION_KEY'] = Fernet.generate_key().decode()
+
+
+def login(http, base_url, username):
+    """Hace login por el formulario (con CSRF). Retorna `(status, segundos del POST)`."""
+    page = http.get(f'{base_url}/login')
+    token = _CSRF_RE.search(page.text).group(1)
+    t0 = time.perf_counter()
+    resp = http.post(f'{base_url}/login', data={'username': username, 'password': PASSWORD,
+                                                 'csrf_token': token}, allow_redirects=False)
+    return resp.status_code, time.perf_counter() - t0
+
+
+def run_phase(base_url, readers, loggers, duration, api_params):
+    """Ejecuta lectores de la API y (opcionalmente) clientes de login durante `duration` segundos."""
+    import requests
+
+    stop = threading.Event()
+    api_latencies, login_latencies, login_status = [], [], {}
+    lock = threading.Lock()
+
+    def _reader():
+        http = requests.Session()
+        login(http, base_url, 'bench-api')
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            resp = http.get(f'{base_url}/api/transactions', params=api_params)
+            elapsed = time.perf_counter() - t0
+            resp.raise_for_status()
+            with lock:
+                api_latencies.append(elapsed)
+
+    def _logger(i):
+        while not stop.is_set():
+            status, elapsed = login(requests.Session(), base_url, f'bench-login-{i}')
+            with lock:
+                login_status[status] = login_status.get(status, 0) + 1
+                if status == 302:
+                    login_latencies.append(elapsed)
+
+    threads = [threading.Thread(target=_reader) for _ in range(readers)]
+    threads += [threading.Thread(target=_logger, args=(i,)) for i in range(loggers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return api_latencies, login_latencies, login_status
+
+
+def main():
+    p = argparse.ArgumentParser(description='Benchmark de login (bcrypt) y latencia de la API en paralelo')
+    p.add_argument('--rounds', type=int, default=12, help='BCRYPT_ROUNDS (default 12)')
+    p.add_argument('--password-workers', type=int, default=2,
+                   help='PASSWORD_WORKERS: procesos de bcrypt, 0 = en el hilo del request (default 2)')
+    p.add_argument('--readers', type=int, default=4, help='Lectores concurrentes de /api/transactions (default 4)')
+    p.add_argument('--logins', type=int, default=8, help='Clientes de login concurrentes (default 8)')
+    p.add_argument('--duration', type=float, default=10.0, help='Segundos por fase (default 10)')
+    p.add_argument('--rows', type=int, default=2000, help='Transacciones del usuario de la API (default 2000)')
+    p.add_argument('--json', help='Guardar el reporte en este archivo JSON')
+    args = p.parse_args()
+
+    configure_environment(args)
+
+    from werkzeug.serving import make_server
+    from app.extensions import limiter
+    from app.factory import create_app
+    from app.scripts.bench_api import percentile
+    from app.scripts.gen_transactions import generate, get_or_create_user
+    from app.services import passwords
+    from app.services.database import db
+
+    generate('bench-api', args.rows)
+    app = create_app()
+    limiter.enabled = False
+    with app.app_context():
+        for name in ['bench-api'] + [f'bench-login-{i}' for i in range(args.logins)]:
+            get_or_create_user(name).set_password(PASSWORD)
+        db.session.commit()
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    api_params = {'dateMode': 'range'}
+
+    print(f"🔐 bcrypt rounds={args.rounds} | PASSWORD_WORKERS={args.password_workers} | "
+          f"{args.readers} lectores API + {args.logins} clientes de login | {args.duration:.0f}s por fase")
+    base_api, _, _ = run_phase(base_url, args.readers, 0, args.duration, api_params)
+    load_api, logins, status = run_phase(base_url, args.readers, args.logins, args.duration, api_params)
+    server.shutdown()
+    passwords.shutdown()
+
+    ms = lambda v: round(v * 1000, 1)
+    report = {
+        'rounds': args.rounds,
+        'password_workers': args.password_workers,
+        'login': {'count': len(logins), 'per_second': round(len(logins) / args.duration, 1),
+                  'p50_ms': ms(percentile(logins, 50)), 'p99_ms': ms(percentile(logins, 99)),
+                  'status': {str(k): v for k, v in sorted(status.items())}},
+        'api_baseline': {'count': len(base_api), 'p50_ms': ms(percentile(base_api, 50)),
+                         'p99_ms': ms(percentile(base_api, 99))},
+        'api_under_login_load': {'count': len(load_api), 'p50_ms': ms(percentile(load_api, 50)),
+                                 'p99_ms': ms(percentile(load_api, 99))},
+    }
+    lg, b, u = report['login'], report['api_baseline'], report['api_under_login_load']
+    print(f"   login: {lg['count']} ok ({lg['per_second']}/s) | p50 {lg['p50_ms']} ms | p99 {lg['p99_ms']} ms | "
+          f"status {lg['status']}")
+    print(f"   API base:         {b['count']} req | p50 {b['p50_ms']} ms | p99 {b['p99_ms']} ms")
+    print(f"   API bajo logins:  {u['count']} req | p50 {u['p50_ms']} ms | p99 {u['p99_ms']} ms")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Reporte guardado en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
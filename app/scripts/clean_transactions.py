@@ -12,8 +12,15 @@ from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from app.services.database import db
-from app.models import Transaction
-from main import create_app
+from app.models import Transaction, NotificationOutbox, TelegramMessage
+from app.factory import create_app
+
+
+def _delete_related_for(query):
+    """Elimina outbox e índice de mensajes asociados a las transacciones de `query`"""
+    ids = query.with_entities(Transaction.id)
+    for model in (NotificationOutbox, TelegramMessage):
+        model.query.filter(model.transaction_id.in_(ids)).delete(synchronize_session=False)
 
 
 def clean_transactions():
@@ -40,6 +47,8 @@ def clean_transactions():
         
         # Eliminar todas las transacciones
         try:
+            NotificationOutbox.query.delete()
+            TelegramMessage.query.delete()
             deleted = db.session.query(Transaction).delete()
             db.session.commit()
             
@@ -119,7 +128,8 @@ def clean_with_filters():
             return
         
         try:
-            deleted = query.delete()
+            _delete_related_for(query)
+            deleted = query.delete(synchronize_session=False)
             db.session.commit()
             print(f"✅ {deleted} transacciones eliminadas.")
             
@@ -146,6 +156,8 @@ if __name__ == "__main__":
             # Modo forzado para scripts automatizados
             app = create_app(start_services=False)
             with app.app_context():
+                NotificationOutbox.query.delete()
+                TelegramMessage.query.delete()
                 deleted = db.session.query(Transaction).delete()
                 db.session.commit()
                 print(f"✅ {deleted} transacciones eliminadas (modo forzado).")
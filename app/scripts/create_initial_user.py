@@ -25,9 +25,9 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 try:
-    from main import create_app  # type: ignore
+    from app.factory import create_app  # type: ignore
 except ModuleNotFoundError as e:
-    raise SystemExit(f"No se pudo importar main.py. Ejecuta el script desde la raíz del proyecto o usa: python -m app.scripts.create_initial_user\nDetalle: {e}")
+    raise SystemExit(f"No se pudo importar app.factory. Ejecuta el script desde la raíz del proyecto o usa: python -m app.scripts.create_initial_user\nDetalle: {e}")
 
 from app.services.database import db
 from app.models import Account, User
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Servidor IMAP mínimo en proceso para pruebas y benchmarks del poller.
+
+Implementa el subconjunto de IMAP4rev1 que usa `EmailProcessor`
+(CAPABILITY, LOGIN, SELECT, SEARCH con FROM/SINCE, FETCH RFC822, LOGOUT),
+sin TLS. Cada usuario IMAP tiene su propio buzón en memoria.
+
+Uso standalone (con correos sintéticos del Banco de Chile):
+  python -m app.scripts.fake_imap --port 1143 --count 200 --user banco@test
+  export IMAP_USE_SSL=false IMAP_PORT=1143
+
+Uso embebido:
+  fake = FakeIMAP(latency=0.01).start()
+  fake.add_messages('banco@test', build_corpus(100))
+  ...
+  fake.stop()
+"""
+import argparse
+import os
+import re
+import socketserver
+import sys
+import threading
+import time
+from datetime import datetime
+from email import message_from_bytes
+from email.utils import parsedate_to_datetime
+
+# Agregar el directorio raíz al path para importar la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|([^\s()]+)')
+
+
+def _tokens(text):
+    """Separa argumentos IMAP (átomos y strings entre comillas), ignorando paréntesis."""
+    return [m.group(1).replace('\\"', '"').replace('\\\\', '\\') if m.group(1) is not None else m.group(2)
+            for m in _TOKEN.finditer(text)]
+
+
+class _Message:
+    """Correo almacenado con los headers que se usan en SEARCH ya parseados."""
+
+    __slots__ = ('raw', 'sender', 'date')
+
+    def __init__(self, raw):
+        self.raw = raw
+        headers = message_from_bytes(raw.split(b'\r\n\r\n', 1)[0].split(b'\n\n', 1)[0])
+        self.sender = (headers.get('From') or '').lower()
+        try:
+            self.date = parsedate_to_datetime(headers.get('Date')).date()
+        except (TypeError, ValueError):
+            self.date = None
+
+
+class FakeIMAP:
+    """Servidor IMAP en memoria.
+
+    Attributes:
+        latency: Segundos de latencia artificial por comando.
+        password: Si se define, LOGIN exige esta contraseña.
+        calls: Contador de comandos recibidos.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, password=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.password = password
+        self.calls = {}
+        self._mailboxes = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def add_messages(self, user, raw_messages):
+        """Agrega correos (bytes RFC822) al buzón de `user`."""
+        with self._lock:
+            box = self._mailboxes.setdefault(user, [])
+            box.extend(_Message(raw) for raw in raw_messages)
+            return len(box)
+
+    def mailbox(self, user):
+        with self._lock:
+            return list(self._mailboxes.get(user, []))
+
+    def start(self):
+        """Levanta el servidor en un hilo daemon y retorna `self`."""
+        handler = self._make_handler()
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Detiene el servidor."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _count(self, command):
+        with self._lock:
+            self.calls[command] = self.calls.get(command, 0) + 1
+
+    def _search(self, box, args):
+        """Evalúa SEARCH: FROM (cualquiera coincide), SINCE y ALL/UNSEEN/OR ignorados."""
+        senders, since = [], None
+        tokens = iter(args)
+        for tok in tokens:
+            key = tok.upper()
+            if key == 'FROM':
+                senders.append(next(tokens, '').lower())
+            elif key == 'SINCE':
+                try:
+                    since = datetime.strptime(next(tokens, ''), '%d-%b-%Y').date()
+                except ValueError:
+                    pass
+        result = []
+        for seq, msg in enumerate(box, start=1):
+            if senders and not any(s in msg.sender for s in senders):
+                continue
+            if since and msg.date and msg.date < since:
+                continue
+            result.append(seq)
+        return result
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def _send(self, line):
+                self.wfile.write(line.encode() + b'\r\n')
+
+            def handle(self):
+                user = None
+                selected = None
+                self._send('* OK [CAPABILITY IMAP4rev1] FakeIMAP listo')
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    parts = line.decode(errors='replace').rstrip('\r\n').split(' ', 2)
+                    if len(parts) < 2:
+                        self._send('* BAD comando inválido')
+                        continue
+                    tag, command = parts[0], parts[1].upper()
+                    args = _tokens(parts[2]) if len(parts) > 2 else []
+                    fake._count(command)
+                    if fake.latency:
+                        time.sleep(fake.latency)
+
+                    if command == 'CAPABILITY':
+                        self._send('* CAPABILITY IMAP4rev1')
+                        self._send(f'{tag} OK CAPABILITY completado')
+                    elif command == 'NOOP':
+                        self._send(f'{tag} OK NOOP completado')
+                    elif command == 'LOGIN':
+                        if len(args) < 2 or (fake.password is not None and args[1] != fake.password):
+                            self._send(f'{tag} NO [AUTHENTICATIONFAILED] credenciales inválidas')
+                            continue
+                        user = args[0]
+                        self._send(f'{tag} OK LOGIN completado')
+                    elif command == 'LOGOUT':
+                        self._send('* BYE cerrando sesión')
+                        self._send(f'{tag} OK LOGOUT completado')
+                        return
+                    elif user is None:
+                        self._send(f'{tag} NO no autenticado')
+                    elif command in ('SELECT', 'EXAMINE'):
+                        selected = fake.mailbox(user)
+                        self._send(f'* {len(selected)} EXISTS')
+                        self._send('* 0 RECENT')
+                        self._send('* FLAGS (\\Seen \\Answered \\Flagged \\Deleted \\Draft)')
+                        self._send(f'{tag} OK [READ-WRITE] {command} completado')
+                    elif selected is None:
+                        self._send(f'{tag} NO no hay buzón seleccionado')
+                    elif command == 'SEARCH':
+                        found = fake._search(selected, args)
+                        self._send('* SEARCH' + ''.join(f' {n}' for n in found))
+                        self._send(f'{tag} OK SEARCH completado')
+                    elif command == 'FETCH':
+                        try:
+                            msg = selected[int(args[0]) - 1]
+                        except (IndexError, ValueError):
+                            self._send(f'{tag} BAD mensaje inexistente')
+                            continue
+                        self.wfile.write(f'* {args[0]} FETCH (RFC822 {{{len(msg.raw)}}}\r\n'.encode())
+                        self.wfile.write(msg.raw)
+                        self.wfile.write(b')\r\n')
+                        self._send(f'{tag} OK FETCH completado')
+                    elif command == 'CLOSE':
+                        selected = None
+                        self._send(f'{tag} OK CLOSE completado')
+                    else:
+                        self._send(f'{tag} BAD comando no soportado')
+
+        return Handler
+
+
+def main():
+    from app.scripts.bench_email_extract import build_corpus
+
+    p = argparse.ArgumentParser(description="Servidor IMAP local con correos sintéticos")
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=1143)
+    p.add_argument('--user', default='banco@test', help='Usuario IMAP cuyo buzón se llena')
+    p.add_argument('--count', type=int, default=100, help='Correos sintéticos a generar')
+    p.add_argument('--latency', type=float, default=0.0, help='Latencia artificial por comando (s)')
+    args = p.parse_args()
+
+    fake = FakeIMAP(args.host, args.port, args.latency).start()
+    fake.add_messages(args.user, build_corpus(args.count))
+    print(f"📬 Fake IMAP escuchando en {args.host}:{fake.port} ({args.count} correos para {args.user})")
+    print(f"   export IMAP_USE_SSL=false IMAP_PORT={fake.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
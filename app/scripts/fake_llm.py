@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Endpoint local compatible con OpenAI (`/v1/chat/completions`) para pruebas.
+
+Responde de forma determinista sin llamar a la API real:
+  - Parseo de correos (`response_format=json_object`): extrae monto, comercio
+    y fecha del cuerpo con expresiones regulares y devuelve el JSON que espera
+    `app.services.llm.parse_email`.
+  - Categorización: devuelve una categoría fija según palabras clave.
+
+La latencia es configurable para simular el tiempo real del modelo.
+
+Uso standalone:
+  python -m app.scripts.fake_llm --port 8082 --latency 0.4
+  export OPENAI_BASE_URL="http://127.0.0.1:8082" OPENAI_API_KEY="sk-fake"
+
+Uso embebido:
+  fake = FakeLLM(latency=0.2).start()
+  os.environ['OPENAI_BASE_URL'] = fake.base_url
+  ...
+  fake.stop()
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_AMOUNT = re.compile(r'\$\s?([\d.,]+)')
+_MERCHANT = re.compile(r'(?:\ben|Comercio:)\s+(.+?)\s+(?:el\s+\d|Fecha:|$)', re.S)
+_DATE = re.compile(r'(\d{2})/(\d{2})/(\d{4})\s+(\d{2}):(\d{2})')
+_TYPES = {
+    'Transferencia a Terceros': 'transferencia',
+    'Cargo en Cuenta': 'debito',
+    'Compra con Tarjeta de Crédito': 'credito',
+}
+_CATEGORIES = {
+    'comida': ('lider', 'jumbo', 'santa isabel', 'starbucks', 'unimarc'),
+    'transporte': ('uber', 'copec', 'shell', 'metro'),
+    'salud': ('farmacia', 'cruz verde', 'salcobrand'),
+    'servicios': ('enel', 'aguas', 'entel', 'vtr'),
+}
+
+
+def fake_parse(prompt):
+    """Extrae los campos que devolvería el LLM a partir del prompt de parseo."""
+    subject = prompt.split('\n', 1)[0].removeprefix('Asunto:').strip()
+    body = ' '.join(prompt.split())
+    result = {'tipo_transaccion': _TYPES.get(subject, 'desconocido'),
+              'monto': 0.0, 'moneda': 'CLP', 'comercio': None, 'fecha_iso': None}
+    m = _AMOUNT.search(body)
+    if m:
+        result['monto'] = float(re.sub(r'[.,]', '', m.group(1)) or 0)
+    m = _MERCHANT.search(body)
+    if m:
+        result['comercio'] = m.group(1).strip()
+    m = _DATE.search(body)
+    if m:
+        d, mo, y, h, mi = map(int, m.groups())
+        result['fecha_iso'] = datetime(y, mo, d, h, mi).isoformat()
+    return result
+
+
+def fake_categorize(text):
+    """Categoría por palabras clave (como lo haría el modelo, pero sin él)."""
+    lower = text.lower()
+    for category, words in _CATEGORIES.items():
+        if any(w in lower for w in words):
+            return category
+    return 'otros'
+
+
+class FakeLLM:
+    """Servidor HTTP en proceso que imita `POST /v1/chat/completions`.
+
+    Attributes:
+        latency: Segundos de latencia artificial por llamada.
+        jitter: Variación aleatoria (±fracción) aplicada a la latencia.
+        error_rate: Fracción de llamadas que responden HTTP 500.
+        calls: Número de llamadas recibidas.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        """Valor para `OPENAI_BASE_URL` (el cliente agrega `/v1/chat/completions`)."""
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Levanta el servidor en un hilo daemon y retorna `self`."""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Detiene el servidor."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _delay_and_fail(self):
+        """Calcula la latencia de la llamada y si debe fallar."""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency * (1 + self._rng.uniform(-self.jitter, self.jitter))
+            fail = self._rng.random() < self.error_rate
+        return max(0.0, delay), fail
+
+    def complete(self, payload):
+        """Arma la respuesta `chat.completion` para un payload de la API."""
+        messages = payload.get('messages') or []
+        prompt = messages[-1].get('content', '') if messages else ''
+        if (payload.get('response_format') or {}).get('type') == 'json_object':
+            content = json.dumps(fake_parse(prompt), ensure_ascii=False)
+        else:
+            content = fake_categorize(prompt)
+        return {
+            'id': f'chatcmpl-fake-{self.calls}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'fake'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4,
+                      'total_tokens': (len(prompt) + len(content)) // 4},
+        }
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                if self.path.rstrip('/') != '/v1/chat/completions':
+                    return self._send_json(404, {'error': {'message': 'Not Found'}})
+                try:
+                    payload = json.loads(raw or b'{}')
+                except ValueError:
+                    return self._send_json(400, {'error': {'message': 'JSON inválido'}})
+                delay, fail = fake._delay_and_fail()
+                if delay:
+                    time.sleep(delay)
+                if fail:
+                    return self._send_json(500, {'error': {'message': 'error simulado'}})
+                self._send_json(200, fake.complete(payload))
+
+        return Handler
+
+
+def main():
+    p = argparse.ArgumentParser(description="Endpoint local compatible con OpenAI")
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8082)
+    p.add_argument('--latency', type=float, default=0.0, help='Latencia artificial por llamada (s)')
+    p.add_argument('--jitter', type=float, default=0.0, help='Variación de la latencia (fracción, p.ej. 0.3)')
+    p.add_argument('--error-rate', type=float, default=0.0, help='Fracción de llamadas que fallan con 500')
+    args = p.parse_args()
+
+    fake = FakeLLM(args.host, args.port, args.latency, args.jitter, args.error_rate).start()
+    print(f"🧠 Fake LLM escuchando en {fake.base_url}")
+    print(f"   export OPENAI_BASE_URL=\"{fake.base_url}\" OPENAI_API_KEY=\"sk-fake\"")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
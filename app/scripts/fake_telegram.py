@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Stand-in local de la Bot API de Telegram para pruebas y benchmarks.
+
+Implementa el subconjunto de métodos que usa el bot (getMe, sendMessage,
+editMessageText, answerCallbackQuery, setWebhook, deleteWebhook,
+getUpdates, ...), registra los mensajes enviados en memoria y permite
+inyectar updates, que se entregan por webhook (si hay uno configurado) o vía
+getUpdates.
+
+Uso standalone:
+  python -m app.scripts.fake_telegram --port 8081
+  export TELEGRAM_API_BASE_URL="http://127.0.0.1:8081/bot"
+  export TELEGRAM_BOT_TOKEN="123:fake"
+
+Endpoints auxiliares:
+  GET  /_fake/messages  -> mensajes enviados por el bot
+  POST /_fake/updates   -> inyecta un update (JSON) hacia el bot
+
+Uso embebido:
+  fake = FakeTelegram(latency=0.05).start()
+  os.environ['TELEGRAM_API_BASE_URL'] = fake.base_url
+  ...
+  fake.stop()
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import requests
+
+
+class FakeTelegram:
+    """Servidor HTTP en proceso que imita la Bot API de Telegram.
+
+    Attributes:
+        messages: Lista de mensajes enviados por el bot (dicts con `chat_id`,
+            `message_id`, `text`, `reply_markup`).
+        calls: Contador de llamadas por método.
+        latency: Segundos de latencia artificial por llamada.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.messages = []
+        self.calls = {}
+        self.webhook_url = None
+        self.webhook_secret = None
+        self._updates = deque()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """URL base para `ApplicationBuilder().base_url(...)` (el token se agrega al final)."""
+        return f"http://{self.host}:{self.port}/bot"
+
+    def start(self):
+        """Levanta el servidor en un hilo daemon y retorna `self`."""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Detiene el servidor."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def inject_update(self, update):
+        """Entrega un update al bot, por webhook o encolándolo para getUpdates.
+
+        Args:
+            update: Diccionario con el update (sin `update_id`, se asigna aquí).
+
+        Returns:
+            El update con su `update_id`.
+        """
+        update = dict(update)
+        update.setdefault('update_id', next(self._update_ids))
+        if self.webhook_url:
+            headers = {}
+            if self.webhook_secret:
+                headers['X-Telegram-Bot-Api-Secret-Token'] = self.webhook_secret
+            requests.post(self.webhook_url, json=update, headers=headers, timeout=10)
+        else:
+            with self._lock:
+                self._updates.append(update)
+        return update
+
+    def reply_update(self, chat_id, text, reply_to_message_id=None):
+        """Construye e inyecta un mensaje de texto del usuario (opcionalmente un reply)."""
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'from': {'id': int(chat_id), 'is_bot': False, 'first_name': 'Test', 'username': 'test'},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        if reply_to_message_id is not None:
+            original = next((m for m in self.messages if m['message_id'] == reply_to_message_id), None)
+            message['reply_to_message'] = {
+                'message_id': reply_to_message_id,
+                'date': int(time.time()),
+                'chat': {'id': int(chat_id), 'type': 'private'},
+                'from': self._bot_user(),
+                'text': original['text'] if original else '',
+            }
+        return self.inject_update({'message': message})
+
+    # --- Implementación de la API ---
+    def _bot_user(self):
+        return {'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot'}
+
+    def _handle(self, method, params):
+        """Despacha un método de la Bot API y retorna el `result`."""
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        if method == 'getMe':
+            return dict(self._bot_user(), can_join_groups=False, can_read_all_group_messages=False,
+                        supports_inline_queries=False)
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = params.get('chat_id')
+            message_id = params.get('message_id') or next(self._message_ids)
+            record = {
+                'chat_id': str(chat_id),
+                'message_id': int(message_id),
+                'text': params.get('text', ''),
+                'reply_markup': params.get('reply_markup'),
+                'method': method,
+            }
+            with self._lock:
+                self.messages.append(record)
+            return {
+                'message_id': int(message_id),
+                'date': int(time.time()),
+                'chat': {'id': int(chat_id), 'type': 'private'},
+                'from': self._bot_user(),
+                'text': record['text'],
+            }
+        if method == 'setWebhook':
+            self.webhook_url = params.get('url') or None
+            self.webhook_secret = params.get('secret_token')
+            return True
+        if method == 'deleteWebhook':
+            self.webhook_url = None
+            self.webhook_secret = None
+            return True
+        if method == 'getWebhookInfo':
+            return {'url': self.webhook_url or '', 'has_custom_certificate': False, 'pending_update_count': 0}
+        if method == 'getUpdates':
+            timeout = float(params.get('timeout') or 0)
+            deadline = time.monotonic() + min(timeout, 1.0)
+            offset = int(params.get('offset') or 0)
+            while True:
+                with self._lock:
+                    while self._updates and self._updates[0]['update_id'] < offset:
+                        self._updates.popleft()
+                    if self._updates:
+                        return list(self._updates)
+                if time.monotonic() >= deadline:
+                    return []
+                time.sleep(0.05)
+        # answerCallbackQuery, setMyCommands, close, logOut, etc.
+        return True
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_params(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                ctype = self.headers.get('Content-Type', '')
+                if 'application/json' in ctype:
+                    return json.loads(raw or b'{}')
+                params = {}
+                for key, values in parse_qs(raw.decode()).items():
+                    value = values[-1]
+                    if value[:1] in ('{', '['):
+                        try:
+                            value = json.loads(value)
+                        except ValueError:
+                            pass
+                    params[key] = value
+                return params
+
+            def do_GET(self):
+                if self.path == '/_fake/messages':
+                    with fake._lock:
+                        return self._send_json(200, list(fake.messages))
+                self._dispatch()
+
+            def do_POST(self):
+                if self.path == '/_fake/updates':
+                    update = fake.inject_update(self._read_params())
+                    return self._send_json(200, {'ok': True, 'result': update})
+                self._dispatch()
+
+            def _dispatch(self):
+                # /bot<token>/<method>
+                parts = self.path.split('?')[0].strip('/').split('/')
+                if len(parts) != 2 or not parts[0].startswith('bot'):
+                    return self._send_json(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                params = self._read_params() if self.command == 'POST' else {}
+                if fake.latency:
+                    time.sleep(fake.latency)
+                result = fake._handle(parts[1], params)
+                self._send_json(200, {'ok': True, 'result': result})
+
+        return Handler
+
+
+def main():
+    p = argparse.ArgumentParser(description="Servidor local que imita la Bot API de Telegram")
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8081)
+    p.add_argument('--latency', type=float, default=0.0, help='Latencia artificial por llamada (s)')
+    args = p.parse_args()
+
+    fake = FakeTelegram(args.host, args.port, args.latency).start()
+    print(f"🤖 Fake Telegram escuchando en {fake.base_url}")
+    print(f"   export TELEGRAM_API_BASE_URL=\"{fake.base_url}\"")
+    try:
+        seen = 0
+        while True:
+            time.sleep(1)
+            for m in fake.messages[seen:]:
+                print(f"📤 chat_id={m['chat_id']} message_id={m['message_id']}: {m['text'][:80]!r}")
+            seen = len(fake.messages)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Generador de historiales sintéticos de transacciones para pruebas de carga.
+
+Inserta por lotes transacciones realistas (comercios, categorías, tipos,
+montos y fechas repartidas en varios años) para un usuario. Si el usuario no
+existe, crea una cuenta deshabilitada (el poller la ignora) y el usuario.
+
+Pensado para una base dedicada a benchmarks (ver `bench_api.py`).
+
+Uso:
+  python -m app.scripts.gen_transactions --user bench --count 100000
+  python -m app.scripts.gen_transactions --user bench --count 1000000 --years 5 \\
+      --database-url postgresql://localhost/finanzas_bench
+"""
+import argparse
+import os
+import random
+import secrets
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Agregar el directorio raíz al path para importar la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+# (comercio, categoría, tipos posibles, monto típico en CLP)
+MERCHANTS = [
+    ('LIDER EXPRESS', 'comida', ('debito', 'credito'), 18000),
+    ('JUMBO', 'comida', ('debito', 'credito'), 45000),
+    ('SANTA ISABEL', 'comida', ('debito', 'credito'), 15000),
+    ('UNIMARC', 'comida', ('debito',), 12000),
+    ('STARBUCKS', 'comida', ('credito',), 5500),
+    ('RAPPI', 'comida', ('credito',), 14000),
+    ('UBER TRIP', 'transporte', ('credito',), 7000),
+    ('COPEC', 'transporte', ('debito', 'credito'), 35000),
+    ('METRO BIP', 'transporte', ('debito',), 10000),
+    ('FARMACIAS AHUMADA', 'salud', ('debito', 'credito'), 12000),
+    ('CRUZ VERDE', 'salud', ('debito',), 9000),
+    ('ENEL', 'servicios', ('debito',), 38000),
+    ('AGUAS ANDINAS', 'servicios', ('debito',), 21000),
+    ('ENTEL', 'servicios', ('credito',), 25000),
+    ('NETFLIX', 'entretenimiento', ('credito',), 9990),
+    ('SPOTIFY', 'entretenimiento', ('credito',), 5990),
+    ('CINEPLANET', 'entretenimiento', ('credito',), 16000),
+    ('SKY AIRLINE', 'viajes', ('credito',), 180000),
+    ('FALABELLA', 'otros', ('credito',), 40000),
+    ('PARIS', 'otros', ('credito',), 35000),
+]
+TRANSFER_NAMES = ['Juan Pérez', 'María González', 'Arriendo Depto', 'Pedro Soto', 'Camila Rojas', 'Gastos comunes']
+TRANSFER_CATEGORIES = ['hogar', 'regalos y donaciones', 'otros']
+DESCRIPTIONS = {
+    'comida': ['supermercado', 'almuerzo', 'café', 'pedido a domicilio'],
+    'transporte': ['viaje al trabajo', 'bencina', 'carga bip'],
+    'salud': ['remedios', 'farmacia'],
+    'servicios': ['cuenta de luz', 'cuenta del agua', 'plan celular'],
+    'entretenimiento': ['suscripción', 'cine'],
+    'viajes': ['pasajes'],
+    'otros': ['ropa', 'compras varias'],
+    'hogar': ['arriendo', 'gastos comunes'],
+    'regalos y donaciones': ['regalo de cumpleaños'],
+}
+
+
+def make_rows(user_id, count, years, labeled_ratio, seed, run_id):
+    """Genera diccionarios de columnas de `Transaction` listos para insertar."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    span = int(timedelta(days=365 * years).total_seconds())
+    for i in range(count):
+        if rng.random() < 0.12:
+            merchant = rng.choice(TRANSFER_NAMES)
+            ttype = 'transferencia'
+            category = rng.choice(TRANSFER_CATEGORIES)
+            base = 60000
+        else:
+            merchant, category, types, base = rng.choice(MERCHANTS)
+            ttype = rng.choice(types)
+        amount = round(max(500, rng.lognormvariate(0, 0.6) * base))
+        labeled = rng.random() < labeled_ratio
+        yield {
+            'user_id': user_id,
+            'date': now - timedelta(seconds=rng.randrange(span)),
+            'amount_minor': amount,  # CLP: sin decimales
+            'currency': 'CLP',
+            'merchant': merchant,
+            'type': ttype,
+            'category': category,
+            'description': rng.choice(DESCRIPTIONS.get(category, ['otros'])) if labeled else None,
+            'raw_email_id': f"gen-{run_id}-{i}",
+            'created_at': now,
+        }
+
+
+def get_or_create_user(username):
+    """Obtiene el usuario o lo crea junto a una cuenta deshabilitada."""
+    from app.services.database import db
+    from app.models import Account, User
+
+    user = User.query.filter_by(username=username).first()
+    if user:
+        return user
+    if not os.getenv('APP_ENCRYPTION_KEY'):
+        raise SystemExit('Falta APP_ENCRYPTION_KEY en entorno (necesaria para crear la cuenta)')
+    account = Account(imap_host='bench.invalid', enabled=False)
+    account.set_imap_credentials('bench', secrets.token_urlsafe(8))
+    user = User(username=username, account=account)
+    user.set_password(secrets.token_urlsafe(12))
+    db.session.add_all([account, user])
+    db.session.commit()
+    print(f"👤 Usuario {username} creado (id={user.id}, cuenta deshabilitada)")
+    return user
+
+
+def generate(username, count, years=3, batch_size=10000, labeled_ratio=0.85, seed=42):
+    """Inserta `count` transacciones sintéticas para `username`.
+
+    Args:
+        username: Usuario dueño de las transacciones (se crea si no existe).
+        count: Cantidad de transacciones a insertar.
+        years: Años hacia atrás (desde hoy) en que se reparten las fechas.
+        batch_size: Filas por INSERT/commit.
+        labeled_ratio: Fracción con descripción (el resto queda pendiente).
+        seed: Semilla para reproducibilidad.
+
+    Returns:
+        Cantidad de filas insertadas.
+    """
+    from sqlalchemy import insert
+    from app.services.database import db
+    from app.models import Transaction
+    from app.factory import create_app
+
+    app = create_app(start_services=False)
+    with app.app_context():
+        user = get_or_create_user(username)
+        user_id = user.id
+        existing = Transaction.query.filter_by(user_id=user_id).count()
+        print(f"📊 {username}: {existing} transacciones existentes; generando {count}...")
+
+        run_id = secrets.token_hex(4)
+        rows = make_rows(user_id, count, years, labeled_ratio, seed, run_id)
+        inserted = 0
+        t0 = time.perf_counter()
+        while inserted < count:
+            batch = [row for _, row in zip(range(batch_size), rows)]
+            if not batch:
+                break
+            db.session.execute(insert(Transaction), batch)
+            db.session.commit()
+            inserted += len(batch)
+            elapsed = time.perf_counter() - t0
+            print(f"  ✅ {inserted}/{count} ({inserted / elapsed:,.0f} filas/s)", end='\r')
+        print()
+        print(f"🎉 {inserted} transacciones insertadas en {time.perf_counter() - t0:.1f}s "
+              f"(total usuario: {existing + inserted})")
+        return inserted
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description="Genera transacciones sintéticas para pruebas de carga")
+    p.add_argument('--user', default='bench', help='Usuario dueño (se crea si no existe)')
+    p.add_argument('--count', type=int, default=10000, help='Transacciones a generar')
+    p.add_argument('--years', type=float, default=3, help='Años de historia')
+    p.add_argument('--batch-size', type=int, default=10000, help='Filas por lote')
+    p.add_argument('--labeled-ratio', type=float, default=0.85, help='Fracción con descripción')
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--database-url', help='Base dedicada (default: DATABASE_URL)')
+    args = p.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    generate(args.user, args.count, args.years, args.batch_size, args.labeled_ratio, args.seed)
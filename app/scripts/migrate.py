@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Administra las migraciones de esquema (Alembic) de la base de la app.
+
+Usa la misma `DATABASE_URL` y configuración de motor que la app. Las
+revisiones están en `migrations/versions`.
+
+Uso:
+  python -m app.scripts.migrate upgrade            # aplica todo lo pendiente
+  python -m app.scripts.migrate current            # revisión aplicada vs última
+  python -m app.scripts.migrate downgrade -1
+  python -m app.scripts.migrate stamp head         # marcar sin ejecutar
+  python -m app.scripts.migrate revision -m "agrega columna x"
+"""
+import argparse
+import os
+import sys
+
+# Agregar el directorio padre al path para importar la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.factory import create_app
+from app.services import migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migraciones de esquema (Alembic)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('upgrade', help='Aplicar migraciones hasta una revisión (default head)')
+    p.add_argument('revision', nargs='?', default='head')
+    p = sub.add_parser('downgrade', help='Revertir hasta una revisión (p.ej. -1)')
+    p.add_argument('revision')
+    p = sub.add_parser('stamp', help='Marcar la base en una revisión sin ejecutar migraciones')
+    p.add_argument('revision', nargs='?', default='head')
+    sub.add_parser('current', help='Mostrar la revisión aplicada y la última disponible')
+    p = sub.add_parser('revision', help='Crear una revisión nueva (autogenerate contra los modelos)')
+    p.add_argument('-m', '--message', required=True)
+    p.add_argument('--empty', action='store_true', help='Revisión vacía, sin autogenerate')
+    args = parser.parse_args()
+
+    app = create_app(migrate=False)
+    if args.command == 'upgrade':
+        migrations.upgrade(app, args.revision)
+    elif args.command == 'downgrade':
+        migrations.downgrade(app, args.revision)
+    elif args.command == 'stamp':
+        migrations.stamp(app, args.revision)
+    elif args.command == 'revision':
+        script = migrations.revision(app, args.message, autogenerate=not args.empty)
+        print(f"📝 Revisión creada: {script.path}")
+        return
+    applied, latest = migrations.current(app), migrations.head()
+    print(f"🗃️ Revisión aplicada: {applied or 'ninguna'} | última: {latest}"
+          f"{'' if applied == latest else ' (hay migraciones pendientes)'}")
+    if args.command == 'current' and applied != latest:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
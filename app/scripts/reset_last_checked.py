@@ -13,7 +13,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from app.services.database import db
 from app.models import Account
-from main import create_app
+from app.factory import create_app
 
 
 # Fecha de reset por defecto
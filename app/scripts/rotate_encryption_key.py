@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Re-cifra las credenciales IMAP de las cuentas con la clave primaria.
+
+Rotación de `APP_ENCRYPTION_KEY` sin ventana de mantenimiento:
+  1. Desplegar en TODOS los procesos `APP_ENCRYPTION_KEY=nueva,vieja`
+     (la primera cifra, ambas descifran).
+  2. Ejecutar este script: re-cifra con `MultiFernet.rotate` por lotes.
+  3. Cuando reporte 0 pendientes, desplegar `APP_ENCRYPTION_KEY=nueva`.
+
+Características:
+  - Lotes por ID con un commit por lote (transacciones acotadas)
+  - Reanudable sin estado: las cuentas que ya descifran con la clave
+    primaria se omiten, así que basta volver a ejecutarlo
+  - Seguro en línea: cada UPDATE compara los blobs leídos, por lo que no
+    pisa credenciales cambiadas mientras corre (se cuentan como conflicto y
+    se reintentan en la siguiente ejecución)
+
+Uso:
+  python -m app.scripts.rotate_encryption_key --dry-run
+  python -m app.scripts.rotate_encryption_key --batch-size 200 --pause 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+from cryptography.fernet import Fernet, InvalidToken
+
+# Agregar el directorio padre al path para importar la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.services.database import db
+from app.services.credentials import get_fernet
+from app.models import Account
+from app.factory import create_app
+
+
+def _primary_fernet():
+    """Fernet de la primera clave de `APP_ENCRYPTION_KEY` (la que cifra)."""
+    get_fernet()  # valida que exista la variable
+    keys = [k.strip() for k in os.environ['APP_ENCRYPTION_KEY'].split(',') if k.strip()]
+    return Fernet(keys[0]), len(keys)
+
+
+def _needs_rotation(primary, token):
+    try:
+        primary.decrypt(token)
+        return False
+    except InvalidToken:
+        return True
+
+
+def rotate(batch_size=100, pause=0.0, dry_run=False):
+    """Re-cifra por lotes las credenciales que no están cifradas con la clave primaria.
+
+    Args:
+        batch_size: Cuentas leídas y confirmadas por lote.
+        pause: Segundos de espera entre lotes (para limitar la carga en línea).
+        dry_run: Solo contar cuentas pendientes, sin escribir.
+
+    Returns:
+        Diccionario con estadísticas (`total`, `rotated`, `current`,
+        `conflicts`, `errors`).
+    """
+    app = create_app(start_services=False)
+    primary, n_keys = _primary_fernet()
+    multi = get_fernet()
+    if n_keys == 1:
+        print("ℹ️ APP_ENCRYPTION_KEY tiene una sola clave: solo se verificará que todo descifre con ella")
+
+    stats = {'total': 0, 'rotated': 0, 'current': 0, 'conflicts': 0, 'errors': 0}
+    with app.app_context():
+        total_accounts = db.session.query(Account.id).count()
+        print(f"🔑 {total_accounts} cuenta(s) | lote {batch_size} | {'DRY-RUN' if dry_run else 'escritura'}")
+        last_id = 0
+        t0 = time.perf_counter()
+        while True:
+            rows = (
+                db.session.query(Account.id, Account.imap_user_encrypted, Account.imap_password_encrypted)
+                .filter(Account.id > last_id)
+                .order_by(Account.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            for account_id, user_blob, password_blob in rows:
+                stats['total'] += 1
+                if not (_needs_rotation(primary, user_blob) or _needs_rotation(primary, password_blob)):
+                    stats['current'] += 1
+                    continue
+                try:
+                    new_user = multi.rotate(user_blob)
+                    new_password = multi.rotate(password_blob)
+                except InvalidToken:
+                    stats['errors'] += 1
+                    print(f"❌ Cuenta {account_id}: no descifra con ninguna clave de APP_ENCRYPTION_KEY")
+                    continue
+                if dry_run:
+                    stats['rotated'] += 1
+                    continue
+                # Compare-and-swap: no pisar credenciales actualizadas en paralelo
+                updated = Account.query.filter(
+                    Account.id == account_id,
+                    Account.imap_user_encrypted == user_blob,
+                    Account.imap_password_encrypted == password_blob,
+                ).update({'imap_user_encrypted': new_user, 'imap_password_encrypted': new_password},
+                         synchronize_session=False)
+                if updated:
+                    stats['rotated'] += 1
+                else:
+                    stats['conflicts'] += 1
+            if not dry_run:
+                db.session.commit()
+
+            elapsed = time.perf_counter() - t0
+            rate = stats['total'] / elapsed if elapsed > 0 else 0
+            print(f"   {stats['total']}/{total_accounts} revisadas | {stats['rotated']} "
+                  f"{'a rotar' if dry_run else 'rotadas'} | {stats['current']} al día | "
+                  f"{stats['conflicts']} conflictos | {stats['errors']} errores | {rate:.0f} cuentas/s")
+            if pause:
+                time.sleep(pause)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-cifra credenciales IMAP con la clave primaria de APP_ENCRYPTION_KEY')
+    parser.add_argument('--batch-size', type=int, default=100, help='Cuentas por lote/commit (default 100)')
+    parser.add_argument('--pause', type=float, default=0.0, help='Segundos de pausa entre lotes (default 0)')
+    parser.add_argument('--dry-run', action='store_true', help='Solo contar cuentas pendientes de rotar')
+    args = parser.parse_args()
+
+    stats = rotate(batch_size=max(1, args.batch_size), pause=args.pause, dry_run=args.dry_run)
+    pending = stats['conflicts'] + stats['errors'] + (stats['rotated'] if args.dry_run else 0)
+    if pending:
+        hint = 'ejecuta sin --dry-run' if args.dry_run else 'vuelve a ejecutar el script o revisa los errores'
+        print(f"⚠️ Quedan {pending} cuenta(s) sin la clave primaria; {hint} antes de retirar la clave vieja")
+        sys.exit(1)
+    print("✅ Todas las credenciales están cifradas con la clave primaria: ya se puede retirar la clave vieja")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Coordinación entre procesos a través de la tabla `worker_leases`.
+
+Permite correr varios procesos web y varios workers (`python -m app.worker`)
+sin que todos hagan polling de todas las cuentas ni del bot:
+
+  - `Lease`: lease con nombre que se renueva con heartbeats. Si el proceso
+    muere, vence tras `LEASE_TTL` segundos y otro puede tomarlo.
+  - `start_as_leader`: arranca un servicio solo en el proceso que tiene el
+    lease (una única instancia del bot de Telegram); el resto queda en
+    standby esperando a que venza. Si el líder pierde el lease detiene el
+    servicio y vuelve a standby.
+  - `PollerMembership`: registra el poller como vivo y calcula su shard
+    `(index, total)` entre los pollers vivos. Las cuentas se reparten por
+    `account.id % total`, así que agregar o quitar pollers reparte la carga
+    sin configuración. Durante un cambio de miembros una cuenta puede
+    revisarse dos veces; la unicidad de `raw_email_id` evita duplicados.
+"""
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from ..config import Config
+from .database import DatabaseManager
+from .metrics import LEASE_HELD
+
+logger = logging.getLogger(__name__)
+
+# Identificador único de este proceso (host:pid:aleatorio)
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+
+BOT_LEASE = 'telegram-bot'
+POLLER_PREFIX = 'poller:'
+
+
+class Lease:
+    """Lease con nombre en la DB, renovado periódicamente por su dueño.
+
+    Args:
+        app: Aplicación Flask (para el contexto de DB).
+        name: Nombre del lease.
+        ttl: Segundos de validez de cada renovación (default `Config.LEASE_TTL`).
+        holder: Identificador del dueño (default `WORKER_ID`).
+    """
+
+    def __init__(self, app, name, ttl=None, holder=WORKER_ID):
+        self.app = app
+        self.name = name
+        self.ttl = ttl or Config.LEASE_TTL
+        self.holder = holder
+        self._renewed_at = None  # time.monotonic() de la última renovación exitosa
+        self._stop = threading.Event()
+        self._label = name.split(':', 1)[0]
+
+    @property
+    def held(self):
+        """True si la última renovación exitosa sigue vigente."""
+        return self._renewed_at is not None and time.monotonic() - self._renewed_at < self.ttl
+
+    def acquire(self):
+        """Intenta tomar o renovar el lease.
+
+        Returns:
+            True si este proceso es el dueño. Un error de DB cuenta como no
+            renovado, pero el lease sigue valiendo hasta que venza su TTL.
+        """
+        t0 = time.monotonic()
+        try:
+            with self.app.app_context():
+                ok = DatabaseManager.acquire_lease(self.name, self.holder, self.ttl)
+        except Exception as e:
+            logger.error('❌ Error renovando lease %s: %s', self.name, e)
+            return self.held
+        self._renewed_at = t0 if ok else None
+        LEASE_HELD.set(1 if ok else 0, name=self._label)
+        return ok
+
+    def release(self):
+        """Detiene el heartbeat y libera el lease para que otro lo tome de inmediato."""
+        self._stop.set()
+        self.give_up()
+
+    def give_up(self):
+        """Libera el lease en la DB sin detener el objeto (puede volver a tomarse)."""
+        self._renewed_at = None
+        LEASE_HELD.set(0, name=self._label)
+        try:
+            with self.app.app_context():
+                DatabaseManager.release_lease(self.name, self.holder)
+        except Exception as e:
+            logger.error('❌ Error liberando lease %s: %s', self.name, e)
+
+    def hold(self, alive=None):
+        """Renueva el lease cada `ttl / 3` segundos hasta perderlo o `release()` (bloqueante).
+
+        Args:
+            alive: Función opcional sin argumentos que se consulta en cada
+                heartbeat; si retorna False se deja de renovar.
+        Returns:
+            'lost' si se perdió (vence sin poder renovarse o lo tomó otro
+            proceso), 'dead' si `alive()` retornó False, o None si se llamó
+            a `release()`.
+        """
+        while not self._stop.wait(self.ttl / 3):
+            if alive is not None and not alive():
+                return 'dead'
+            was_held = self.held
+            if not self.acquire() and was_held:
+                logger.warning('⚠️ Lease %s perdido por %s', self.name, self.holder)
+                return 'lost'
+        return None
+
+    def keep_alive(self, on_lost=None):
+        """Renueva el lease hasta `release()` (bloqueante), aunque se pierda en el camino.
+
+        Args:
+            on_lost: Callback sin argumentos que se llama cada vez que el
+                lease se pierde.
+        """
+        while self.hold() == 'lost':
+            if on_lost is not None:
+                on_lost()
+
+    def start_heartbeat(self, on_lost=None):
+        """Ejecuta `keep_alive` en un hilo daemon y lo retorna."""
+        t = threading.Thread(target=self.keep_alive, args=(on_lost,), daemon=True,
+                             name=f'lease-{self._label}')
+        t.start()
+        return t
+
+
+def start_as_leader(app, name, start_fn, stop_fn):
+    """Ejecuta un servicio solo mientras este proceso tenga el lease `name`.
+
+    En un hilo daemon espera (standby) hasta tomar el lease, llama a
+    `start_fn()` y lo mantiene con heartbeats. Si lo pierde, llama a
+    `stop_fn(handle)` para detener el servicio de forma ordenada y vuelve a
+    standby; `stop_fn` no debe retornar hasta que el servicio haya parado,
+    para no tener dos instancias en el mismo proceso. Si el servicio termina
+    por su cuenta (`handle.is_alive()` es False en un heartbeat), libera el
+    lease para que lo tome otro proceso y reintenta tras un TTL.
+
+    Args:
+        app: Aplicación Flask.
+        name: Nombre del lease exclusivo.
+        start_fn: Función sin argumentos que arranca el servicio y retorna un
+            handle con `is_alive()` (p.ej. su hilo).
+        stop_fn: Función que recibe ese handle y detiene el servicio.
+
+    Returns:
+        El hilo de elección (vive mientras el proceso tenga o espere el lease).
+    """
+    lease = Lease(app, name)
+
+    def _run():
+        while True:
+            if not lease.acquire():
+                logger.info('⏳ Lease %s tomado por otro proceso; %s queda en standby', name, WORKER_ID)
+                while not lease.acquire():
+                    time.sleep(lease.ttl / 3)
+            logger.info('👑 %s tomó el lease %s', WORKER_ID, name)
+            handle = start_fn()
+            reason = lease.hold(getattr(handle, 'is_alive', None))
+            if reason is None:
+                return
+            if reason == 'lost':
+                logger.warning('🛑 Lease %s perdido: deteniendo el servicio', name)
+                stop_fn(handle)
+            else:
+                logger.error('💀 El servicio del lease %s terminó solo; se libera el lease', name)
+                stop_fn(handle)
+                lease.give_up()
+                # Dar a los procesos en standby la oportunidad de tomarlo antes de reintentar aquí
+                time.sleep(lease.ttl)
+            logger.info('⏳ Servicio del lease %s detenido; %s vuelve a standby', name, WORKER_ID)
+
+    t = threading.Thread(target=_run, daemon=True, name=f'leader-{name}')
+    t.start()
+    return t
+
+
+class PollerMembership:
+    """Registro de pollers vivos y cálculo del shard de este proceso.
+
+    Args:
+        app: Aplicación Flask.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.lease = Lease(app, f'{POLLER_PREFIX}{WORKER_ID}')
+        self._last_shard = None
+
+    def start(self):
+        """Registra el poller, limpia registros de pollers muertos e inicia el heartbeat."""
+        self.lease.acquire()
+        try:
+            with self.app.app_context():
+                purged = DatabaseManager.purge_expired_leases(POLLER_PREFIX)
+            if purged:
+                logger.info('🧹 %d registro(s) de pollers vencidos eliminados', purged)
+        except Exception as e:
+            logger.error('❌ Error limpiando leases vencidos: %s', e)
+        self.lease.start_heartbeat()
+        # Al salir ordenadamente los demás pollers toman sus cuentas sin esperar el TTL
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """Sale del grupo: los demás pollers absorben sus cuentas en el próximo ciclo."""
+        self.lease.release()
+
+    def shard(self):
+        """Shard actual de este poller.
+
+        Returns:
+            Tupla `(index, total)`, o None si el poller no está registrado
+            (p.ej. la DB no responde); en ese caso conviene saltar el ciclo.
+        """
+        if not self.lease.held and not self.lease.acquire():
+            return None
+        with self.app.app_context():
+            holders = DatabaseManager.get_live_lease_holders(POLLER_PREFIX)
+        if WORKER_ID not in holders:
+            return None
+        current = (holders.index(WORKER_ID), len(holders))
+        if current != self._last_shard:
+            logger.info('🔀 Poller %s: shard %d de %d', WORKER_ID, current[0] + 1, current[1])
+            self._last_shard = current
+        return current
@@ -0,0 +1,140 @@
+"""Cifrado de credenciales IMAP y caché en memoria de credenciales descifradas.
+
+`APP_ENCRYPTION_KEY` acepta una o varias claves Fernet separadas por coma.
+La primera cifra y todas descifran (`MultiFernet`), lo que permite rotar
+claves sin downtime:
+
+  1. Agregar la clave nueva al inicio: `APP_ENCRYPTION_KEY=nueva,vieja`.
+  2. Re-cifrar las cuentas (`python -m app.scripts.rotate_encryption_key`).
+  3. Quitar la clave vieja.
+
+`CREDENTIALS` evita repetir el descifrado (HMAC + AES) de cada cuenta en
+cada ciclo del poller: guarda las credenciales descifradas por
+`(account_id, hash de los blobs cifrados)` durante
+`CREDENTIALS_CACHE_TTL` segundos. Si los blobs cambian (nueva contraseña o
+rotación) la clave del caché cambia y la entrada vieja se descarta.
+Al expirar o descartarse, los bytes en claro se sobrescriben con ceros.
+Python igualmente crea copias `str` inmutables al entregarlas a `imaplib`,
+así que esto reduce el tiempo de exposición pero no lo elimina.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from ..config import Config
+from .metrics import CREDENTIAL_CACHE
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=4)
+def _build_fernet(key_spec):
+    keys = [k.strip() for k in key_spec.split(',') if k.strip()]
+    return MultiFernet([Fernet(k) for k in keys])
+
+
+def get_fernet():
+    """Retorna el `MultiFernet` de `APP_ENCRYPTION_KEY` (se construye una vez por valor).
+
+    Raises:
+        RuntimeError: Si `APP_ENCRYPTION_KEY` no está definida.
+    """
+    key_spec = os.getenv('APP_ENCRYPTION_KEY')
+    if not key_spec or not key_spec.strip(' ,'):
+        # En ausencia de clave se lanza excepción para evitar guardar en claro
+        raise RuntimeError('APP_ENCRYPTION_KEY faltante')
+    return _build_fernet(key_spec)
+
+
+def _zeroize(buf):
+    buf[:] = bytes(len(buf))
+
+
+class CredentialCache:
+    """Caché TTL de credenciales IMAP descifradas por cuenta.
+
+    Args:
+        ttl: Segundos de validez de cada entrada (default
+            `Config.CREDENTIALS_CACHE_TTL`; 0 desactiva el caché).
+        clock: Reloj monotónico (inyectable para pruebas).
+    """
+
+    def __init__(self, ttl=None, clock=time.monotonic):
+        self.ttl = Config.CREDENTIALS_CACHE_TTL if ttl is None else ttl
+        self._clock = clock
+        self._entries = {}  # account_id -> (blob_hash, expires_at, user bytearray, password bytearray)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _blob_hash(account):
+        h = hashlib.sha256(account.imap_user_encrypted)
+        h.update(b'\0')
+        h.update(account.imap_password_encrypted)
+        return h.digest()
+
+    def _evict(self, account_id):
+        entry = self._entries.pop(account_id, None)
+        if entry is not None:
+            _zeroize(entry[2])
+            _zeroize(entry[3])
+
+    def get(self, account):
+        """Retorna `(usuario, contraseña)` de la cuenta, descifrando solo si no está en caché.
+
+        Raises:
+            RuntimeError: Si no se pueden descifrar (clave incorrecta o faltante).
+        """
+        blob_hash = self._blob_hash(account)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(account.id)
+            if entry is not None:
+                if entry[0] == blob_hash and entry[1] > now:
+                    CREDENTIAL_CACHE.inc(result='hit')
+                    return entry[2].decode(), entry[3].decode()
+                self._evict(account.id)
+
+        CREDENTIAL_CACHE.inc(result='miss')
+        f = get_fernet()
+        try:
+            user = bytearray(f.decrypt(account.imap_user_encrypted))
+            password = bytearray(f.decrypt(account.imap_password_encrypted))
+        except InvalidToken:
+            raise RuntimeError('No se pudo descifrar credenciales (clave incorrecta)')
+        result = (user.decode(), password.decode())
+
+        if self.ttl > 0 and account.id is not None:
+            with self._lock:
+                self._evict(account.id)
+                self._entries[account.id] = (blob_hash, now + self.ttl, user, password)
+                self._purge_expired(now)
+        else:
+            _zeroize(user)
+            _zeroize(password)
+        return result
+
+    def _purge_expired(self, now):
+        for account_id in [k for k, e in self._entries.items() if e[1] <= now]:
+            self._evict(account_id)
+
+    def invalidate(self, account_id):
+        """Descarta las credenciales en caché de una cuenta."""
+        with self._lock:
+            self._evict(account_id)
+
+    def clear(self):
+        """Descarta todas las entradas (p.ej. tras rotar claves)."""
+        with self._lock:
+            for account_id in list(self._entries):
+                self._evict(account_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+CREDENTIALS = CredentialCache()
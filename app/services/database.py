@@ -1,5 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import logging
 
 # Logger para este módulo
@@ -8,6 +8,33 @@ logger = logging.getLogger(__name__)
 db = SQLAlchemy()
 
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Aplica los PRAGMA de `Config` a cada conexión SQLite nueva."""
+    from ..config import Config
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f'PRAGMA journal_mode={Config.SQLITE_JOURNAL_MODE}')
+        cursor.execute(f'PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}')
+        cursor.execute(f'PRAGMA busy_timeout={int(Config.SQLITE_BUSY_TIMEOUT)}')
+        cursor.execute(f'PRAGMA mmap_size={int(Config.SQLITE_MMAP_SIZE)}')
+        cursor.execute(f'PRAGMA cache_size={int(Config.SQLITE_CACHE_SIZE)}')
+    finally:
+        cursor.close()
+
+
+def configure_engine(app):
+    """Registra los ajustes por conexión del motor de la app (PRAGMA en SQLite).
+
+    Debe llamarse tras `db.init_app(app)` y antes de la primera conexión.
+    """
+    from sqlalchemy import event
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', _set_sqlite_pragmas):
+        event.listen(engine, 'connect', _set_sqlite_pragmas)
+    return engine
+
+
 class DatabaseManager:
     """Maneja todas las operaciones de base de datos"""
     
@@ -21,17 +48,63 @@ class DatabaseManager:
         return dt.astimezone(timezone.utc)
     
     @staticmethod
-    def get_enabled_accounts():
-        """Obtiene todas las cuentas habilitadas"""
+    def get_enabled_accounts(shard=None):
+        """Obtiene todas las cuentas habilitadas.
+
+        Args:
+            shard: Tupla opcional `(index, total)`; si se indica, solo retorna
+                las cuentas con `id % total == index`.
+        """
         from ..models import Account
-        return Account.query.filter_by(enabled=True).all()
+        query = Account.query.filter_by(enabled=True)
+        if shard is not None:
+            index, total = shard
+            query = query.filter(Account.id % total == index)
+        return query.order_by(Account.id).all()
     
+    @staticmethod
+    def get_enabled_account_ids(shard=None):
+        """IDs de las cuentas habilitadas (opcionalmente de un shard `(index, total)`)."""
+        from ..models import Account
+        query = db.session.query(Account.id).filter(Account.enabled.is_(True))
+        if shard is not None:
+            index, total = shard
+            query = query.filter(Account.id % total == index)
+        return [r[0] for r in query.all()]
+
+    @staticmethod
+    def get_accounts_by_ids(account_ids):
+        """Obtiene las cuentas habilitadas con los IDs indicados, ordenadas por ID."""
+        from ..models import Account
+        if not account_ids:
+            return []
+        return (Account.query.filter(Account.id.in_(list(account_ids)), Account.enabled.is_(True))
+                .order_by(Account.id).all())
+
+    @staticmethod
+    def disable_account(account_id):
+        """Deshabilita una cuenta (p.ej. por credenciales IMAP inválidas)."""
+        from ..models import Account
+        Account.query.filter_by(id=account_id).update({'enabled': False}, synchronize_session=False)
+        db.session.commit()
+
     @staticmethod
     def is_duplicate_transaction(email_id):
         """Verifica si ya existe una transacción con este email ID"""
         from ..models import Transaction
         return Transaction.query.filter_by(raw_email_id=email_id).first() is not None
     
+    @staticmethod
+    def get_existing_email_ids(email_ids):
+        """Retorna el subconjunto de `email_ids` que ya tiene transacción (una sola query)."""
+        from ..models import Transaction
+        if not email_ids:
+            return set()
+        rows = db.session.query(Transaction.raw_email_id).filter(
+            Transaction.raw_email_id.in_(list(email_ids))
+        ).all()
+        return {r[0] for r in rows}
+
     @staticmethod
     def get_user_for_account(account):
         """Obtiene el primer usuario con chat_id para una cuenta"""
@@ -39,16 +112,19 @@ class DatabaseManager:
                    account.users[0] if account.users else None)
     
     @staticmethod
-    def create_pending_transaction(email_data, user):
-        """Crea una transacción pendiente de confirmación del usuario"""
-        from ..models import Transaction
-        
+    def _add_pending_transaction(email_data, user, notify):
+        """Agrega a la sesión una transacción pendiente y, si corresponde, su outbox."""
+        from ..models import Transaction, NotificationOutbox
+        from .money import normalize_currency, to_minor
+
         # Normalizar fecha a UTC
         date_utc = DatabaseManager._ensure_utc(email_data['date'])
-        
+        currency = normalize_currency(email_data.get('currency'))
+
         tx = Transaction(
             date=date_utc,
-            amount=email_data['amount'],
+            amount_minor=to_minor(email_data['amount'], currency),
+            currency=currency,
             merchant=email_data['merchant'],
             type=email_data['type'],
             description=None,  # Será llenado por el usuario vía Telegram
@@ -57,9 +133,69 @@ class DatabaseManager:
             user=user
         )
         db.session.add(tx)
-        db.session.commit()
+        if notify and user.chat_id:
+            db.session.add(NotificationOutbox(transaction=tx, user_id=user.id, chat_id=user.chat_id))
+        return tx
+
+    @staticmethod
+    def create_pending_transaction(email_data, user, notify=True):
+        """Crea una transacción pendiente de confirmación del usuario.
+
+        Si `notify` es True y el usuario tiene `chat_id`, agrega en la misma
+        transacción de DB una fila en `notification_outbox` para que el bot
+        la notifique.
+
+        Returns:
+            La transacción creada, o None si otro proceso ya insertó el mismo
+            `raw_email_id` (p.ej. dos pollers durante un cambio de shards).
+        """
+        from sqlalchemy.exc import IntegrityError
+
+        tx = DatabaseManager._add_pending_transaction(email_data, user, notify)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            logger.info('Email ya registrado por otro proceso: %s', email_data['email_id'])
+            return None
         return tx
     
+    @staticmethod
+    def create_pending_transactions(email_data_list, user, notify=True):
+        """Crea varias transacciones pendientes (y su outbox) en un solo commit.
+
+        Si el lote choca con un `raw_email_id` existente, se revierte y se
+        reintenta fila por fila omitiendo los duplicados.
+
+        Args:
+            email_data_list: Lista de diccionarios como los de `create_pending_transaction`.
+            user: Usuario propietario.
+            notify: Si se agregan filas al outbox de notificaciones.
+        Returns:
+            Lista de transacciones creadas.
+        """
+        from sqlalchemy.exc import IntegrityError
+
+        if not email_data_list:
+            return []
+        try:
+            txs = [DatabaseManager._add_pending_transaction(d, user, notify) for d in email_data_list]
+            db.session.commit()
+            return txs
+        except IntegrityError:
+            db.session.rollback()
+
+        created = []
+        for email_data in email_data_list:
+            try:
+                tx = DatabaseManager._add_pending_transaction(email_data, user, notify)
+                db.session.commit()
+                created.append(tx)
+            except IntegrityError:
+                db.session.rollback()
+                logger.debug('Email duplicado al insertar: %s', email_data['email_id'])
+        return created
+
     @staticmethod
     def update_last_checked(account, new_date):
         """Actualiza la fecha de última revisión de una cuenta"""
@@ -70,17 +206,414 @@ class DatabaseManager:
             account.last_checked = new_date_utc
             db.session.commit()
     
+    # --- Outbox de notificaciones ---
     @staticmethod
-    def update_transaction_description(transaction_id, description, category):
-        """Actualiza la descripción y categoría de una transacción"""
-        from ..models import Transaction
-        
-        tx = Transaction.query.get(transaction_id)
-        if tx:
-            tx.description = description
-            tx.category = category
+    def claim_due_notifications(limit: int = 100, claim_seconds: int = 600):
+        """Reclama notificaciones pendientes cuyo próximo intento ya venció.
+
+        Las filas reclamadas se reprograman `claim_seconds` hacia adelante
+        (lease), de modo que si el proceso muere antes de confirmarlas vuelven
+        a quedar disponibles. En Postgres usa `FOR UPDATE SKIP LOCKED`.
+
+        Se reclaman todas las filas vencidas de cada chat presente entre las
+        `limit` más antiguas, para que el dispatcher decida entre resumen o
+        envíos individuales con el total del chat y no con un recorte.
+
+        Args:
+            limit: Cantidad de notificaciones vencidas (las más antiguas) que
+                determinan qué chats se reclaman.
+            claim_seconds: Duración del lease en segundos.
+        Returns:
+            Lista de diccionarios con `outbox_id`, `chat_id`, `attempts` y los
+            datos de la transacción (`transaction_id`, `date`, `amount`, `currency`,
+            `merchant`, `type`, `category`).
+        """
+        from ..models import NotificationOutbox, Transaction
+        now = datetime.now(timezone.utc)
+        due = (NotificationOutbox.status == 'pending', NotificationOutbox.next_attempt_at <= now)
+        chat_ids = {
+            chat_id for (chat_id,) in
+            db.session.query(NotificationOutbox.chat_id).filter(*due)
+            .order_by(NotificationOutbox.id).limit(limit).all()
+        }
+        if not chat_ids:
             db.session.commit()
-        return tx
+            return []
+        rows = (
+            db.session.query(NotificationOutbox, Transaction)
+            .join(Transaction, NotificationOutbox.transaction_id == Transaction.id)
+            .filter(*due, NotificationOutbox.chat_id.in_(chat_ids))
+            .order_by(NotificationOutbox.id)
+            .with_for_update(skip_locked=True, of=NotificationOutbox)
+            .all()
+        )
+        lease_until = now + timedelta(seconds=claim_seconds)
+        claimed = []
+        for outbox, tx in rows:
+            outbox.next_attempt_at = lease_until
+            claimed.append({
+                'outbox_id': outbox.id,
+                'chat_id': outbox.chat_id,
+                'attempts': outbox.attempts,
+                'transaction_id': tx.id,
+                'date': tx.date,
+                'amount': tx.amount,
+                'currency': tx.currency,
+                'merchant': tx.merchant,
+                'type': tx.type,
+                'category': tx.category,
+            })
+        db.session.commit()
+        return claimed
+
+    @staticmethod
+    def mark_notifications_sent(outbox_ids, message_links=None):
+        """Marca notificaciones del outbox como enviadas.
+
+        Args:
+            outbox_ids: IDs de filas del outbox.
+            message_links: Lista opcional de tuplas `(chat_id, message_id,
+                transaction_id)` para indexar los mensajes enviados y resolver
+                luego las respuestas del usuario.
+        """
+        from ..models import NotificationOutbox, TelegramMessage
+        if not outbox_ids:
+            return
+        NotificationOutbox.query.filter(NotificationOutbox.id.in_(outbox_ids)).update(
+            {'status': 'sent', 'sent_at': datetime.now(timezone.utc), 'last_error': None},
+            synchronize_session=False,
+        )
+        for chat_id, message_id, transaction_id in message_links or ():
+            db.session.merge(TelegramMessage(chat_id=str(chat_id), message_id=message_id,
+                                             transaction_id=transaction_id))
+        db.session.commit()
+
+    @staticmethod
+    def get_transaction_id_for_reply(user_id: int, chat_id: str, message_id: int):
+        """Resuelve a qué transacción del usuario corresponde un mensaje del bot.
+
+        Args:
+            user_id: ID del usuario que responde (se valida la pertenencia).
+            chat_id: ID del chat de Telegram.
+            message_id: ID del mensaje del bot al que se respondió.
+        Returns:
+            ID de la transacción o None si el mensaje no está indexado o la
+            transacción no pertenece al usuario.
+        """
+        from ..models import TelegramMessage, Transaction
+        row = (
+            db.session.query(Transaction.id)
+            .join(TelegramMessage, TelegramMessage.transaction_id == Transaction.id)
+            .filter(
+                TelegramMessage.chat_id == str(chat_id),
+                TelegramMessage.message_id == message_id,
+                Transaction.user_id == user_id,
+            )
+            .first()
+        )
+        return row[0] if row else None
+
+    @staticmethod
+    def get_unindexed_transaction_id(user_id: int, transaction_id: int):
+        """Valida el `#<id>` de una notificación enviada antes de `telegram_messages`.
+
+        Solo acepta transacciones del usuario sin ningún mensaje indexado: las
+        notificadas después del índice se resuelven únicamente por
+        `get_transaction_id_for_reply`.
+
+        Returns:
+            `transaction_id` si es una transacción del usuario sin índice; None si no.
+        """
+        from ..models import TelegramMessage, Transaction
+        indexed = db.select(TelegramMessage.transaction_id).where(TelegramMessage.transaction_id == Transaction.id)
+        return db.session.scalar(
+            db.select(Transaction.id).where(
+                Transaction.id == transaction_id,
+                Transaction.user_id == user_id,
+                ~indexed.exists(),
+            )
+        )
+
+    @staticmethod
+    def mark_notifications_failed(outbox_ids, error: str, max_attempts: int = 8,
+                                  backoff_base: int = 30, backoff_max: int = 3600):
+        """Registra un intento fallido y reprograma con backoff exponencial.
+
+        Al alcanzar `max_attempts` la notificación queda en estado `failed`.
+
+        Args:
+            outbox_ids: IDs de filas del outbox.
+            error: Descripción del error (se trunca).
+            max_attempts: Intentos máximos antes de abandonar.
+            backoff_base: Espera base en segundos (se duplica por intento).
+            backoff_max: Espera máxima en segundos.
+        """
+        from ..models import NotificationOutbox
+        if not outbox_ids:
+            return
+        now = datetime.now(timezone.utc)
+        rows = NotificationOutbox.query.filter(NotificationOutbox.id.in_(outbox_ids)).all()
+        for row in rows:
+            row.attempts = (row.attempts or 0) + 1
+            row.last_error = (error or '')[:1000]
+            if row.attempts >= max_attempts:
+                row.status = 'failed'
+                logger.error('Notificación outbox_id=%s abandonada tras %d intentos: %s',
+                             row.id, row.attempts, row.last_error)
+            else:
+                delay = min(backoff_base * (2 ** (row.attempts - 1)), backoff_max)
+                row.next_attempt_at = now + timedelta(seconds=delay)
+        db.session.commit()
+
+    @staticmethod
+    def count_pending_notifications():
+        """Cuenta las notificaciones aún pendientes en el outbox."""
+        from ..models import NotificationOutbox
+        return NotificationOutbox.query.filter_by(status='pending').count()
+
+    # --- Updates de Telegram recibidos por webhook ---
+    @staticmethod
+    def store_inbound_update(update_id: int, payload: str) -> bool:
+        """Persiste un update del webhook para que lo consuma el bot líder.
+
+        Args:
+            update_id: `update_id` de Telegram.
+            payload: JSON del update.
+        Returns:
+            True si se guardó; False si ya estaba (reintento de Telegram).
+        """
+        from sqlalchemy.exc import IntegrityError
+        from ..models import TelegramInboundUpdate
+        try:
+            db.session.add(TelegramInboundUpdate(update_id=update_id, payload=payload))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    @staticmethod
+    def claim_inbound_updates(limit: int = 100, claim_seconds: int = 120):
+        """Reclama los updates sin procesar más antiguos (lease `claimed_until`).
+
+        Omite los reclamados cuyo lease sigue vigente; al vencer (el bot murió
+        antes de procesarlos) vuelven a entregarse. En Postgres usa
+        `FOR UPDATE SKIP LOCKED`.
+
+        Args:
+            limit: Máximo de updates a reclamar.
+            claim_seconds: Duración del lease en segundos.
+        Returns:
+            Lista de tuplas `(update_id, payload)` en orden de `update_id`.
+        """
+        from ..models import TelegramInboundUpdate
+        now = datetime.now(timezone.utc)
+        rows = (
+            TelegramInboundUpdate.query
+            .filter(TelegramInboundUpdate.processed_at.is_(None),
+                    db.or_(TelegramInboundUpdate.claimed_until.is_(None),
+                           TelegramInboundUpdate.claimed_until < now))
+            .order_by(TelegramInboundUpdate.update_id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        claimed = []
+        for row in rows:
+            row.claimed_until = now + timedelta(seconds=claim_seconds)
+            claimed.append((row.update_id, row.payload))
+        db.session.commit()
+        return claimed
+
+    @staticmethod
+    def is_inbound_update_processed(update_id: int) -> bool:
+        """True si el update del webhook ya terminó de procesarse."""
+        from ..models import TelegramInboundUpdate
+        return db.session.scalar(
+            db.select(TelegramInboundUpdate.processed_at).where(TelegramInboundUpdate.update_id == update_id)
+        ) is not None
+
+    @staticmethod
+    def mark_inbound_update_processed(update_id: int):
+        """Marca un update del webhook como procesado (los handlers ya corrieron)."""
+        from ..models import TelegramInboundUpdate
+        TelegramInboundUpdate.query.filter_by(update_id=update_id, processed_at=None).update(
+            {'processed_at': datetime.now(timezone.utc)}, synchronize_session=False)
+        db.session.commit()
+
+    @staticmethod
+    def purge_inbound_updates(retention_seconds: float):
+        """Borra updates procesados hace más de `retention_seconds`; retorna cuántos."""
+        from ..models import TelegramInboundUpdate
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=retention_seconds)
+        deleted = TelegramInboundUpdate.query.filter(TelegramInboundUpdate.processed_at < cutoff).delete(
+            synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    # --- Coordinación entre procesos (leases) ---
+    @staticmethod
+    def acquire_lease(name: str, holder: str, ttl_seconds: float) -> bool:
+        """Toma o renueva el lease `name` para `holder` por `ttl_seconds`.
+
+        Lo logra si el lease no existe, ya es de `holder` o está vencido. El
+        UPDATE condicional y la clave primaria hacen la operación atómica
+        entre procesos.
+
+        Args:
+            name: Nombre del lease.
+            holder: Identificador del proceso que lo pide.
+            ttl_seconds: Segundos de validez desde ahora.
+        Returns:
+            True si `holder` es dueño del lease al terminar.
+        """
+        from sqlalchemy.exc import IntegrityError
+        from ..models import WorkerLease
+        now = datetime.now(timezone.utc)
+        expires = now + timedelta(seconds=ttl_seconds)
+        updated = WorkerLease.query.filter(
+            WorkerLease.name == name,
+            db.or_(WorkerLease.holder == holder, WorkerLease.expires_at < now),
+        ).update({'holder': holder, 'expires_at': expires, 'heartbeat_at': now}, synchronize_session=False)
+        if updated:
+            db.session.commit()
+            return True
+        try:
+            db.session.add(WorkerLease(name=name, holder=holder, expires_at=expires, heartbeat_at=now))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    @staticmethod
+    def release_lease(name: str, holder: str):
+        """Libera el lease `name` si todavía pertenece a `holder`."""
+        from ..models import WorkerLease
+        WorkerLease.query.filter_by(name=name, holder=holder).delete(synchronize_session=False)
+        db.session.commit()
+
+    @staticmethod
+    def get_live_lease_holders(prefix: str):
+        """Dueños (ordenados) de los leases vigentes cuyo nombre empieza con `prefix`."""
+        from ..models import WorkerLease
+        now = datetime.now(timezone.utc)
+        rows = (
+            db.session.query(WorkerLease.holder)
+            .filter(WorkerLease.name.startswith(prefix, autoescape=True), WorkerLease.expires_at >= now)
+            .order_by(WorkerLease.holder)
+            .all()
+        )
+        return [r[0] for r in rows]
+
+    @staticmethod
+    def purge_expired_leases(prefix: str, grace_seconds: float = 3600):
+        """Borra leases `prefix*` vencidos hace más de `grace_seconds`."""
+        from ..models import WorkerLease
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+        deleted = WorkerLease.query.filter(
+            WorkerLease.name.startswith(prefix, autoescape=True), WorkerLease.expires_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    # --- Etiquetado rápido de transacciones pendientes (/pendientes) ---
+    @staticmethod
+    def get_pending_transactions_for_user(user_id: int, limit: int = 10, exclude_ids=None,
+                                          suggestions: int = 3):
+        """Obtiene una página de transacciones sin descripción con categorías sugeridas.
+
+        Las sugerencias se basan, en orden, en las categorías que el usuario ya
+        asignó al mismo comercio, la categoría sugerida al parsear el correo y
+        las categorías más usadas por el usuario. No llama al LLM.
+
+        Args:
+            user_id: ID del usuario propietario.
+            limit: Tamaño de la página.
+            exclude_ids: IDs a omitir (p.ej. ya vistas en la sesión de /pendientes).
+            suggestions: Cantidad máxima de categorías sugeridas por transacción.
+        Returns:
+            Tupla `(items, total)` donde `items` es una lista de diccionarios
+            (`id`, `date`, `amount`, `currency`, `merchant`, `type`, `category`,
+            `suggestions`) y `total` la cantidad de pendientes (sin excluidas).
+        """
+        from ..models import Transaction, TransactionRow
+
+        pending = [Transaction.user_id == user_id, Transaction.description.is_(None),
+                   Transaction.labelled_at.is_(None)]
+        if exclude_ids:
+            pending.append(~Transaction.id.in_(list(exclude_ids)))
+        total = db.session.scalar(db.select(db.func.count(Transaction.id)).where(*pending))
+        rows = db.session.execute(db.select(*TransactionRow.columns()).where(*pending)
+                                  .order_by(Transaction.date.asc(), Transaction.id.asc()).limit(limit))
+        txs = [TransactionRow(*row) for row in rows]
+        if not txs:
+            return [], total
+
+        labelled = db.session.query(Transaction.category, db.func.count(Transaction.id)).filter(
+            Transaction.user_id == user_id,
+            db.or_(Transaction.description.isnot(None), Transaction.labelled_at.isnot(None)),
+            Transaction.category.isnot(None),
+        )
+        merchants = {t.merchant for t in txs if t.merchant}
+        by_merchant = {}
+        if merchants:
+            rows = (labelled.add_columns(Transaction.merchant)
+                    .filter(Transaction.merchant.in_(merchants))
+                    .group_by(Transaction.merchant, Transaction.category)
+                    .all())
+            for category, count, merchant in rows:
+                by_merchant.setdefault(merchant, []).append((count, category))
+        top = [c for c, _ in labelled.group_by(Transaction.category)
+               .order_by(db.func.count(Transaction.id).desc())
+               .limit(suggestions).all()]
+
+        items = []
+        for t in txs:
+            ranked = [c for _, c in sorted(by_merchant.get(t.merchant, []), key=lambda x: -x[0])]
+            seen, options = set(), []
+            for c in ranked + [t.category] + top:
+                key = (c or '').strip().lower()
+                if key and key not in seen:
+                    seen.add(key)
+                    options.append(c.strip())
+            items.append({
+                'id': t.id,
+                'date': t.date,
+                'amount': t.amount,
+                'currency': t.currency,
+                'merchant': t.merchant,
+                'type': t.type,
+                'category': t.category,
+                'suggestions': options[:suggestions] or ['otros'],
+            })
+        return items, total
+
+    @staticmethod
+    def label_transactions_for_user(user_id: int, labels):
+        """Asigna categorías a varias transacciones del usuario en un solo commit.
+
+        Solo modifica `category` y marca `labelled_at`, que saca a la
+        transacción de las pendientes; la descripción (texto del usuario) no
+        se toca.
+
+        Args:
+            user_id: ID del usuario propietario.
+            labels: Lista de tuplas `(transaction_id, category)`.
+        Returns:
+            Lista de IDs efectivamente actualizados (los ajenos se ignoran).
+        """
+        from ..models import Transaction
+        if not labels:
+            return []
+        wanted = dict(labels)
+        txs = Transaction.query.filter(Transaction.user_id == user_id, Transaction.id.in_(list(wanted))).all()
+        now = datetime.now(timezone.utc)
+        for tx in txs:
+            tx.category = (wanted[tx.id] or '').strip() or None
+            tx.labelled_at = now
+        db.session.commit()
+        return [tx.id for tx in txs]
 
     # --- Nuevos métodos para centralizar lógica usada en routes.py ---
     @staticmethod
@@ -95,6 +628,12 @@ class DatabaseManager:
         from ..models import User
         return User.query.filter_by(username=username).first()
 
+    @staticmethod
+    def rehash_user_password(user, password: str):
+        """Re-hashea la contraseña del usuario con el costo actual de bcrypt y guarda."""
+        user.set_password(password)
+        db.session.commit()
+
     @staticmethod
     def get_transactions_for_user(user_id: int, q: str = '', category: str = '', ttypes=None,
                                   start=None, end=None, limit: int = 2000):
@@ -113,27 +652,37 @@ class DatabaseManager:
             end: datetime de término (UTC) exclusivo.
             limit: Límite de filas a retornar.
         Returns:
-            Lista de instancias Transaction.
+            Lista de `TransactionRow` de solo lectura (no quedan en la sesión).
         """
-        from ..models import Transaction
+        from ..models import Transaction, TransactionRow
+
+        stmt = db.select(*TransactionRow.columns()).where(
+            *DatabaseManager._transaction_filters(user_id, category, ttypes, start, end))
+        rows = db.session.execute(stmt.order_by(Transaction.date.desc()).limit(limit))
+        txs = [TransactionRow(*row) for row in rows]
+
+        if q:
+            txs = [t for t in txs if DatabaseManager._matches_query(t, q)]
+        return txs
 
-        query = Transaction.query.filter_by(user_id=user_id)
+    @staticmethod
+    def _transaction_filters(user_id: int, category: str = '', ttypes=None, start=None, end=None):
+        """Condiciones SQL de los filtros de listado (todo salvo la búsqueda libre `q`)."""
+        from ..models import Transaction
+        where = [Transaction.user_id == user_id]
         if start and end:
-            query = query.filter(Transaction.date >= start, Transaction.date < end)
+            where += [Transaction.date >= start, Transaction.date < end]
         if category:
-            query = query.filter(db.func.lower(Transaction.category).contains(category))
+            where.append(db.func.lower(Transaction.category).contains(category))
         if ttypes:
-            query = query.filter(Transaction.type.in_(ttypes))
-
-        txs = query.order_by(Transaction.date.desc()).limit(limit).all()
+            where.append(Transaction.type.in_(ttypes))
+        return where
 
-        if q:
-            q_norm = (q or '').strip().lower()
-            def match_q(t):
-                blob = f"{t.merchant or ''} {t.description or ''} {t.category or ''} {t.type or ''}".lower()
-                return q_norm in blob
-            txs = [t for t in txs if match_q(t)]
-        return txs
+    @staticmethod
+    def _matches_query(t, q: str) -> bool:
+        """Búsqueda libre en memoria (comercio, descripción, categoría y tipo)."""
+        blob = f"{t.merchant or ''} {t.description or ''} {t.category or ''} {t.type or ''}".lower()
+        return (q or '').strip().lower() in blob
 
     @staticmethod
     def update_transaction_for_user(user_id: int, transaction_id: int, description=None, category=None):
@@ -158,3 +707,104 @@ class DatabaseManager:
             tx.category = (category or '').strip() or None
         db.session.commit()
         return tx
+
+    @staticmethod
+    def _clean_text(value):
+        """Texto sin espacios extremos; None si queda vacío."""
+        return str(value).strip() or None
+
+    @staticmethod
+    def bulk_update_transactions_for_user(user_id: int, changes):
+        """Actualiza descripción y/o categoría de varias transacciones en un solo commit.
+
+        La propiedad se valida con una sola consulta `IN`; los cambios se
+        aplican con un UPDATE por clave primaria ejecutado en lote (agrupado
+        por campos modificados). Si un ID aparece repetido, gana el último.
+
+        Args:
+            user_id: ID del usuario propietario.
+            changes: Lista de diccionarios `{id, description?, category?}`; los
+                campos ausentes o `None` no se modifican y una cadena vacía
+                los borra (igual que `update_transaction_for_user`).
+        Returns:
+            Lista de resultados por ítem, en el orden recibido:
+            `{'id', 'ok'}` más `'error'` si no se aplicó (`id inválido`,
+            `sin cambios`, `no encontrado`).
+        """
+        from ..models import Transaction
+
+        parsed, updates = [], {}
+        for item in changes:
+            try:
+                tx_id = int(item.get('id'))
+            except (AttributeError, TypeError, ValueError):
+                parsed.append((item.get('id') if isinstance(item, dict) else None, 'id inválido'))
+                continue
+            fields = {k: DatabaseManager._clean_text(item[k])
+                      for k in ('description', 'category') if item.get(k) is not None}
+            if not fields:
+                parsed.append((tx_id, 'sin cambios'))
+                continue
+            updates.setdefault(tx_id, {}).update(fields)
+            parsed.append((tx_id, None))
+
+        owned = set()
+        if updates:
+            owned = set(db.session.scalars(
+                db.select(Transaction.id).where(Transaction.user_id == user_id, Transaction.id.in_(list(updates)))
+            ))
+            table = Transaction.__table__
+            stmt = table.update().where(table.c.id == db.bindparam('_id'), table.c.user_id == user_id)
+            groups = {}
+            for tx_id in owned:
+                fields = updates[tx_id]
+                groups.setdefault(tuple(sorted(fields)), []).append({'_id': tx_id, **fields})
+            for params in groups.values():
+                db.session.execute(stmt, params)
+            db.session.commit()
+
+        results = []
+        for tx_id, error in parsed:
+            if error is None and tx_id not in owned:
+                error = 'no encontrado'
+            results.append({'id': tx_id, 'ok': error is None, **({'error': error} if error else {})})
+        return results
+
+    @staticmethod
+    def recategorize_transactions_for_user(user_id: int, new_category: str, q: str = '', category: str = '',
+                                           ttypes=None, start=None, end=None, dry_run: bool = False):
+        """Asigna `new_category` a todas las transacciones que calzan con los filtros.
+
+        Usa los mismos filtros que `get_transactions_for_user` pero sin límite
+        de filas. Sin `q` es un único UPDATE; con `q` se leen solo las columnas
+        de búsqueda, se filtra en memoria (misma semántica que el listado) y se
+        actualiza por lotes de IDs. Todo en un solo commit.
+
+        Args:
+            dry_run: Solo contar las transacciones que calzan, sin modificar.
+        Returns:
+            Cantidad de transacciones que calzan (`dry_run`) o actualizadas.
+        """
+        from ..models import Transaction
+
+        table = Transaction.__table__
+        values = {'category': DatabaseManager._clean_text(new_category or '')}
+        where = DatabaseManager._transaction_filters(user_id, category, ttypes, start, end)
+        if not q:
+            if dry_run:
+                return db.session.scalar(db.select(db.func.count(Transaction.id)).where(*where))
+            updated = db.session.execute(table.update().where(*where).values(values)).rowcount
+        else:
+            rows = db.session.execute(db.select(Transaction.id, Transaction.merchant, Transaction.description,
+                                                Transaction.category, Transaction.type).where(*where))
+            ids = [r.id for r in rows if DatabaseManager._matches_query(r, q)]
+            if dry_run:
+                return len(ids)
+            updated = 0
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                updated += db.session.execute(
+                    table.update().where(table.c.user_id == user_id, table.c.id.in_(chunk)).values(values)
+                ).rowcount
+        db.session.commit()
+        return updated
@@ -1,21 +1,111 @@
 import imaplib
-from bs4 import BeautifulSoup
 import email
 import email.utils
 from email.header import decode_header
+from html import unescape as html_unescape
 import time
 import re
 from datetime import datetime, timezone
 from ..config import Config
+from .coordination import PollerMembership
 from .database import DatabaseManager
 from .llm import parse_email
-from .telegram_bot import notify_new_transaction
+from .profiling import maybe_profile
+from .metrics import (ACCOUNTS_DISABLED, EMAILS_TOTAL, IMAP_SECONDS, POLL_ACCOUNT_ERRORS, POLL_AUTH_FAILURES,
+                      POLL_CYCLE_SECONDS, POLL_LAST_SUCCESS, TRANSACTIONS_CREATED)
+from .scheduler import AccountScheduler
 import logging
 
 # Logger para este módulo
 logger = logging.getLogger(__name__)
 
 
+# Bloques sin texto visible que se descartan antes de tokenizar
+_INVISIBLE_BLOCKS = re.compile(r'<(script|style|template)\b.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+# Cualquier etiqueta (apertura, cierre, doctype); no se parsean atributos.
+# Un '<' seguido de espacio o dígito es texto, igual que en html.parser.
+_HTML_TAG = re.compile(r'<[!/?a-zA-Z][^>]*>')
+
+
+def html_to_text(html, max_chars=None):
+    """Extrae el texto visible de un documento HTML con un tokenizador liviano.
+
+    Equivalente a `BeautifulSoup(html).get_text(separator="\n", strip=True)`
+    para correos bancarios, pero sin construir el árbol ni parsear atributos:
+    descarta `script`/`style`/comentarios, separa por etiquetas, decodifica
+    entidades y recorta cada nodo de texto, descartando los vacíos. Corta al
+    acumular `max_chars` caracteres.
+
+    Args:
+        html: Contenido HTML.
+        max_chars: Límite opcional de caracteres del resultado.
+
+    Returns:
+        Texto con un nodo de texto por línea.
+    """
+    parts = []
+    size = 0
+    for chunk in _HTML_TAG.split(_INVISIBLE_BLOCKS.sub('<br>', html)):
+        text = html_unescape(chunk).strip() if '&' in chunk else chunk.strip()
+        if not text:
+            continue
+        parts.append(text)
+        size += len(text) + 1
+        if max_chars and size >= max_chars:
+            break
+    text = '\n'.join(parts)
+    return text[:max_chars] if max_chars else text
+
+
+def _decode_part(part, max_bytes=None):
+    """Decodifica el payload de una parte MIME a texto, opcionalmente truncado."""
+    payload = part.get_payload(decode=True) or b''
+    if max_bytes:
+        payload = payload[:max_bytes]
+    return payload.decode(part.get_content_charset() or "utf-8", errors="ignore")
+
+
+def extract_text_from_message(msg, max_chars=None, max_html_bytes=None):
+    """Extrae el cuerpo textual de un mensaje MIME deteniéndose en la primera parte útil.
+
+    Recorre las partes en orden y retorna la primera `text/plain` que no sea
+    adjunto. Si no hay, convierte a texto la primera `text/html` con
+    `html_to_text`. Solo se decodifica la parte elegida.
+
+    Args:
+        msg: Mensaje de correo (`email.message.Message`).
+        max_chars: Límite de caracteres del texto retornado.
+        max_html_bytes: Límite de bytes del HTML a parsear.
+
+    Returns:
+        Texto del cuerpo del mensaje o None si no pudo extraerse.
+    """
+    html_part = None
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        content_type = part.get_content_type()
+        if content_type not in ("text/plain", "text/html"):
+            continue
+        if "attachment" in str(part.get("Content-Disposition")):
+            continue
+        if content_type == "text/plain":
+            # Un carácter UTF-8 ocupa a lo más 4 bytes
+            text = _decode_part(part, max_chars * 4 if max_chars else None)
+            if text.strip():
+                return text[:max_chars] if max_chars else text
+        elif html_part is None:
+            html_part = part
+
+    if html_part is not None:
+        return html_to_text(_decode_part(html_part, max_html_bytes), max_chars) or None
+    return None
+
+
+class ImapAuthError(Exception):
+    """El servidor IMAP rechazó el login de la cuenta (credenciales inválidas)."""
+
+
 class EmailProcessor:
     """Procesa correos electrónicos de una cuenta IMAP y extrae transacciones.
 
@@ -26,15 +116,19 @@ class EmailProcessor:
         imap_password: Contraseña IMAP asociada a la cuenta (obtenida desde la cuenta).
     """
     
-    def __init__(self, account):
+    def __init__(self, account, load_credentials=True):
         """Inicializa el procesador para una cuenta IMAP.
 
         Args:
             account: Instancia que representa la cuenta a procesar. Debe proveer
                 `get_imap_credentials()`, `imap_host`, `last_checked`, etc.
+            load_credentials: Si es False no descifra las credenciales IMAP
+                (p.ej. para procesar correos desde un archivo local).
         """
         self.account = account
-        self.imap_user, self.imap_password = account.get_imap_credentials()
+        self.imap_user = self.imap_password = None
+        if load_credentials:
+            self.imap_user, self.imap_password = account.get_imap_credentials()
     
     def _decode_header(self, val):
         """Decodifica un header MIME (RFC 2047) a texto Unicode.
@@ -63,8 +157,9 @@ class EmailProcessor:
     def extract_text_from_email(self, msg):
         """Extrae el contenido textual de un mensaje de correo MIME.
 
-        Prioriza `text/plain`; si no existe, convierte el contenido `text/html`
-        a texto plano usando BeautifulSoup.
+        Prioriza la primera parte `text/plain`; si no existe, convierte la
+        primera `text/html` a texto plano. El resultado se limita a
+        `Config.EMAIL_BODY_MAX_CHARS` (ver `extract_text_from_message`).
 
         Args:
             msg: Mensaje de correo (`email.message.Message`).
@@ -72,30 +167,7 @@ class EmailProcessor:
         Returns:
             Texto del cuerpo del mensaje o None si no pudo extraerse.
         """
-        text_content = None
-        html_content = None
-
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition"))
-
-                if content_type == "text/plain" and "attachment" not in content_disposition:
-                    text_content = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
-                elif content_type == "text/html" and "attachment" not in content_disposition:
-                    html_content = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
-        else:
-            if msg.get_content_type() == "text/plain":
-                text_content = msg.get_payload(decode=True).decode(msg.get_content_charset() or "utf-8", errors="ignore")
-            elif msg.get_content_type() == "text/html":
-                html_content = msg.get_payload(decode=True).decode(msg.get_content_charset() or "utf-8", errors="ignore")
-
-        # Si no hay texto plano, sacar del HTML
-        if not text_content and html_content:
-            soup = BeautifulSoup(html_content, "html.parser")
-            text_content = soup.get_text(separator="\n", strip=True)
-
-        return text_content
+        return extract_text_from_message(msg, Config.EMAIL_BODY_MAX_CHARS, Config.EMAIL_HTML_MAX_BYTES)
     
     def _build_imap_search(self):
         """Construye el criterio de búsqueda IMAP para encontrar correos relevantes.
@@ -207,7 +279,20 @@ class EmailProcessor:
 
         return subject in valid_subjects
     
-    def _create_email_data(self, msg, parsed_data):
+    def message_key(self, msg, fallback_id):
+        """Identificador único del correo usado para evitar duplicados.
+
+        Args:
+            msg: Mensaje de correo.
+            fallback_id: Identificador alternativo (UID IMAP, clave del archivo)
+                si el correo no trae `Message-ID`.
+
+        Returns:
+            El `Message-ID` o `<account_id>:<fallback_id>`.
+        """
+        return msg.get('Message-ID') or f"{self.account.id}:{fallback_id}"
+
+    def _create_email_data(self, msg, parsed_data, msg_id):
         """Construye el diccionario de datos normalizados para una transacción.
 
         Usa la fecha del email o la fecha parseada por el LLM (`fecha_iso`) y
@@ -216,11 +301,11 @@ class EmailProcessor:
         Args:
             msg: Mensaje de correo original.
             parsed_data: Diccionario resultante del LLM 
+            msg_id: Identificador único del correo (ver `message_key`).
         Returns:
             Diccionario con los datos de la transacción
         """
         msg_dt = self._parse_email_date(msg)
-        msg_id = msg.get('Message-ID') or f"{self.account.id}:{id(msg)}"
         
         # Usar fecha del email o fecha parseada por LLM
         date_val = msg_dt or datetime.now(timezone.utc)
@@ -235,6 +320,7 @@ class EmailProcessor:
             'email_id': msg_id,
             'date': date_val,
             'amount': parsed_data.get('monto', 0.0),
+            'currency': parsed_data.get('moneda'),
             'merchant': parsed_data.get('comercio'),
             'type': parsed_data.get('tipo_transaccion', 'desconocido'),
             'suggested_category': parsed_data.get('posible_categoria', 'sin categoría'),
@@ -255,26 +341,37 @@ class EmailProcessor:
             Lista de diccionarios de transacción (ver `_create_email_data`).
 
         Raises:
-            imaplib.IMAP4.error: Por errores de IMAP (login, selección de carpeta, etc.).
+            ImapAuthError: Si el servidor rechaza el login.
+            imaplib.IMAP4.error: Por otros errores de IMAP (selección de carpeta, etc.).
             Exception: Errores inesperados al procesar correos individuales se
                 registran y se continúa con el resto.
         """
         logger.debug('Procesando cuenta %s (last_checked=%s)', 
                                 self.account.id, self.account.last_checked)
         
-        conn = imaplib.IMAP4_SSL(self.account.imap_host, Config.IMAP_PORT)
+        imap_class = imaplib.IMAP4_SSL if Config.IMAP_USE_SSL else imaplib.IMAP4
+        with IMAP_SECONDS.time(stage='connect'):
+            conn = imap_class(self.account.imap_host, Config.IMAP_PORT)
         new_transactions = []
         max_date_seen = self._ensure_utc(self.account.last_checked)
         
         try:
-            conn.login(self.imap_user, self.imap_password)
-            conn.select(Config.IMAP_FOLDER)
+            with IMAP_SECONDS.time(stage='login'):
+                try:
+                    conn.login(self.imap_user, self.imap_password)
+                except imaplib.IMAP4.abort:
+                    raise  # conexión caída, no es un rechazo de credenciales
+                except imaplib.IMAP4.error as e:
+                    raise ImapAuthError(str(e)) from e
+            with IMAP_SECONDS.time(stage='select'):
+                conn.select(Config.IMAP_FOLDER)
             
             # Buscar emails
             criteria = self._build_imap_search()
             logger.debug('Búsqueda IMAP: %s', criteria)
             
-            status, data = conn.search(None, criteria)
+            with IMAP_SECONDS.time(stage='search'):
+                status, data = conn.search(None, criteria)
             if status != 'OK':
                 logger.error('Falló búsqueda IMAP para cuenta %s', self.account.id)
                 return []
@@ -291,6 +388,7 @@ class EmailProcessor:
                             if max_date_seen is None or email_data['email_date'] > max_date_seen:
                                 max_date_seen = email_data['email_date']
                 except Exception as e:
+                    EMAILS_TOTAL.inc(result='error')
                     logger.error('Error procesando email %s: %s', email_id, e)
             
             # Actualizar fecha de última revisión
@@ -316,39 +414,158 @@ class EmailProcessor:
             Diccionario con los datos de la transacción si el correo es válido
             y soportado; `None` en caso contrario o si es duplicado.
         """
-        status, msg_data = conn.fetch(email_id, '(RFC822)')
+        with IMAP_SECONDS.time(stage='fetch'):
+            status, msg_data = conn.fetch(email_id, '(RFC822)')
         if status != 'OK':
             return None
+        EMAILS_TOTAL.inc(result='fetched')
         
         raw_msg = msg_data[0][1]
         msg = email.message_from_bytes(raw_msg)
-        # Verificar si es de un banco
+        return self.process_message(msg, email_id.decode())
+
+    def screen_message(self, msg):
+        """Filtra un correo por remitente y asunto, sin tocar la DB ni el LLM.
+
+        Args:
+            msg: Mensaje de correo.
+
+        Returns:
+            El asunto decodificado si el correo es de un banco permitido y su
+            asunto es soportado; None en caso contrario.
+        """
         from_header = self._decode_header(msg.get('From', ''))
         if not self._is_from_bank(from_header):
             return None
+        subject = self._decode_header(msg.get('Subject', ''))
+        if not self.is_subject_supported(subject):
+            logger.debug('Asunto no soportado: %s', subject)
+            return None
+        return subject
+
+    def parse_message(self, msg, subject, msg_id):
+        """Extrae el cuerpo, lo parsea con el LLM y arma los datos de la transacción.
+
+        Args:
+            msg: Mensaje de correo ya filtrado con `screen_message`.
+            subject: Asunto decodificado.
+            msg_id: Identificador único del correo (ver `message_key`).
+
+        Returns:
+            Diccionario con los datos de la transacción (ver `_create_email_data`).
+        """
+        body = self.extract_text_from_email(msg) or ''
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug('Procesando email con asunto: %s', subject)
+            logger.debug('Body extraído (primeros 500 chars): %s', body[:500])
+        parsed_data = parse_email(subject, body)
+        if debug:
+            logger.debug('Datos parseados: %s', parsed_data)
+        return self._create_email_data(msg, parsed_data, msg_id)
+
+    def process_message(self, msg, fallback_id):
+        """Procesa un correo ya descargado: filtra, evita duplicados y parsea.
+
+        Args:
+            msg: Mensaje de correo (`email.message.Message`).
+            fallback_id: Identificador alternativo si no hay `Message-ID`.
+
+        Returns:
+            Diccionario con los datos de la transacción si el correo es válido
+            y soportado; `None` en caso contrario o si es duplicado.
+        """
+        # Verificar si es de un banco y el asunto es soportado
+        subject = self.screen_message(msg)
+        if subject is None:
+            EMAILS_TOTAL.inc(result='filtered')
+            return None
         
         # Verificar duplicados
-        msg_id = msg.get('Message-ID') or f"{self.account.id}:{email_id.decode()}"
+        msg_id = self.message_key(msg, fallback_id)
         if DatabaseManager.is_duplicate_transaction(msg_id):
+            EMAILS_TOTAL.inc(result='duplicate')
             logger.debug('Email duplicado: %s', msg_id)
             return None
         
         # Parsear con LLM
-        subject = self._decode_header(msg.get('Subject', ''))
-        body = self.extract_text_from_email(msg)
+        email_data = self.parse_message(msg, subject, msg_id)
+        EMAILS_TOTAL.inc(result='parsed')
+        return email_data
 
-        if self.is_subject_supported(subject):
-            logger.debug('Procesando email con asunto: %s', subject)
-            logger.debug('Body extraído (primeros 500 chars): %s', body[:500])
-            parsed_data = parse_email(subject, body)
-            logger.debug('Datos parseados: %s', parsed_data)
-            return self._create_email_data(msg, parsed_data)
-        else:
-            logger.debug('Asunto no soportado: %s', subject)
-            return None
 
+def _poll_account(app, account, notify_new_transaction):
+    """Revisa una cuenta y crea (y notifica) sus transacciones pendientes.
+
+    Returns:
+        Lista de objetos `Transaction` creados.
+
+    Raises:
+        ImapAuthError: Si el servidor IMAP rechaza el login.
+        Exception: Cualquier otro error al procesar la cuenta.
+    """
+    processor = EmailProcessor(account)
+    new_emails = processor.process_emails()
+    created = []
+
+    for email_data in new_emails:
+        # Obtener usuario para notificación
+        user = DatabaseManager.get_user_for_account(account)
+        if not user:
+            logger.warning('Cuenta %s sin usuarios', account.id)
+            continue
+
+        # Crear transacción pendiente
+        tx = DatabaseManager.create_pending_transaction(email_data, user)
+        if tx is None:
+            # Otro poller la insertó primero (cambio de shards)
+            EMAILS_TOTAL.inc(result='duplicate')
+            continue
+        created.append(tx)
+        TRANSACTIONS_CREATED.inc(source='poller')
+
+        # Notificar por Telegram para que el usuario describa la transacción
+        notify_new_transaction(app, tx)
+
+    logger.info('Cuenta %s: %d nuevas transacciones (%d correos procesados)',
+                account.id, len(created), len(new_emails))
+    return created
+
+
+def _poll_accounts(app, accounts, scheduler=None):
+    """Revisa las cuentas indicadas y, si hay `scheduler`, las reprograma.
+
+    Con `scheduler`, un fallo de login aplica backoff y tras
+    `POLL_AUTH_MAX_FAILURES` fallos seguidos deshabilita la cuenta.
+    """
+    # Import diferido: python-telegram-bot solo se carga en el proceso del poller
+    from .telegram_bot import notify_new_transaction
 
-def poll_once(app):
+    all_new_transactions = []
+    for account in accounts:
+        try:
+            created = _poll_account(app, account, notify_new_transaction)
+            all_new_transactions.extend(created)
+            if scheduler is not None:
+                delay = scheduler.record_success(account.id, len(created))
+                logger.debug('Cuenta %s: próxima revisión en %.0fs', account.id, delay or 0)
+        except ImapAuthError as e:
+            POLL_AUTH_FAILURES.inc()
+            logger.error('🔒 Login IMAP rechazado para cuenta %s: %s', account.id, e)
+            if scheduler is not None and scheduler.record_auth_failure(account.id):
+                DatabaseManager.disable_account(account.id)
+                ACCOUNTS_DISABLED.inc()
+                logger.error('🚫 Cuenta %s deshabilitada tras %d fallos de login seguidos',
+                             account.id, Config.POLL_AUTH_MAX_FAILURES)
+        except Exception as e:
+            POLL_ACCOUNT_ERRORS.inc()
+            logger.exception('Error procesando cuenta %s: %s', account.id, e)
+            if scheduler is not None:
+                scheduler.record_error(account.id)
+    return all_new_transactions
+
+
+def poll_once(app, shard=None):
     """Ejecuta un ciclo de polling para todas las cuentas habilitadas.
 
     Dentro del contexto de la aplicación Flask:
@@ -359,51 +576,57 @@ def poll_once(app):
 
     Args:
         app: Instancia de Flask usada para establecer el contexto de aplicación.
+        shard: Tupla opcional `(index, total)` para revisar solo las cuentas
+            con `id % total == index` (ver `coordination.PollerMembership`).
 
     Returns:
         Lista de objetos `Transaction` creados durante el ciclo.
     """
-    with app.app_context():
-        accounts = DatabaseManager.get_enabled_accounts()
+    with maybe_profile('poll', Config.PROFILE_POLL_RATE), app.app_context(), POLL_CYCLE_SECONDS.time():
+        accounts = DatabaseManager.get_enabled_accounts(shard)
         if not accounts:
             logger.warning('No hay cuentas habilitadas')
+            POLL_LAST_SUCCESS.set(time.time())
             return []
-        
-        all_new_transactions = []
-        
-        for account in accounts:
-            try:
-                processor = EmailProcessor(account)
-                new_emails = processor.process_emails()
-                
-                for email_data in new_emails:
-                    # Obtener usuario para notificación
-                    user = DatabaseManager.get_user_for_account(account)
-                    if not user:
-                        logger.warning('Cuenta %s sin usuarios', account.id)
-                        continue
-                    
-                    # Crear transacción pendiente
-                    tx = DatabaseManager.create_pending_transaction(email_data, user)
-                    all_new_transactions.append(tx)
-                    
-                    # Notificar por Telegram para que el usuario describa la transacción
-                    notify_new_transaction(app, tx)
-                
-                logger.info('Cuenta %s: %d nuevas transacciones', 
-                                      account.id, len(new_emails))
-                
-            except Exception as e:
-                logger.exception('Error procesando cuenta %s: %s', account.id, e)
-        
+
+        all_new_transactions = _poll_accounts(app, accounts)
+        POLL_LAST_SUCCESS.set(time.time())
+        return all_new_transactions
+
+
+def poll_due_accounts(app, scheduler, shard=None):
+    """Revisa solo las cuentas cuya próxima revisión venció según `scheduler`.
+
+    Args:
+        app: Instancia de Flask de la aplicación.
+        scheduler: `AccountScheduler` con el estado por cuenta.
+        shard: Tupla opcional `(index, total)` de cuentas de este poller.
+
+    Returns:
+        Lista de objetos `Transaction` creados.
+    """
+    with app.app_context():
+        scheduler.sync(DatabaseManager.get_enabled_account_ids(shard))
+        due = scheduler.pop_due()
+        if not due:
+            return []
+        with maybe_profile('poll', Config.PROFILE_POLL_RATE), POLL_CYCLE_SECONDS.time():
+            accounts = DatabaseManager.get_accounts_by_ids(due)
+            for account_id in set(due) - {a.id for a in accounts}:
+                scheduler.discard(account_id)  # deshabilitada entre medio
+            all_new_transactions = _poll_accounts(app, accounts, scheduler)
+        POLL_LAST_SUCCESS.set(time.time())
         return all_new_transactions
 
 
 def run_poller(app):
     """Bucle principal del poller de correos electrónicos.
 
-    Registra el inicio, ejecuta `poll_once` en un ciclo infinito y maneja
-    excepciones, durmiendo entre iteraciones según `Config.POLL_INTERVAL`.
+    Registra el poller entre los pollers vivos y revisa las cuentas de su
+    shard a medida que vencen según `AccountScheduler` (intervalo adaptativo
+    por cuenta). Entre revisiones duerme hasta la próxima cuenta, como
+    máximo `Config.POLL_INTERVAL` para detectar cuentas nuevas y cambios de
+    shard.
 
     Args:
         app: Instancia de Flask de la aplicación.
@@ -411,14 +634,22 @@ def run_poller(app):
     Returns:
         None. Este bucle no retorna bajo condiciones normales.
     """
-    logger.info('Iniciando email poller (intervalo %ss)', Config.POLL_INTERVAL)
+    logger.info('Iniciando email poller (intervalo %ss-%ss por cuenta)',
+                Config.POLL_MIN_INTERVAL, Config.POLL_MAX_INTERVAL)
+    membership = PollerMembership(app).start()
+    scheduler = AccountScheduler()
     
     while True:
         try:
-            new_transactions = poll_once(app)
+            shard = membership.shard()
+            if shard is None:
+                logger.warning('⚠️ Poller sin registro vigente en la DB; se omite el ciclo')
+                time.sleep(Config.POLL_INTERVAL)
+                continue
+            new_transactions = poll_due_accounts(app, scheduler, shard=shard)
             if new_transactions:
                 logger.info('Total nuevas transacciones: %d', len(new_transactions))
-            time.sleep(Config.POLL_INTERVAL)
+            time.sleep(scheduler.seconds_until_next(Config.POLL_INTERVAL))
         except Exception as e:
             logger.exception('Error en poller: %s', e)
             time.sleep(Config.POLL_INTERVAL)
@@ -2,13 +2,14 @@ import os
 import json
 import requests
 import logging
+from .metrics import LLM_ERRORS, LLM_SECONDS
 
 # Logger para este módulo
 logger = logging.getLogger(__name__)
 
 SYSTEM_PARSE = ("Eres un asistente que extrae campos estructurados de correos bancarios chilenos. "
                 "Devuelve JSON estricto con: tipo_transaccion (debito|credito|transferencia|desconocido), "
-                "monto (float), comercio (string|null, si es transferencia debe ser el nombre de a quien se transfiere), "
+                "monto (float), moneda (código ISO 4217, CLP si no se indica), comercio (string|null, si es transferencia debe ser el nombre de a quien se transfiere), "
                 "fecha_iso (ISO8601 o null). Usa punto como decimal. Como consideración adicional, no guardes "
                 "el rut de las personas involucradas, solo el nombre o comercio.")
 
@@ -25,7 +26,7 @@ def _api_key() -> str | None:
     return os.getenv('OPENAI_API_KEY')
 
 
-def _chat_completions(payload: dict) -> dict | None:
+def _chat_completions(payload: dict, kind: str = 'other') -> dict | None:
     key = _api_key()
     if not key:
         return None
@@ -35,11 +36,18 @@ def _chat_completions(payload: dict) -> dict | None:
         'Content-Type': 'application/json',
     }
     try:
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=30)
+        with LLM_SECONDS.time(kind=kind):
+            resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=30)
         if resp.status_code >= 400:
+            LLM_ERRORS.inc(kind=kind, reason='http')
+            logger.warning('LLM respondió HTTP %s (%s)', resp.status_code, kind)
             return None
         return resp.json()
+    except requests.Timeout:
+        LLM_ERRORS.inc(kind=kind, reason='timeout')
+        return None
     except Exception:
+        LLM_ERRORS.inc(kind=kind, reason='network')
         return None
 
 
@@ -54,13 +62,14 @@ def parse_email(subject: str, body: str) -> dict:
         'temperature': 0.0,
         'response_format': {"type": "json_object"},
     }
-    data = _chat_completions(payload)
+    data = _chat_completions(payload, 'parse')
     if not data:
         return {}
     try:
         content = data['choices'][0]['message']['content']
         return json.loads(content)
     except Exception:
+        LLM_ERRORS.inc(kind='parse', reason='invalid')
         return {}
 
 
@@ -76,11 +85,12 @@ def categorize(description: str, merchant: str | None = None) -> str:
         ],
         'temperature': 0.0,
     }
-    data = _chat_completions(payload)
+    data = _chat_completions(payload, 'categorize')
     if not data:
         return 'otros'
     try:
         content = data['choices'][0]['message']['content'].strip().lower()
         return content.split('\n')[0][:50]
     except Exception:
+        LLM_ERRORS.inc(kind='categorize', reason='invalid')
         return 'otros'
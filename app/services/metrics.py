@@ -0,0 +1,361 @@
+"""Métricas en proceso con exposición en formato de texto de Prometheus.
+
+Implementación mínima y sin dependencias de contadores, gauges e histogramas
+con labels, suficiente para `/metrics`. Los valores viven en memoria del
+proceso (se reinician al reiniciar la app), así que cada proceso expone las
+suyas y Prometheus debe scrapear ambos:
+
+  - proceso web (`/metrics` de Flask): API HTTP.
+  - `app.worker` (`start_http_server` en `WORKER_METRICS_PORT`): poller de
+    correos, LLM, DB, bot y outbox de notificaciones, leases.
+
+Ambos exigen el mismo acceso (`METRICS_TOKEN` o `METRICS_ALLOWED_IPS`).
+
+Uso:
+    from .metrics import IMAP_SECONDS, EMAILS_TOTAL
+    with IMAP_SECONDS.time(stage='login'):
+        conn.login(user, password)
+    EMAILS_TOTAL.inc(result='parsed')
+"""
+import hmac
+import logging
+import math
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+logger = logging.getLogger(__name__)
+
+# Buckets por defecto (segundos): de 5 ms a 60 s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base de métricas con labels fijos declarados al crearlas."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name}: labels esperados {self.label_names}, recibidos {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Contador monótono."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}_total{_format_labels(self.label_names, k)} {_format_value(v)}' for k, v in items]
+
+
+class Gauge(_Metric):
+    """Valor instantáneo. Puede calcularse al exponer con `set_function`."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), registry=None):
+        super().__init__(name, documentation, labels, registry)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, func):
+        """Calcula el valor (sin labels) al momento de exponer las métricas."""
+        self._function = func
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as e:
+                logger.warning('Métrica %s no disponible: %s', self.name, e)
+                return []
+            return [] if value is None else [f'{self.name} {_format_value(value)}']
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}' for k, v in items]
+
+
+class Histogram(_Metric):
+    """Histograma acumulativo de duraciones (u otros valores)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, documentation, labels, registry)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mide la duración del bloque (también si lanza excepción)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, key)} {n}')
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas expuestas por `/metrics`."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Métrica duplicada: {metric.name}')
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def expose(self):
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def is_authorized(authorization, remote_addr, token, allowed_ips):
+    """Indica si un scrape puede leer las métricas.
+
+    Args:
+        authorization: Valor del header `Authorization` ('' si falta).
+        remote_addr: IP del cliente.
+        token: `METRICS_TOKEN` configurado (None o vacío si no hay).
+        allowed_ips: IPs permitidas sin token.
+    Returns:
+        True con `Bearer <token>` válido o si la IP está en `allowed_ips`.
+    """
+    if token and hmac.compare_digest(authorization or '', f'Bearer {token}'):
+        return True
+    return remote_addr in allowed_ips
+
+
+def start_http_server(host, port, token=None, allowed_ips=(), registry=None):
+    """Sirve `GET /metrics` en un hilo daemon para procesos sin Flask (worker).
+
+    Args:
+        host: Interfaz de escucha.
+        port: Puerto TCP.
+        token: Token Bearer aceptado (ver `is_authorized`).
+        allowed_ips: IPs permitidas sin token.
+        registry: Registro a exponer (default `REGISTRY`).
+    Returns:
+        El `ThreadingHTTPServer` en ejecución (`shutdown()` para detenerlo).
+    """
+    registry = registry if registry is not None else REGISTRY
+    allowed_ips = list(allowed_ips)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self._reply(404, 'not found\n')
+            elif not is_authorized(self.headers.get('Authorization', ''), self.client_address[0],
+                                   token, allowed_ips):
+                self._reply(403, 'forbidden\n')
+            else:
+                self._reply(200, registry.expose(), CONTENT_TYPE)
+
+        def _reply(self, status, body, content_type='text/plain; charset=utf-8'):
+            data = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            logger.debug('metrics %s - %s', self.client_address[0], fmt % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+# --- Poller de correos ---
+IMAP_SECONDS = Histogram('finanzas_imap_seconds', 'Duración de operaciones IMAP por etapa', ['stage'])
+EMAILS_TOTAL = Counter('finanzas_emails', 'Correos procesados por resultado '
+                       '(fetched, filtered, duplicate, parsed, error)', ['result'])
+POLL_CYCLE_SECONDS = Histogram('finanzas_poll_cycle_seconds', 'Duración de un ciclo completo de poll_once',
+                               buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+POLL_LAST_SUCCESS = Gauge('finanzas_poll_last_success_timestamp_seconds',
+                          'Epoch del último ciclo de polling completado')
+POLL_ACCOUNT_ERRORS = Counter('finanzas_poll_account_errors', 'Errores al procesar una cuenta en el polling')
+POLL_AUTH_FAILURES = Counter('finanzas_poll_auth_failures', 'Fallos de login IMAP por cuenta')
+ACCOUNTS_DISABLED = Counter('finanzas_accounts_disabled', 'Cuentas deshabilitadas por fallos de login repetidos')
+TRANSACTIONS_CREATED = Counter('finanzas_transactions_created', 'Transacciones pendientes creadas', ['source'])
+
+CREDENTIAL_CACHE = Counter('finanzas_credential_cache', 'Lecturas de credenciales IMAP (hit, miss)', ['result'])
+
+# --- LLM ---
+LLM_SECONDS = Histogram('finanzas_llm_request_seconds', 'Latencia de llamadas al LLM', ['kind'])
+LLM_ERRORS = Counter('finanzas_llm_errors', 'Errores del LLM por tipo (http, timeout, network, invalid)',
+                     ['kind', 'reason'])
+
+# --- DB ---
+DB_COMMIT_SECONDS = Histogram('finanzas_db_commit_seconds', 'Duración de flush + commit de la sesión',
+                              buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+
+# --- Notificaciones de Telegram ---
+NOTIFICATIONS_SENT = Counter('finanzas_notifications', 'Envíos del dispatcher por resultado '
+                             '(sent, failed, retry_after)', ['result'])
+OUTBOX_PENDING = Gauge('finanzas_notification_outbox_pending', 'Notificaciones pendientes en el outbox')
+OUTBOX_INFLIGHT = Gauge('finanzas_notification_inflight', 'Envíos reclamados por el dispatcher y en curso')
+
+# --- Logging ---
+LOG_RECORDS_DROPPED = Counter('finanzas_log_records_dropped',
+                              'Registros de log descartados por la cola de logging llena')
+
+# --- Coordinación entre procesos ---
+LEASE_HELD = Gauge('finanzas_lease_held', 'Leases de coordinación tomados por este proceso (1/0)', ['name'])
+
+# --- API HTTP ---
+HTTP_REQUEST_SECONDS = Histogram('finanzas_http_request_seconds', 'Latencia de requests HTTP por endpoint',
+                                 ['endpoint', 'method', 'status'])
+
+
+_instrumented_sessions = set()
+
+
+def instrument_db_commits(session_class):
+    """Registra la duración de cada commit de sesión en `DB_COMMIT_SECONDS`.
+
+    Args:
+        session_class: Clase (o instancia) de sesión de SQLAlchemy a escuchar.
+    """
+    from sqlalchemy import event
+
+    if session_class in _instrumented_sessions:
+        return
+    _instrumented_sessions.add(session_class)
+
+    @event.listens_for(session_class, 'before_commit')
+    def _before_commit(session):
+        session.info['_commit_t0'] = time.perf_counter()
+
+    @event.listens_for(session_class, 'after_commit')
+    def _after_commit(session):
+        t0 = session.info.pop('_commit_t0', None)
+        if t0 is not None:
+            DB_COMMIT_SECONDS.observe(time.perf_counter() - t0)
+
+    @event.listens_for(session_class, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop('_commit_t0', None)
+
+
+def instrument_flask(app):
+    """Mide la latencia de cada request por endpoint, método y status."""
+    from flask import g, request
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _metrics_observe(response):
+        t0 = g.pop('_metrics_t0', None)
+        if t0 is not None:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - t0,
+                endpoint=request.endpoint or 'unmatched',
+                method=request.method,
+                status=response.status_code,
+            )
+        return response
@@ -0,0 +1,134 @@
+"""Migraciones de esquema con Alembic.
+
+`db.create_all()` solo crea tablas que no existen: nunca agrega columnas ni
+índices a un `finanzas.db` ya creado. Las revisiones viven en `migrations/`
+(raíz del repo) y se aplican con `upgrade(app)`, que `create_app` llama al
+iniciar si `DB_AUTO_MIGRATE` está activo.
+
+Bases existentes: la revisión inicial (`0001_baseline`) es idempotente,
+crea solo lo que falte, así que una base creada con `create_all` se adopta
+sin pasos manuales. Con varios procesos web conviene `DB_AUTO_MIGRATE=false`
+y migrar una vez antes del despliegue:
+
+  python -m app.scripts.migrate upgrade
+
+SQLite no soporta la mayoría de los `ALTER TABLE`: las revisiones usan
+`op.batch_alter_table` (copia y renombra la tabla). En Postgres los índices
+se crean con `create_index_online` (`CREATE INDEX CONCURRENTLY`, sin
+bloquear escrituras).
+"""
+import logging
+import os
+
+from alembic import command
+from alembic.config import Config as AlembicConfig
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from .database import db
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                              'migrations')
+
+# Clave del advisory lock de Postgres que serializa migraciones concurrentes
+_PG_LOCK_KEY = 0x66696E6D  # 'finm'
+
+
+def _alembic_config(connection=None):
+    cfg = AlembicConfig()
+    cfg.set_main_option('script_location', MIGRATIONS_DIR)
+    cfg.attributes['connection'] = connection
+    return cfg
+
+
+def _run(app, fn, *args, **kwargs):
+    """Ejecuta un comando de Alembic sobre una conexión del motor de la app."""
+    with app.app_context():
+        with db.engine.connect() as connection:
+            if connection.dialect.name == 'postgresql':
+                connection.exec_driver_sql(f'SELECT pg_advisory_lock({_PG_LOCK_KEY})')
+                connection.commit()
+            try:
+                return fn(_alembic_config(connection), *args, **kwargs)
+            finally:
+                if connection.dialect.name == 'postgresql':
+                    connection.rollback()
+                    connection.exec_driver_sql(f'SELECT pg_advisory_unlock({_PG_LOCK_KEY})')
+                    connection.commit()
+
+
+def upgrade(app, revision: str = 'head'):
+    """Aplica las migraciones pendientes hasta `revision`."""
+    before = current(app)
+    _run(app, command.upgrade, revision)
+    after = current(app)
+    if before != after:
+        logger.info('🗃️ Esquema migrado: %s → %s', before or 'vacío', after)
+
+
+def downgrade(app, revision: str):
+    """Revierte el esquema hasta `revision` (p.ej. `-1`)."""
+    _run(app, command.downgrade, revision)
+
+
+def stamp(app, revision: str = 'head'):
+    """Marca la base en `revision` sin ejecutar migraciones."""
+    _run(app, command.stamp, revision)
+
+
+def revision(app, message: str, autogenerate: bool = True):
+    """Crea un archivo de revisión nuevo en `migrations/versions`.
+
+    Con `autogenerate` compara los modelos con la base actual (que debe
+    estar en `head`); el resultado siempre debe revisarse a mano.
+    """
+    return _run(app, command.revision, message=message, autogenerate=autogenerate)
+
+
+def current(app):
+    """Revisión aplicada en la base (None si nunca se migró)."""
+    with app.app_context():
+        with db.engine.connect() as connection:
+            return MigrationContext.configure(connection).get_current_revision()
+
+
+def head():
+    """Última revisión disponible en `migrations/versions`."""
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+
+def check(app) -> bool:
+    """True si la base está en la última revisión; si no, lo advierte en el log."""
+    applied, latest = current(app), head()
+    if applied != latest:
+        logger.warning('⚠️ Esquema en %s, última revisión %s: ejecutar `python -m app.scripts.migrate upgrade`',
+                       applied or 'vacío', latest)
+        return False
+    return True
+
+
+def create_index_online(name: str, table: str, columns, **kwargs):
+    """Crea un índice desde una revisión sin bloquear escrituras en Postgres.
+
+    En Postgres usa `CREATE INDEX CONCURRENTLY` fuera de la transacción de
+    la migración (requisito de Postgres); en otros motores es un
+    `CREATE INDEX` normal. Es idempotente (`IF NOT EXISTS`).
+    """
+    from alembic import op
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kwargs)
+    else:
+        op.create_index(name, table, columns, if_not_exists=True, **kwargs)
+
+
+def drop_index_online(name: str, table: str):
+    """Contraparte de `create_index_online` (`DROP INDEX CONCURRENTLY` en Postgres)."""
+    from alembic import op
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        op.drop_index(name, table_name=table, if_exists=True)
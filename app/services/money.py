@@ -0,0 +1,58 @@
+"""Montos como enteros en unidades menores (centavos) más código de moneda.
+
+`Transaction.amount_minor` guarda el monto en la unidad mínima de la moneda
+(ISO 4217): en CLP 1 = $1, en USD 1 = US$0,01. Así las sumas son exactas,
+en SQL son `SUM` de enteros, y el índice es más compacto que con `Float`.
+La conversión a unidades mayores se hace solo en el borde (`to_dict`, API,
+mensajes de Telegram).
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from ..config import Config
+
+# Decimales por moneda (ISO 4217); las no listadas usan 2
+CURRENCY_EXPONENTS = {
+    'CLP': 0, 'JPY': 0, 'KRW': 0, 'PYG': 0, 'ISK': 0,
+    'CLF': 4, 'BHD': 3, 'KWD': 3, 'OMR': 3, 'TND': 3,
+}
+
+
+def normalize_currency(code) -> str:
+    """Código de moneda en mayúsculas; `DEFAULT_CURRENCY` si falta o no es válido."""
+    code = (code or '').strip().upper()
+    return code if len(code) == 3 and code.isalpha() else Config.DEFAULT_CURRENCY
+
+
+def exponent(currency: str) -> int:
+    """Cantidad de decimales de la moneda."""
+    return CURRENCY_EXPONENTS.get(normalize_currency(currency), 2)
+
+
+def to_minor(amount, currency: str) -> int:
+    """Convierte un monto en unidades mayores (float, str o Decimal) a unidades menores.
+
+    Redondea al entero más cercano (mitades hacia arriba). Valores no
+    numéricos cuentan como 0.
+    """
+    try:
+        value = Decimal(str(amount if amount is not None else 0))
+    except InvalidOperation:
+        return 0
+    if not value.is_finite():
+        return 0
+    return int(value.scaleb(exponent(currency)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount_minor: int, currency: str):
+    """Convierte unidades menores a mayores: `int` si la moneda no tiene decimales, si no `float`."""
+    exp = exponent(currency)
+    if exp == 0:
+        return int(amount_minor or 0)
+    return float(Decimal(int(amount_minor or 0)).scaleb(-exp))
+
+
+def format_amount(amount, currency: str) -> str:
+    """Monto en unidades mayores para mostrar (`$12,345` en la moneda por defecto, `12.34 USD` en otras)."""
+    currency = normalize_currency(currency)
+    text = f"{amount:,.{exponent(currency)}f}"
+    return f"${text}" if currency == Config.DEFAULT_CURRENCY else f"{text} {currency}"
@@ -0,0 +1,105 @@
+"""Hash y verificación de contraseñas con bcrypt fuera del hilo del request.
+
+bcrypt es deliberadamente caro en CPU: con varias verificaciones de login
+simultáneas, hacerlo en el hilo del request compite por CPU con el resto de
+la API. Aquí la verificación y el hash se ejecutan en un pool de procesos
+acotado (`PASSWORD_WORKERS`), de modo que una ráfaga de logins usa como
+máximo esos núcleos; las esperas que excedan `PASSWORD_MAX_PENDING` se
+rechazan con `PasswordHasherBusy` en vez de acumularse.
+
+El costo se configura con `BCRYPT_ROUNDS`; los hashes con otro costo se
+detectan con `needs_rehash` y se actualizan al siguiente login exitoso.
+
+El pool solo se usa dentro de un request de Flask, que es lo que protege;
+fuera de uno (scripts de `app/scripts`, bot, shell) o con
+`PASSWORD_WORKERS=0` el hash se calcula en el proceso actual. El pool se
+crea recién en la primera llamada desde un request. Cada proceso web tiene
+su propio pool: con varios workers WSGI el total de procesos de bcrypt es
+workers × `PASSWORD_WORKERS`.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from flask import has_request_context
+
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = None
+
+
+class PasswordHasherBusy(Exception):
+    """Hay demasiadas verificaciones de contraseña en espera."""
+
+
+def _checkpw(password, password_hash):
+    return bcrypt.checkpw(password, password_hash)
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _get_pool():
+    global _pool, _pending
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: hacer fork de un proceso con hilos (bot, poller, servidor) no es seguro
+                _pool = ProcessPoolExecutor(max_workers=Config.PASSWORD_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+                _pending = threading.BoundedSemaphore(max(1, Config.PASSWORD_MAX_PENDING))
+                logger.info('🔐 Pool de bcrypt iniciado (%d procesos)', Config.PASSWORD_WORKERS)
+    return _pool
+
+
+def _run(fn, *args):
+    """Ejecuta `fn` en el pool durante un request; en línea fuera de uno o con `PASSWORD_WORKERS=0`."""
+    if Config.PASSWORD_WORKERS <= 0 or not has_request_context():
+        return fn(*args)
+    pool = _get_pool()
+    if not _pending.acquire(timeout=Config.PASSWORD_QUEUE_TIMEOUT):
+        raise PasswordHasherBusy()
+    try:
+        return pool.submit(fn, *args).result()
+    finally:
+        _pending.release()
+
+
+def hash_password(password: str) -> bytes:
+    """Genera el hash bcrypt de `password` con `BCRYPT_ROUNDS`."""
+    return _run(_hashpw, password.encode(), Config.BCRYPT_ROUNDS)
+
+
+def verify_password(password: str, password_hash: bytes) -> bool:
+    """Verifica `password` contra un hash bcrypt.
+
+    Raises:
+        PasswordHasherBusy: Si la cola de verificaciones está llena.
+    """
+    if not password_hash:
+        return False
+    return _run(_checkpw, password.encode(), bytes(password_hash))
+
+
+def needs_rehash(password_hash: bytes) -> bool:
+    """True si el hash usa un costo distinto de `BCRYPT_ROUNDS` (formato `$2b$NN$...`)."""
+    try:
+        return int(bytes(password_hash)[4:6]) != Config.BCRYPT_ROUNDS
+    except (TypeError, ValueError):
+        return True
+
+
+def shutdown():
+    """Detiene el pool de procesos (si se creó)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
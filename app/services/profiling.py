@@ -0,0 +1,248 @@
+"""Profiling opcional de ciclos de polling y requests, y header `Server-Timing`.
+
+Controlado por variables de entorno (ver `Config`):
+  - PROFILE_POLL_RATE / PROFILE_REQUEST_RATE: fracción (0-1) de ciclos de
+    `poll_once` y de requests HTTP que se perfilan. 0 desactiva.
+  - PROFILE_FORMAT: `pstats` (cProfile, default), `speedscope` o `html`
+    (estos dos requieren `pyinstrument`; si no está instalado se usa pstats).
+  - PROFILE_DIR / PROFILE_MAX_FILES: directorio de salida y cantidad máxima de
+    archivos (se borran los más antiguos).
+  - SERVER_TIMING: agrega `Server-Timing` (db, serialize, total) a `/api/*`.
+
+Los archivos pstats se inspeccionan con `python -m pstats <archivo>` o
+snakeviz; los de speedscope en https://www.speedscope.app.
+"""
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from ..config import Config
+
+try:
+    from pyinstrument import Profiler as _PyinstrumentProfiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # pyinstrument es opcional
+    _PyinstrumentProfiler = None
+    SpeedscopeRenderer = None
+
+logger = logging.getLogger(__name__)
+
+# Un solo profiler activo a la vez: cProfile no soporta perfiles simultáneos
+# en todas las versiones de Python y además distorsionaría las mediciones.
+_profile_lock = threading.Lock()
+_timings = threading.local()
+_warned_fallback = False
+_SAFE = re.compile(r'[^A-Za-z0-9_.-]+')
+_EXTENSIONS = {'pstats': '.prof', 'speedscope': '.speedscope.json', 'html': '.html'}
+
+
+def _profile_format():
+    """Formato efectivo según configuración y disponibilidad de pyinstrument."""
+    global _warned_fallback
+    fmt = Config.PROFILE_FORMAT
+    if fmt in ('speedscope', 'html') and _PyinstrumentProfiler is None:
+        if not _warned_fallback:
+            logger.warning('⚠️ PROFILE_FORMAT=%s requiere pyinstrument; se usará pstats', fmt)
+            _warned_fallback = True
+        return 'pstats'
+    return fmt if fmt in _EXTENSIONS else 'pstats'
+
+
+class _Profile:
+    """Envuelve cProfile o pyinstrument con una interfaz común."""
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+        if fmt == 'pstats':
+            self._profiler = cProfile.Profile()
+        else:
+            self._profiler = _PyinstrumentProfiler(interval=0.001)
+
+    def start(self):
+        if self.fmt == 'pstats':
+            self._profiler.enable()
+        else:
+            self._profiler.start()
+
+    def stop(self):
+        if self.fmt == 'pstats':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+
+    def write(self, path):
+        if self.fmt == 'pstats':
+            self._profiler.dump_stats(path)
+            return
+        if self.fmt == 'speedscope':
+            content = self._profiler.output(renderer=SpeedscopeRenderer())
+        else:
+            content = self._profiler.output_html()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def _prune(directory, keep):
+    """Deja solo los `keep` perfiles más recientes del directorio."""
+    try:
+        entries = [e for e in os.scandir(directory)
+                   if e.is_file() and e.name.startswith(('poll-', 'request-'))]
+    except OSError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _save(profile, kind, label, elapsed):
+    """Escribe el perfil en `PROFILE_DIR` y aplica la rotación."""
+    directory = Config.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')[:-3]
+    name = f"{kind}-{stamp}-{_SAFE.sub('_', label)[:60]}-{elapsed * 1000:.0f}ms{_EXTENSIONS[profile.fmt]}"
+    path = os.path.join(directory, name)
+    try:
+        profile.write(path)
+    except Exception as e:
+        logger.error('❌ No se pudo guardar el perfil %s: %s', path, e)
+        return None
+    _prune(directory, Config.PROFILE_MAX_FILES)
+    logger.info('🔬 Perfil guardado: %s', path)
+    return path
+
+
+def _start_sampled(rate):
+    """Inicia un profiler con probabilidad `rate` si no hay otro activo."""
+    if rate <= 0 or random.random() >= rate:
+        return None
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        profile = _Profile(_profile_format())
+        profile.start()
+        return profile
+    except Exception as e:
+        _profile_lock.release()
+        logger.error('❌ No se pudo iniciar el profiler: %s', e)
+        return None
+
+
+def _finish(profile, kind, label, elapsed):
+    try:
+        profile.stop()
+    finally:
+        _profile_lock.release()
+    return _save(profile, kind, label, elapsed)
+
+
+@contextmanager
+def maybe_profile(kind, rate, label=''):
+    """Perfila el bloque con probabilidad `rate` y guarda el resultado.
+
+    Args:
+        kind: Prefijo del archivo (`poll`, `request`).
+        rate: Fracción de ejecuciones a perfilar (0 desactiva).
+        label: Texto adicional para el nombre del archivo.
+    """
+    profile = _start_sampled(rate)
+    if profile is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _finish(profile, kind, label, time.perf_counter() - t0)
+
+
+# --- Server-Timing ---
+@contextmanager
+def timing(name):
+    """Acumula la duración del bloque en la métrica `name` del request actual."""
+    current = getattr(_timings, 'current', None)
+    if current is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        current[name] = current.get(name, 0.0) + (time.perf_counter() - t0)
+
+
+def _instrument_engine(engine):
+    """Suma el tiempo de cada query SQL al request en curso (si se está midiendo)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if getattr(_timings, 'current', None) is not None:
+            conn.info.setdefault('_st_t0', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        current = getattr(_timings, 'current', None)
+        stack = conn.info.get('_st_t0')
+        if current is None or not stack:
+            return
+        current['db'] = current.get('db', 0.0) + (time.perf_counter() - stack.pop())
+        current['db_queries'] = current.get('db_queries', 0) + 1
+
+
+def init_app(app, db):
+    """Registra profiling por request y `Server-Timing` en la app Flask.
+
+    Args:
+        app: Aplicación Flask.
+        db: Instancia de Flask-SQLAlchemy (para medir tiempo de DB).
+    """
+    from flask import g, request
+
+    if Config.SERVER_TIMING:
+        with app.app_context():
+            _instrument_engine(db.engine)
+
+    @app.before_request
+    def _profiling_start():
+        g._request_t0 = time.perf_counter()
+        if Config.SERVER_TIMING and request.path.startswith('/api/'):
+            _timings.current = {}
+        g._profile = _start_sampled(Config.PROFILE_REQUEST_RATE)
+
+    @app.after_request
+    def _profiling_finish(response):
+        t0 = g.pop('_request_t0', None)
+        elapsed = time.perf_counter() - t0 if t0 is not None else 0.0
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            _finish(profile, 'request', f"{request.method}_{request.endpoint or 'unmatched'}", elapsed)
+
+        current = getattr(_timings, 'current', None)
+        if current is not None:
+            _timings.current = None
+            parts = []
+            if 'db' in current:
+                parts.append(f'db;dur={current["db"] * 1000:.1f};desc="{current["db_queries"]} queries"')
+            if 'serialize' in current:
+                parts.append(f'serialize;dur={current["serialize"] * 1000:.1f}')
+            parts.append(f'total;dur={elapsed * 1000:.1f}')
+            response.headers['Server-Timing'] = ', '.join(parts)
+        return response
+
+    @app.teardown_request
+    def _profiling_teardown(exc):
+        # Si el request terminó con excepción no pasa por after_request
+        _timings.current = None
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            profile.stop()
+            _profile_lock.release()
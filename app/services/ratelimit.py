@@ -0,0 +1,165 @@
+"""Almacenamiento SQLite para Flask-Limiter, compartido entre procesos.
+
+Con `memory://` cada worker WSGI lleva sus propios contadores, así que el
+límite efectivo de login se multiplica por la cantidad de workers. Este
+backend guarda los contadores en un archivo SQLite local (WAL), sin
+servicios adicionales, y soporta las estrategias `fixed-window` y
+`moving-window`:
+
+  RATELIMIT_STORAGE_URI=sqlite:////var/lib/finanzas/ratelimit.db
+
+La ruta sigue la convención de SQLAlchemy (`sqlite:///relativa.db`,
+`sqlite:////absoluta.db`). Para varias máquinas usar Redis
+(`redis://host:6379/0`, requiere el paquete `redis`).
+
+Se registra al importar el módulo (metaclase de `limits`), por eso
+`app.extensions` lo importa antes de `limiter.init_app`.
+"""
+import sqlite3
+import threading
+import time
+
+from limits.storage import MovingWindowSupport, Storage
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    key TEXT NOT NULL,
+    ts REAL NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_events_key_ts ON events (key, ts);
+CREATE INDEX IF NOT EXISTS ix_events_expires ON events (expires);
+"""
+
+# Limpieza global de filas vencidas como máximo cada este intervalo (segundos)
+_PURGE_EVERY = 60.0
+
+
+class SQLiteStorage(Storage, MovingWindowSupport):
+    """Storage de `limits` sobre un archivo SQLite compartido entre procesos.
+
+    Cada hilo usa su propia conexión; las operaciones de lectura-escritura
+    se hacen en `BEGIN IMMEDIATE` para que sean atómicas entre procesos.
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, busy_timeout: int = 5000, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri[len('sqlite:///'):] if uri.startswith('sqlite:///') else uri[len('sqlite://'):]
+        if not self.path:
+            raise ValueError('RATELIMIT_STORAGE_URI sqlite requiere una ruta: sqlite:///archivo.db')
+        self.busy_timeout = int(busy_timeout)
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self._conn().executescript(_SCHEMA)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA busy_timeout={self.busy_timeout}')
+            self._local.conn = conn
+        return conn
+
+    class _Transaction:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __enter__(self):
+            self.conn.execute('BEGIN IMMEDIATE')
+            return self.conn
+
+        def __exit__(self, exc_type, exc, tb):
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+            return False
+
+    def _tx(self):
+        return self._Transaction(self._conn())
+
+    def _maybe_purge(self, conn, now):
+        if now - self._last_purge < _PURGE_EVERY:
+            return
+        self._last_purge = now
+        conn.execute('DELETE FROM counters WHERE expires <= ?', (now,))
+        conn.execute('DELETE FROM events WHERE expires <= ?', (now,))
+
+    # --- Ventana fija ---
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        now = time.time()
+        with self._tx() as conn:
+            row = conn.execute('SELECT value, expires FROM counters WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] <= now:
+                value, expires = amount, now + expiry
+            else:
+                value = row[0] + amount
+                expires = now + expiry if elastic_expiry else row[1]
+            conn.execute('INSERT OR REPLACE INTO counters (key, value, expires) VALUES (?, ?, ?)',
+                         (key, value, expires))
+            self._maybe_purge(conn, now)
+        return value
+
+    def get(self, key: str) -> int:
+        row = self._conn().execute('SELECT value FROM counters WHERE key = ? AND expires > ?',
+                                   (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = self._conn().execute('SELECT expires FROM counters WHERE key = ? AND expires > ?',
+                                   (key, now)).fetchone()
+        return row[0] if row else now
+
+    # --- Ventana móvil ---
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        with self._tx() as conn:
+            (count,) = conn.execute('SELECT COUNT(*) FROM events WHERE key = ? AND ts > ?',
+                                    (key, now - expiry)).fetchone()
+            if count + amount > limit:
+                return False
+            conn.executemany('INSERT INTO events (key, ts, expires) VALUES (?, ?, ?)',
+                             [(key, now, now + expiry)] * amount)
+            conn.execute('DELETE FROM events WHERE key = ? AND ts <= ?', (key, now - expiry))
+            self._maybe_purge(conn, now)
+        return True
+
+    def get_moving_window(self, key: str, limit: int, expiry: int):
+        now = time.time()
+        oldest, count = self._conn().execute(
+            'SELECT MIN(ts), COUNT(*) FROM events WHERE key = ? AND ts > ?', (key, now - expiry)
+        ).fetchone()
+        return (oldest if count else now), count
+
+    # --- Administración ---
+    def check(self) -> bool:
+        try:
+            self._conn().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        with self._tx() as conn:
+            deleted = conn.execute('DELETE FROM counters').rowcount
+            deleted += conn.execute('DELETE FROM events').rowcount
+        return deleted
+
+    def clear(self, key: str) -> None:
+        with self._tx() as conn:
+            conn.execute('DELETE FROM counters WHERE key = ?', (key,))
+            conn.execute('DELETE FROM events WHERE key = ?', (key,))
@@ -0,0 +1,183 @@
+"""Planificación adaptativa del polling por cuenta.
+
+En vez de revisar todas las cuentas cada `POLL_INTERVAL`, cada cuenta tiene
+su propio intervalo y próxima revisión en un heap:
+
+  - Actividad reciente (transacciones nuevas) lo acorta a `POLL_MIN_INTERVAL`.
+  - Cada revisión sin novedades lo alarga (x`POLL_IDLE_FACTOR`) hasta
+    `POLL_MAX_INTERVAL`.
+  - De noche en `POLL_TIMEZONE` (`POLL_NIGHT_HOURS`) no baja de
+    `POLL_NIGHT_INTERVAL`.
+  - Errores usan backoff exponencial; tras `POLL_AUTH_MAX_FAILURES` fallos
+    de login consecutivos la cuenta se deshabilita.
+
+El estado vive en memoria del proceso: tras un reinicio todas las cuentas
+vuelven al intervalo base y se revisan de inmediato.
+"""
+import heapq
+import itertools
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _load_timezone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning('⚠️ Zona horaria %s no disponible (¿falta tzdata?); se usa UTC-4', name)
+        return timezone(timedelta(hours=-4))
+
+
+def _parse_hours(spec):
+    """Convierte `'0-7'` en el conjunto de horas {0..6}; admite rangos que cruzan medianoche (`'23-6'`)."""
+    try:
+        start, end = (int(x) for x in spec.split('-', 1))
+    except ValueError:
+        return frozenset()
+    if start <= end:
+        return frozenset(range(start, end))
+    return frozenset(list(range(start, 24)) + list(range(0, end)))
+
+
+@dataclass
+class AccountSchedule:
+    """Estado de planificación de una cuenta."""
+    interval: float
+    next_due: float
+    errors: int = 0
+    auth_failures: int = 0
+
+
+class AccountScheduler:
+    """Heap de próximas revisiones por cuenta con intervalos adaptativos.
+
+    Args:
+        clock: Reloj monotónico en segundos (inyectable para pruebas).
+        now: Función que retorna el `datetime` actual con zona horaria.
+    """
+
+    def __init__(self, clock=time.monotonic, now=None):
+        self._clock = clock
+        self._now = now or (lambda: datetime.now(timezone.utc))
+        self._tz = _load_timezone(Config.POLL_TIMEZONE)
+        self._night_hours = _parse_hours(Config.POLL_NIGHT_HOURS)
+        self._heap = []
+        self._seq = itertools.count()
+        self.accounts = {}
+
+    # --- Heap ---
+    def _push(self, account_id, due):
+        self.accounts[account_id].next_due = due
+        heapq.heappush(self._heap, (due, next(self._seq), account_id))
+
+    def sync(self, account_ids):
+        """Alinea el heap con las cuentas habilitadas de este shard.
+
+        Las cuentas nuevas quedan vencidas (se revisan de inmediato) y las que
+        ya no corresponden se descartan.
+        """
+        wanted = set(account_ids)
+        for account_id in list(self.accounts):
+            if account_id not in wanted:
+                del self.accounts[account_id]
+        now = self._clock()
+        for account_id in wanted:
+            if account_id not in self.accounts:
+                self.accounts[account_id] = AccountSchedule(interval=Config.POLL_INTERVAL, next_due=now)
+                self._push(account_id, now)
+
+    def pop_due(self):
+        """Retorna (y saca del heap) los IDs de cuentas cuya revisión venció."""
+        now = self._clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, account_id = heapq.heappop(self._heap)
+            state = self.accounts.get(account_id)
+            # Entradas obsoletas: cuenta eliminada o reprogramada
+            if state is None or state.next_due != when:
+                continue
+            due.append(account_id)
+        return due
+
+    def seconds_until_next(self, max_wait):
+        """Segundos hasta la próxima revisión, acotado a `max_wait`."""
+        while self._heap:
+            when, _, account_id = self._heap[0]
+            state = self.accounts.get(account_id)
+            if state is not None and state.next_due == when:
+                return max(0.0, min(max_wait, when - self._clock()))
+            heapq.heappop(self._heap)
+        return max_wait
+
+    def discard(self, account_id):
+        """Olvida una cuenta (p.ej. deshabilitada); `sync` la vuelve a agregar si corresponde."""
+        self.accounts.pop(account_id, None)
+
+    # --- Políticas ---
+    def _is_night(self):
+        return self._now().astimezone(self._tz).hour in self._night_hours
+
+    def _reschedule(self, account_id, interval):
+        # Jitter ±10% para no sincronizar las cuentas
+        delay = interval * random.uniform(0.9, 1.1)
+        self._push(account_id, self._clock() + delay)
+        return delay
+
+    def record_success(self, account_id, new_transactions):
+        """Reprograma tras una revisión exitosa.
+
+        Args:
+            account_id: ID de la cuenta.
+            new_transactions: Cantidad de transacciones nuevas encontradas.
+        Returns:
+            Segundos hasta la próxima revisión.
+        """
+        state = self.accounts.get(account_id)
+        if state is None:
+            return None
+        state.errors = state.auth_failures = 0
+        if new_transactions:
+            state.interval = Config.POLL_MIN_INTERVAL
+        else:
+            state.interval = min(max(state.interval, Config.POLL_MIN_INTERVAL) * Config.POLL_IDLE_FACTOR,
+                                 Config.POLL_MAX_INTERVAL)
+        interval = state.interval
+        if self._is_night():
+            interval = max(interval, Config.POLL_NIGHT_INTERVAL)
+        return self._reschedule(account_id, interval)
+
+    def record_error(self, account_id):
+        """Reprograma con backoff exponencial tras un error transitorio."""
+        state = self.accounts.get(account_id)
+        if state is None:
+            return None
+        state.errors += 1
+        backoff = min(Config.POLL_INTERVAL * (2 ** state.errors), Config.POLL_MAX_INTERVAL)
+        return self._reschedule(account_id, backoff)
+
+    def record_auth_failure(self, account_id):
+        """Registra un fallo de login.
+
+        Returns:
+            True si la cuenta alcanzó `POLL_AUTH_MAX_FAILURES` y debe
+            deshabilitarse (se quita del heap); False si se reprogramó con
+            backoff.
+        """
+        state = self.accounts.get(account_id)
+        if state is None:
+            return False
+        state.auth_failures += 1
+        if state.auth_failures >= Config.POLL_AUTH_MAX_FAILURES:
+            del self.accounts[account_id]
+            return True
+        backoff = min(Config.POLL_INTERVAL * (4 ** state.auth_failures), Config.POLL_AUTH_BACKOFF_MAX)
+        self._reschedule(account_id, backoff)
+        return False
@@ -1,27 +1,407 @@
 """Bot de Telegram para notificar y registrar descripciones de transacciones.
 
 Este módulo inicializa el bot, envía notificaciones a los usuarios y procesa
-sus respuestas usando respuestas por referencia (reply) al mensaje del bot que
-incluye el identificador de la transacción (#<id>).
+sus respuestas usando respuestas por referencia (reply) al mensaje del bot; el
+mensaje se resuelve a su transacción mediante el índice persistido
+`telegram_messages` (chat_id, message_id). Para backlogs, el comando
+/pendientes permite etiquetar transacciones con botones inline.
 """
 
 import os
-from threading import Thread
-from queue import Queue, Empty
-from telegram import Update, ForceReply
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock
+from telegram import Update, ForceReply, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter
+from telegram.ext import (
+    ApplicationBuilder, ApplicationHandlerStop, CallbackQueryHandler, CommandHandler, MessageHandler,
+    TypeHandler, filters, ContextTypes,
+)
 from ..config import Config
 from ..models import User
 from .database import DatabaseManager
 from .llm import categorize
+from .metrics import NOTIFICATIONS_SENT, OUTBOX_INFLIGHT
+from .money import format_amount
 import asyncio
+import json
 import logging
 import re
+import time
 
 # Logger para este módulo
 logger = logging.getLogger(__name__)
 
-notification_queue = Queue()  # Queue para envío thread-safe
+
+
+class TokenBucket:
+    """Token bucket para limitar la tasa de envíos.
+
+    No es thread-safe: se usa solo desde el event loop del bot.
+
+    Attributes:
+        rate: Tokens repuestos por segundo.
+        capacity: Máximo de tokens acumulables (ráfaga permitida).
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        """Reserva un token y retorna cuántos segundos esperar antes de usarlo.
+
+        Los tokens pueden quedar en negativo: las reservas sucesivas se
+        encolan en el tiempo, preservando el orden de llegada.
+
+        Returns:
+            Segundos de espera (0.0 si hay token disponible).
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+# `#<id>` en el texto de las notificaciones (respaldo si el mensaje no está indexado)
+# Solo para notificaciones enviadas antes del índice `telegram_messages` (ver _categorize_and_save)
+_TX_ID_RE = re.compile(r'#(\d+)')
+
+
+def _format_transaction_message(item):
+    """Construye el texto de notificación para una transacción.
+
+    Args:
+        item: Diccionario con `transaction_id`, `date`, `amount`, `currency`, `merchant`,
+            `type` y `category` (ver `DatabaseManager.claim_due_notifications`).
+
+    Returns:
+        Texto del mensaje, incluyendo el identificador `#<id>`.
+    """
+    return (
+        f"💳 Nueva transacción detectada (#"+str(item['transaction_id'])+"):\n\n"
+        f"📅 Fecha: {item['date'].strftime('%d/%m/%Y %H:%M')}\n"
+        f"💰 Monto: {format_amount(item['amount'], item.get('currency'))}\n"
+        f"🏪 Comercio: {item['merchant'] or 'No especificado'}\n"
+        f"🔄 Tipo: {item['type']}\n"
+        f"📁 Categoría sugerida: {item['category']}\n\n"
+        f"❓ Por favor, escribe una breve descripción de esta transacción:"
+    )
+
+
+def _format_digest_message(items, max_lines=30):
+    """Construye un único mensaje resumen para varias transacciones de un chat.
+
+    Args:
+        items: Lista de diccionarios de transacción (ver `_format_transaction_message`).
+        max_lines: Máximo de transacciones listadas (Telegram limita a 4096 chars).
+
+    Returns:
+        Texto del mensaje resumen.
+    """
+    lines = [f"📬 Tienes {len(items)} nuevas transacciones pendientes de descripción:\n"]
+    for item in items[:max_lines]:
+        lines.append(
+            f"• #{item['transaction_id']} {item['date'].strftime('%d/%m')} "
+            f"{format_amount(item['amount'], item.get('currency'))} {item['merchant'] or 'No especificado'}"
+        )
+    if len(items) > max_lines:
+        lines.append(f"… y {len(items) - max_lines} más")
+    lines.append("\n✍️ Usa /pendientes para etiquetarlas rápidamente.")
+    return '\n'.join(lines)
+
+
+class NotificationDispatcher:
+    """Despacha las notificaciones persistidas en `notification_outbox`.
+
+    Corre en el event loop del bot: reclama lotes de notificaciones vencidas,
+    agrupa las de un mismo chat en un resumen cuando superan
+    `Config.NOTIFICATION_DIGEST_THRESHOLD` y las envía concurrentemente
+    respetando un token bucket global y uno por `chat_id`. Los fallos se
+    reprograman con backoff exponencial en la DB.
+
+    El poller llama a `wake` desde su hilo (con `call_soon_threadsafe`) tras
+    escribir en el outbox; además se revisa periódicamente la tabla para
+    reintentos y para lo que quedó pendiente de un reinicio. Como el poller
+    avisa en cada commit, tras un aviso se espera a que la ráfaga se calme
+    (`Config.NOTIFICATION_GATHER_SECONDS` sin avisos nuevos, con tope
+    `NOTIFICATION_GATHER_MAX_SECONDS`) para reclamarla entera y resumirla.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._loop = None
+        self._wake_event = None
+        self._tasks = set()
+        self._global_bucket = None
+        self._chat_buckets = {}
+
+    def wake(self):
+        """Despierta al dispatcher para revisar el outbox (thread-safe)."""
+        with self._lock:
+            loop, event = self._loop, self._wake_event
+        if loop is None:
+            # Se procesará al arrancar el dispatcher
+            return
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # Loop cerrado: la fila sigue en el outbox
+            pass
+
+    def qsize(self):
+        """Cantidad de envíos en curso (reclamados y aún no confirmados)."""
+        return len(self._tasks)
+
+    async def drain(self, timeout):
+        """Espera hasta `timeout` segundos a que terminen los envíos en curso.
+
+        Lo que no alcance a confirmarse vuelve al outbox al vencer su lease.
+        """
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    def _reserve(self, chat_id):
+        """Reserva cupo global y por chat; retorna los segundos a esperar."""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(Config.TELEGRAM_CHAT_RATE, Config.TELEGRAM_CHAT_BURST)
+            self._chat_buckets[chat_id] = bucket
+        return max(bucket.reserve(), self._global_bucket.reserve())
+
+    async def run(self, application):
+        """Bucle de despacho; debe ejecutarse en el event loop del bot.
+
+        Args:
+            application: Instancia de `Application` de python-telegram-bot.
+        """
+        flask_app = application.bot_data['flask_app']
+        event = asyncio.Event()
+        self._global_bucket = TokenBucket(Config.TELEGRAM_GLOBAL_RATE, max(1, int(Config.TELEGRAM_GLOBAL_RATE)))
+        semaphore = asyncio.Semaphore(max(1, Config.TELEGRAM_MAX_CONCURRENT_SENDS))
+        with self._lock:
+            self._wake_event = event
+            self._loop = asyncio.get_running_loop()
+
+        try:
+            while True:
+                event.clear()
+                try:
+                    claimed = await run_blocking(
+                        flask_app, DatabaseManager.claim_due_notifications,
+                        Config.OUTBOX_BATCH_SIZE, Config.OUTBOX_CLAIM_SECONDS,
+                    )
+                except Exception as e:
+                    logger.error("❌ Error leyendo outbox de notificaciones: %s", e)
+                    claimed = []
+                if claimed:
+                    self._dispatch(application, flask_app, semaphore, claimed)
+                    if len(claimed) >= Config.OUTBOX_BATCH_SIZE:
+                        continue
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=Config.OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    continue
+                await self._gather(event)
+        finally:
+            with self._lock:
+                self._loop = None
+                self._wake_event = None
+
+    @staticmethod
+    async def _gather(event):
+        """Espera a que dejen de llegar avisos antes de reclamar (debounce con tope)."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + Config.NOTIFICATION_GATHER_MAX_SECONDS
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            event.clear()
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(Config.NOTIFICATION_GATHER_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                return
+
+    def _dispatch(self, application, flask_app, semaphore, claimed):
+        """Agrupa por chat y lanza las tareas de envío."""
+        by_chat = {}
+        for item in claimed:
+            by_chat.setdefault(item['chat_id'], []).append(item)
+        for chat_id, items in by_chat.items():
+            if len(items) >= Config.NOTIFICATION_DIGEST_THRESHOLD:
+                batches = [items]
+            else:
+                batches = [[item] for item in items]
+            for batch in batches:
+                delay = self._reserve(chat_id)
+                task = asyncio.create_task(self._send(application, flask_app, semaphore, chat_id, batch, delay))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, application, flask_app, semaphore, chat_id, batch, delay):
+        """Envía una notificación (o un resumen) y registra el resultado en el outbox."""
+        outbox_ids = [item['outbox_id'] for item in batch]
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if len(batch) == 1:
+            transaction_id = batch[0]['transaction_id']
+            logger.debug("📤 Procesando notificación para chat_id=%s tx_id=%s", chat_id, transaction_id)
+            kwargs = {
+                'text': (_format_transaction_message(batch[0])
+                         + "\n\n✍️ Responde a ESTE mensaje con la descripción para la transacción #" + str(transaction_id)),
+                'reply_markup': ForceReply(selective=True, input_field_placeholder="Descripción para #" + str(transaction_id)),
+            }
+        else:
+            logger.debug("📤 Procesando resumen de %d notificaciones para chat_id=%s", len(batch), chat_id)
+            kwargs = {'text': _format_digest_message(batch)}
+
+        error = None
+        async with semaphore:
+            for attempt in range(2):
+                try:
+                    sent = await application.bot.send_message(chat_id=chat_id, **kwargs)
+                    error = None
+                    break
+                except RetryAfter as e:
+                    # Telegram pide esperar: respetar y reintentar una vez
+                    NOTIFICATIONS_SENT.inc(result='retry_after')
+                    retry_after = e.retry_after
+                    if hasattr(retry_after, 'total_seconds'):
+                        retry_after = retry_after.total_seconds()
+                    logger.warning("⏳ Límite de Telegram para chat_id=%s, reintento en %ss", chat_id, retry_after)
+                    error = str(e)
+                    if attempt == 0:
+                        await asyncio.sleep(float(retry_after))
+                except Exception as e:
+                    error = str(e)
+                    break
+
+        try:
+            NOTIFICATIONS_SENT.inc(len(batch), result='sent' if error is None else 'failed')
+            if error is None:
+                links = None
+                if len(batch) == 1:
+                    links = [(chat_id, sent.message_id, batch[0]['transaction_id'])]
+                await run_blocking(flask_app, DatabaseManager.mark_notifications_sent, outbox_ids, links)
+                logger.info("✅ Notificación enviada exitosamente a chat_id=%s (%d tx)", chat_id, len(batch))
+            else:
+                logger.error("❌ Error enviando mensaje a chat_id=%s: %s", chat_id, error)
+                await run_blocking(
+                    flask_app, DatabaseManager.mark_notifications_failed, outbox_ids, error,
+                    Config.OUTBOX_MAX_ATTEMPTS, Config.OUTBOX_BACKOFF_BASE, Config.OUTBOX_BACKOFF_MAX,
+                )
+        except Exception as e:
+            # El lease del outbox expira y la notificación se reintenta
+            logger.error("❌ Error actualizando outbox para chat_id=%s: %s", chat_id, e)
+
+
+notification_dispatcher = NotificationDispatcher()
+OUTBOX_INFLIGHT.set_function(notification_dispatcher.qsize)
+
+# Executor dedicado para trabajo bloqueante (DB, LLM) fuera del event loop del bot
+_blocking_executor = None
+_blocking_executor_lock = Lock()
+
+
+def _get_blocking_executor():
+    """Retorna (creándolo si hace falta) el executor para trabajo bloqueante.
+
+    El tamaño del pool (`Config.BOT_BLOCKING_WORKERS`) acota la cantidad de
+    llamadas simultáneas a la base de datos y al LLM desde el bot.
+
+    Returns:
+        ThreadPoolExecutor compartido por todos los handlers.
+    """
+    global _blocking_executor
+    with _blocking_executor_lock:
+        if _blocking_executor is None:
+            _blocking_executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.BOT_BLOCKING_WORKERS),
+                thread_name_prefix='tg-blocking',
+            )
+        return _blocking_executor
+
+
+async def run_blocking(flask_app, func, *args):
+    """Ejecuta una función bloqueante en el executor dentro de un contexto Flask.
+
+    Cada llamada abre su propio `app_context` en el hilo del executor, de modo
+    que la sesión de SQLAlchemy no se comparte con el event loop. La función
+    debe retornar datos simples (no instancias ORM), ya que la sesión se cierra
+    al salir del contexto.
+
+    Args:
+        flask_app: Instancia de Flask.
+        func: Función síncrona a ejecutar.
+        *args: Argumentos posicionales para `func`.
+
+    Returns:
+        El valor retornado por `func`.
+    """
+    def _call():
+        with flask_app.app_context():
+            return func(*args)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_blocking_executor(), _call)
+
+
+def _find_user_by_chat_id(chat_id):
+    """Busca el usuario registrado para un chat de Telegram.
+
+    Args:
+        chat_id: ID del chat de Telegram (string).
+
+    Returns:
+        Tupla `(user_id, username)` o None si no está registrado.
+    """
+    user = User.query.filter_by(chat_id=chat_id).first()
+    if not user:
+        return None
+    return user.id, user.username
+
+
+def _categorize_and_save(user_id, chat_id, message_id, text, replied_text=''):
+    """Resuelve la transacción respondida, la categoriza y guarda la descripción.
+
+    Se resuelve con el índice `telegram_messages`. Como excepción, las
+    notificaciones enviadas antes de existir el índice no tienen fila: para
+    esas se acepta el `#<id>` del texto respondido, solo si la transacción es
+    del usuario y no tiene ningún mensaje indexado. Quitar el fallback (y
+    `_TX_ID_RE`) cuando no queden transacciones pendientes sin fila en
+    `telegram_messages` notificadas antes del despliegue del índice.
+
+    Args:
+        user_id: ID del usuario que responde.
+        chat_id: ID del chat de Telegram.
+        message_id: ID del mensaje del bot al que el usuario respondió.
+        text: Descripción escrita por el usuario.
+        replied_text: Texto del mensaje del bot respondido.
+
+    Returns:
+        Tupla `(tx_id, category)`, o None si el mensaje no corresponde a una
+        transacción del usuario.
+    """
+    tx_id = DatabaseManager.get_transaction_id_for_reply(user_id, chat_id, message_id)
+    if tx_id is None:
+        ids = set(_TX_ID_RE.findall(replied_text or ''))
+        if len(ids) != 1:  # sin ID, o un resumen con varias transacciones
+            return None
+        tx_id = DatabaseManager.get_unindexed_transaction_id(user_id, int(ids.pop()))
+        if tx_id is None:
+            return None
+        logger.info('🔎 message_id=%s anterior al índice; usando #%s del texto', message_id, tx_id)
+    logger.debug('🤖 Categorizando respuesta: "%s"', text)
+    category = categorize(text)
+    logger.debug('📁 Categoría asignada: "%s"', category)
+    tx = DatabaseManager.update_transaction_for_user(user_id, tx_id, description=text, category=category)
+    return (tx_id, category) if tx else None
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -41,27 +421,26 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     flask_app = context.application.bot_data.get('flask_app')
     if not flask_app:
         return
-    with flask_app.app_context():
-        chat_id = str(update.effective_chat.id)
-        username = update.effective_user.username or "sin_username"
-        logger.info('📱 Comando /start recibido de chat_id=%s username=%s', chat_id, username)
-        
-        user = User.query.filter_by(chat_id=chat_id).first()
-        if not user:
-            logger.warning('❌ Usuario chat_id=%s no registrado', chat_id)
-            await update.message.reply_text('No estás registrado. Contacta al admin.')
-            return
-        
-        logger.info('✅ Usuario %s (chat_id=%s) activó el bot', user.username, chat_id)
-        await update.message.reply_text('🤖 Bot activado. Te notificaré sobre nuevas transacciones automáticamente.')
+    chat_id = str(update.effective_chat.id)
+    username = update.effective_user.username or "sin_username"
+    logger.info('📱 Comando /start recibido de chat_id=%s username=%s', chat_id, username)
+
+    user = await run_blocking(flask_app, _find_user_by_chat_id, chat_id)
+    if not user:
+        logger.warning('❌ Usuario chat_id=%s no registrado', chat_id)
+        await update.message.reply_text('No estás registrado. Contacta al admin.')
+        return
+
+    logger.info('✅ Usuario %s (chat_id=%s) activó el bot', user[1], chat_id)
+    await update.message.reply_text('🤖 Bot activado. Te notificaré sobre nuevas transacciones automáticamente.')
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Maneja mensajes de texto enviados por el usuario.
 
-    Si el mensaje es una respuesta (reply) al mensaje del bot que contiene un
-    identificador de transacción (#<id>), categoriza y guarda la descripción
-    para esa transacción. En caso contrario, guía al usuario sobre cómo
+    Si el mensaje es una respuesta (reply) a una notificación del bot (indexada
+    en `telegram_messages` o con `#<id>` en su texto), categoriza y guarda la descripción para esa
+    transacción (validando que pertenezca al usuario). En caso contrario, guía al usuario sobre cómo
     responder correctamente.
 
     Args:
@@ -74,64 +453,244 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     flask_app = context.application.bot_data.get('flask_app')
     if not flask_app:
         return
-    with flask_app.app_context():
-        chat_id = str(update.effective_chat.id)
-        username = update.effective_user.username or "sin_username"
-        message_text = update.message.text.strip()
-        
-        logger.info('📨 Mensaje recibido de chat_id=%s username=%s: "%s"', 
-                               chat_id, username, message_text[:100])
-        
-        # Auto-registrar usuario si envía mensaje pero no está registrado
-        user = User.query.filter_by(chat_id=chat_id).first()
-        if not user:
-            logger.warning('❌ Usuario chat_id=%s no registrado, enviando mensaje de registro', chat_id)
+    chat_id = str(update.effective_chat.id)
+    username = update.effective_user.username or "sin_username"
+    message_text = update.message.text.strip()
+
+    logger.info('📨 Mensaje recibido de chat_id=%s username=%s: "%s"',
+                chat_id, username, message_text[:100])
+
+    # Auto-registrar usuario si envía mensaje pero no está registrado
+    user = await run_blocking(flask_app, _find_user_by_chat_id, chat_id)
+    if not user:
+        logger.warning('❌ Usuario chat_id=%s no registrado, enviando mensaje de registro', chat_id)
+        await update.message.reply_text(
+            '👋 ¡Hola! Te he detectado automáticamente.\n'
+            'Pero no estás registrado. Contacta al administrador para registrarte.'
+        )
+        return
+    user_id, user_name = user
+
+    logger.debug('👤 Usuario encontrado: %s (id=%s)', user_name, user_id)
+
+    text = message_text
+
+    # Usar reply_to_message para identificar la transacción vía el índice
+    # (chat_id, message_id) persistido al enviar la notificación
+    replied = getattr(update.message, 'reply_to_message', None)
+    if replied and replied.from_user and replied.from_user.is_bot:
+        logger.info('💳 Procesando respuesta al mensaje message_id=%s del usuario=%s', replied.message_id, user_name)
+
+        # Resolver, categorizar y actualizar fuera del event loop; la
+        # pertenencia se valida en la capa de DB
+        result = await run_blocking(flask_app, _categorize_and_save, user_id, chat_id, replied.message_id, text,
+                                    replied.text or '')
+        if result is not None:
+            tx_id, category = result
+            logger.info('✅ Transacción tx_id=%s actualizada - descripción="%s" categoría="%s"', tx_id, text, category)
             await update.message.reply_text(
-                '👋 ¡Hola! Te he detectado automáticamente.\n'
-                'Pero no estás registrado. Contacta al administrador para registrarte.'
+                f'✅ Transacción #{tx_id} guardada:\n'
+                f'💬 Descripción: {text}\n'
+                f'📁 Categoría: {category}'
+            )
+        else:
+            logger.warning('❌ Mensaje message_id=%s de chat_id=%s no corresponde a una transacción del usuario',
+                           replied.message_id, chat_id)
+            await update.message.reply_text('❌ No pude identificar la transacción. Responde directamente al mensaje de notificación de la transacción.')
+        return
+
+    # Si no es una respuesta a un mensaje del bot, guiar al usuario
+    logger.debug('💡 Mensaje sin referencia válida a transacción para chat_id=%s', chat_id)
+    await update.message.reply_text(
+        '💡 Para registrar una descripción, responde directamente al mensaje de notificación de la transacción, o usa /pendientes.'
+    )
+
+
+def _render_pending(session):
+    """Construye el texto y teclado inline para la transacción pendiente actual.
+
+    Args:
+        session: Estado de `/pendientes` guardado en `context.user_data`.
+
+    Returns:
+        Tupla `(texto, InlineKeyboardMarkup)`.
+    """
+    item = session['items'][session['index']]
+    remaining = max(session['total'] - session['index'], 1)
+    text = (
+        f"🗂️ Transacción pendiente #{item['id']} (quedan {remaining})\n\n"
+        f"📅 Fecha: {item['date'].strftime('%d/%m/%Y %H:%M')}\n"
+        f"💰 Monto: {format_amount(item['amount'], item.get('currency'))}\n"
+        f"🏪 Comercio: {item['merchant'] or 'No especificado'}\n"
+        f"🔄 Tipo: {item['type']}\n\n"
+        f"📁 Elige una categoría:"
+    )
+    buttons = [
+        InlineKeyboardButton(category[:40], callback_data=f"pend:{item['id']}:{idx}")
+        for idx, category in enumerate(item['suggestions'])
+    ]
+    keyboard = [buttons[i:i + 3] for i in range(0, len(buttons), 3)]
+    keyboard.append([
+        InlineKeyboardButton('⏭️ Omitir', callback_data=f"pend:{item['id']}:skip"),
+        InlineKeyboardButton('✅ Terminar', callback_data='pend:stop'),
+    ])
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+async def _flush_pending_labels(flask_app, session):
+    """Guarda en un solo commit las etiquetas acumuladas en la sesión.
+
+    Si la DB falla, las etiquetas vuelven a la sesión para el próximo intento
+    y la excepción se propaga.
+    """
+    labels, session['labels'] = session['labels'], []
+    if not labels:
+        return
+    try:
+        updated = await run_blocking(flask_app, DatabaseManager.label_transactions_for_user,
+                                     session['user_id'], labels)
+    except Exception:
+        session['labels'] = labels + session['labels']
+        raise
+    logger.info('🏷️ %d/%d etiquetas guardadas para user_id=%s', len(updated), len(labels), session['user_id'])
+
+
+def _schedule_pending_flush(flask_app, session):
+    """Programa el guardado diferido de etiquetas si el usuario deja de responder."""
+    task = session.get('flush_task')
+    if task and not task.done():
+        task.cancel()
+
+    async def _delayed_flush():
+        await asyncio.sleep(Config.PENDING_LABEL_FLUSH_SECONDS)
+        async with session['lock']:
+            try:
+                await _flush_pending_labels(flask_app, session)
+            except Exception as e:
+                logger.error('❌ Error guardando etiquetas de user_id=%s: %s', session['user_id'], e)
+
+    session['flush_task'] = asyncio.create_task(_delayed_flush())
+
+
+async def _load_pending_page(flask_app, session):
+    """Carga la siguiente página de transacciones pendientes en la sesión."""
+    items, total = await run_blocking(
+        flask_app, DatabaseManager.get_pending_transactions_for_user,
+        session['user_id'], Config.PENDING_PAGE_SIZE, session['seen'], Config.PENDING_SUGGESTIONS,
+    )
+    session['items'] = items
+    session['index'] = 0
+    session['total'] = total
+
+
+async def pendientes(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /pendientes: etiquetado rápido de transacciones sin descripción.
+
+    Muestra una transacción pendiente a la vez con botones inline para las
+    categorías más probables. Cada toque avanza a la siguiente; las etiquetas
+    se guardan en lotes (`Config.PENDING_LABEL_BATCH`) en un solo commit.
+
+    Args:
+        update: Actualización recibida por el bot (mensaje /pendientes).
+        context: Contexto de ejecución del handler de Telegram.
+
+    Returns:
+        None.
+    """
+    flask_app = context.application.bot_data.get('flask_app')
+    if not flask_app:
+        return
+    chat_id = str(update.effective_chat.id)
+    user = await run_blocking(flask_app, _find_user_by_chat_id, chat_id)
+    if not user:
+        await update.message.reply_text('No estás registrado. Contacta al admin.')
+        return
+
+    previous = context.user_data.get('pendientes')
+    if previous:
+        async with previous['lock']:
+            await _flush_pending_labels(flask_app, previous)
+
+    session = {
+        'user_id': user[0],
+        'items': [],
+        'index': 0,
+        'total': 0,
+        'labels': [],
+        'labelled': 0,
+        # Omitidas (siguen pendientes) o etiquetadas aún sin guardar: no volver a mostrarlas
+        'seen': set(),
+        'lock': asyncio.Lock(),
+        'flush_task': None,
+    }
+    context.user_data['pendientes'] = session
+    await _load_pending_page(flask_app, session)
+    logger.info('🗂️ /pendientes para chat_id=%s: %d pendientes', chat_id, session['total'])
+    if not session['items']:
+        context.user_data.pop('pendientes', None)
+        await update.message.reply_text('🎉 No tienes transacciones pendientes.')
+        return
+    text, markup = _render_pending(session)
+    await update.message.reply_text(text, reply_markup=markup)
+
+
+async def handle_pending_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Procesa los botones inline de `/pendientes` (`pend:<tx_id>:<idx|skip>` o `pend:stop`).
+
+    Args:
+        update: Actualización con el `callback_query`.
+        context: Contexto de ejecución del handler de Telegram.
+
+    Returns:
+        None. Edita el mensaje con la siguiente transacción pendiente.
+    """
+    query = update.callback_query
+    await query.answer()
+    flask_app = context.application.bot_data.get('flask_app')
+    session = context.user_data.get('pendientes')
+    if not flask_app or not session:
+        await query.edit_message_text('⌛ Sesión expirada. Usa /pendientes para continuar.')
+        return
+
+    parts = (query.data or '').split(':')
+    async with session['lock']:
+        if parts[1:] == ['stop']:
+            await _flush_pending_labels(flask_app, session)
+            context.user_data.pop('pendientes', None)
+            await query.edit_message_text(
+                f"✅ {session['labelled']} transacciones etiquetadas. Usa /pendientes para continuar."
             )
             return
-        
-        logger.debug('👤 Usuario encontrado: %s (id=%s)', user.username, user.id)
-        
-        text = update.message.text.strip()
-        
-        # Nuevo flujo: usar reply_to_message para identificar la transacción (#<id>)
-        replied = getattr(update.message, 'reply_to_message', None)
-        if replied and replied.from_user and replied.from_user.is_bot:
-            original_text = replied.text or ''
-            m = re.search(r'#(\d+)', original_text)
-            if not m:
-                logger.warning('❌ No se encontró tx_id en el mensaje referenciado por chat_id=%s', chat_id)
-                await update.message.reply_text('❌ No pude identificar la transacción. Responde al mensaje del bot que contiene el ID (#123).')
+
+        current = session['items'][session['index']] if session['index'] < len(session['items']) else None
+        if len(parts) != 3 or not current or parts[1] != str(current['id']):
+            # Botón de un mensaje anterior: ignorar
+            return
+
+        session['seen'].add(current['id'])
+        if parts[2] != 'skip':
+            try:
+                category = current['suggestions'][int(parts[2])]
+            except (ValueError, IndexError):
                 return
-            tx_id = int(m.group(1))
-            logger.info('💳 Procesando respuesta para transacción tx_id=%s del usuario=%s', tx_id, user.username)
-            
-            # Categorizar respuesta del usuario
-            logger.debug('🤖 Categorizando respuesta: "%s"', text)
-            category = categorize(text)
-            logger.debug('📁 Categoría asignada: "%s"', category)
-            
-            # Actualizar transacción (la validación de pertenencia debería ocurrir en capa de DB)
-            tx = DatabaseManager.update_transaction_description(tx_id, text, category)
-            if tx:
-                logger.info('✅ Transacción tx_id=%s actualizada - descripción="%s" categoría="%s"', tx_id, text, category)
-                await update.message.reply_text(
-                    f'✅ Transacción #{tx_id} guardada:\n'
-                    f'💬 Descripción: {text}\n'
-                    f'📁 Categoría: {category}'
-                )
-            else:
-                logger.error('❌ Error: transacción tx_id=%s no encontrada en DB o no pertenece al usuario', tx_id)
-                await update.message.reply_text('❌ Error: transacción no encontrada o no autorizada.')
+            session['labels'].append((current['id'], category))
+            session['labelled'] += 1
+        session['index'] += 1
+
+        if len(session['labels']) >= Config.PENDING_LABEL_BATCH:
+            await _flush_pending_labels(flask_app, session)
+        if session['index'] >= len(session['items']):
+            await _flush_pending_labels(flask_app, session)
+            await _load_pending_page(flask_app, session)
+        if not session['items']:
+            context.user_data.pop('pendientes', None)
+            await query.edit_message_text(
+                f"🎉 ¡Listo! No quedan transacciones pendientes ({session['labelled']} etiquetadas)."
+            )
             return
-        
-        # Si no es una respuesta a un mensaje del bot con #id, guiar al usuario
-        logger.debug('💡 Mensaje sin referencia válida a transacción para chat_id=%s', chat_id)
-        await update.message.reply_text(
-            '💡 Para registrar una descripción, responde directamente al mensaje de la transacción que contiene el ID (por ejemplo, #123).'
-        )
+        _schedule_pending_flush(flask_app, session)
+        text, markup = _render_pending(session)
+    await query.edit_message_text(text, reply_markup=markup)
 
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
@@ -152,11 +711,10 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def process_notification_queue(application):
-    """Procesa la cola de notificaciones de forma asíncrona y continua.
+    """Despacha las notificaciones pendientes del outbox.
 
-    Extrae mensajes de `notification_queue` y los envía al usuario con
-    `ForceReply` para facilitar la respuesta directa al mensaje con el
-    identificador de la transacción.
+    Delegado a `notification_dispatcher.run`, que espera eventos del poller
+    (sin polling bloqueante) y revisa periódicamente el outbox para reintentos.
 
     Args:
         application: Instancia de `Application` de python-telegram-bot.
@@ -164,95 +722,143 @@ async def process_notification_queue(application):
     Returns:
         None. Se ejecuta en bucle infinito.
     """
-    while True:
-        try:
-            # Esperar por notificaciones en la cola
-            try:
-                notification_data = notification_queue.get(timeout=1.0)
-            except Empty:
-                await asyncio.sleep(0.1)
-                continue
-            
-            chat_id = notification_data['chat_id']
-            message = notification_data['message']
-            transaction_id = notification_data['transaction_id']
-            
-            logger.debug("📤 Procesando notificación para chat_id=%s tx_id=%s", chat_id, transaction_id)
-            
-            # Enviar mensaje con ForceReply para facilitar la respuesta directa
-            try:
-                await application.bot.send_message(
-                    chat_id=chat_id,
-                    text=message + "\n\n✍️ Responde a ESTE mensaje con la descripción para la transacción #" + str(transaction_id),
-                    reply_markup=ForceReply(selective=True, input_field_placeholder=f"Descripción para #" + str(transaction_id))
-                )
-                logger.info("✅ Notificación enviada exitosamente a chat_id=%s", chat_id)
-            except Exception as e:
-                logger.error("❌ Error enviando mensaje a chat_id=%s: %s", chat_id, e)
-                
-        except Exception as e:
-            logger.error("❌ Error procesando cola de notificaciones: %s", e)
-            await asyncio.sleep(1.0)
+    await notification_dispatcher.run(application)
 
 
 def notify_new_transaction(app, transaction):
-    """Encola una notificación de nueva transacción para un usuario.
+    """Avisa al dispatcher que hay una nueva transacción por notificar.
 
-    Construye un mensaje con la información de la transacción e inserta un
-    registro en `notification_queue` para su envío por el worker asíncrono.
+    La notificación ya quedó persistida en `notification_outbox` por
+    `DatabaseManager.create_pending_transaction`; aquí solo se despierta al
+    dispatcher del bot para que la envíe sin esperar la próxima revisión.
 
     Args:
         app: Instancia de Flask para abrir un contexto de aplicación.
-        transaction: Objeto de transacción con atributos `id`, `date`, `amount`,
-            `merchant`, `type`, `category` y relación `user` con `chat_id`.
+        transaction: Objeto de transacción con relación `user` con `chat_id`.
 
     Returns:
-        None. Si el usuario no tiene `chat_id`, no se encola ninguna notificación.
+        None. Si el usuario no tiene `chat_id`, no hay nada que notificar.
     """
     with app.app_context():
         user = transaction.user
         if not user.chat_id:
             logger.warning('❌ Usuario %s (id=%s) sin chat_id configurado', user.username, user.id)
             return
-        
-        logger.info('📲 Preparando notificación para usuario=%s chat_id=%s tx_id=%s', 
-                       user.username, user.chat_id, transaction.id)
-        
-        # Crear mensaje informativo incluyendo #<id>
-        msg = (
-            f"💳 Nueva transacción detectada (#"+str(transaction.id)+"):\n\n"
-            f"📅 Fecha: {transaction.date.strftime('%d/%m/%Y %H:%M')}\n"
-            f"💰 Monto: ${transaction.amount:,.0f}\n"
-            f"🏪 Comercio: {transaction.merchant or 'No especificado'}\n"
-            f"🔄 Tipo: {transaction.type}\n"
-            f"📁 Categoría sugerida: {transaction.category}\n\n"
-            f"❓ Por favor, escribe una breve descripción de esta transacción:"
-        )
-        
-        logger.debug('📄 Mensaje creado (longitud=%d chars): %s...', 
-                        len(msg), msg[:100])
-        
-        # Agregar a la cola thread-safe
-        notification_data = {
-            'chat_id': user.chat_id,
-            'message': msg,
-            'transaction_id': transaction.id
-        }
-        
+
+        logger.info('📲 Notificación en outbox para usuario=%s chat_id=%s tx_id=%s',
+                    user.username, user.chat_id, transaction.id)
+        notification_dispatcher.wake()
+
+
+async def _skip_processed_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Primer handler (grupo -1) en modo webhook: corta los updates ya procesados.
+
+    Un update se vuelve a entregar si el bot murió antes de marcarlo; si otro
+    bot alcanzó a terminarlo, aquí se descarta.
+    """
+    flask_app = context.application.bot_data['flask_app']
+    if await run_blocking(flask_app, DatabaseManager.is_inbound_update_processed, update.update_id):
+        logger.debug('⏭️ Update %s ya procesado, se omite', update.update_id)
+        context.application.bot_data['inbound_inflight'].discard(update.update_id)
+        raise ApplicationHandlerStop
+
+
+async def _mark_update_processed(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Último handler (grupo 99) en modo webhook: marca el update como procesado.
+
+    PTB sigue con los grupos siguientes aunque un handler falle, así que esto
+    corre tras todos los handlers (con error o sin él).
+    """
+    flask_app = context.application.bot_data['flask_app']
+    context.application.bot_data['inbound_inflight'].discard(update.update_id)
+    await run_blocking(flask_app, DatabaseManager.mark_inbound_update_processed, update.update_id)
+
+
+async def consume_inbound_updates(application):
+    """Entrega a la aplicación los updates que los workers web persistieron.
+
+    En modo webhook la ruta `/telegram/webhook` guarda cada update en
+    `telegram_inbound_updates` (en cualquier worker web); este bucle, en el
+    proceso que tiene el lease del bot, los reclama en orden de `update_id`
+    y los pone en `application.update_queue`. Al terminar sus handlers,
+    `_mark_update_processed` los marca; si el bot muere antes, el reclamo
+    vence y se reintentan. Con la tabla vacía la espera entre consultas se
+    duplica hasta `Config.TELEGRAM_INBOUND_POLL_MAX`.
+
+    Args:
+        application: Instancia de `Application` de python-telegram-bot.
+    """
+    flask_app = application.bot_data['flask_app']
+    inflight = application.bot_data.setdefault('inbound_inflight', set())
+    batch = max(1, Config.TELEGRAM_INBOUND_BATCH)
+    loop = asyncio.get_running_loop()
+    delay = Config.TELEGRAM_INBOUND_POLL_INTERVAL
+    next_purge = loop.time()
+    while True:
+        rows = []
         try:
-            notification_queue.put(notification_data, timeout=1.0)
-            logger.info('✅ Notificación agregada a cola - chat_id=%s tx_id=%s queue_size=%d', 
-                           user.chat_id, transaction.id, notification_queue.qsize())
+            rows = await run_blocking(flask_app, DatabaseManager.claim_inbound_updates,
+                                      batch, Config.TELEGRAM_INBOUND_CLAIM_SECONDS)
+            for update_id, payload in rows:
+                if update_id in inflight:
+                    # Reclamo vencido de un update que aún está en la cola de este proceso
+                    continue
+                try:
+                    update = Update.de_json(json.loads(payload), application.bot)
+                except Exception as e:
+                    logger.error('❌ Update de Telegram %s inválido, se descarta: %s', update_id, e)
+                    await run_blocking(flask_app, DatabaseManager.mark_inbound_update_processed, update_id)
+                    continue
+                inflight.add(update_id)
+                await application.update_queue.put(update)
+            if loop.time() >= next_purge:
+                next_purge = loop.time() + 3600
+                purged = await run_blocking(flask_app, DatabaseManager.purge_inbound_updates,
+                                            Config.TELEGRAM_INBOUND_RETENTION)
+                if purged:
+                    logger.info('🧹 %d update(s) del webhook procesados eliminados', purged)
         except Exception as e:
-            logger.error('❌ Error agregando notificación a cola para chat_id=%s: %s', 
-                           user.chat_id, e)
+            logger.error('❌ Error leyendo updates del webhook: %s', e)
+        if len(rows) >= batch:
+            continue
+        delay = Config.TELEGRAM_INBOUND_POLL_INTERVAL if rows else min(delay * 2, Config.TELEGRAM_INBOUND_POLL_MAX)
+        await asyncio.sleep(delay)
+
+
+def stop_bot(app, thread, timeout=30):
+    """Detiene de forma ordenada el bot arrancado con `build_and_run_bot`.
+
+    Pide al loop del bot que termine (deja de recibir updates, espera los
+    envíos en curso y cierra la aplicación) y espera a que el hilo termine.
+    No retorna mientras el hilo siga vivo, para no arrancar una segunda
+    instancia en el mismo proceso.
+
+    Args:
+        app: Instancia de Flask donde corre el bot.
+        thread: Hilo retornado por `build_and_run_bot`.
+        timeout: Segundos entre avisos mientras se espera el hilo.
+    """
+    loop, stop_event = app.config.get('TELEGRAM_LOOP'), app.config.get('TELEGRAM_STOP')
+    if loop is not None and stop_event is not None:
+        try:
+            loop.call_soon_threadsafe(stop_event.set)
+        except RuntimeError:
+            # Loop ya cerrado: el hilo está terminando
+            pass
+    while thread is not None and thread.is_alive():
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning('⏳ El bot de Telegram aún no se detiene; esperando...')
 
 
 def build_and_run_bot(app):
     """Inicializa el bot de Telegram y lo ejecuta en un hilo daemon.
 
-    Crea la aplicación de Telegram, registra handlers, inicia el polling y
-    arranca una tarea asíncrona para procesar la cola de notificaciones.
+    Crea la aplicación de Telegram, registra handlers, inicia el polling (o
+    registra el webhook si `Config.TELEGRAM_WEBHOOK_URL` está definido y
+    consume los updates que persisten los workers web) y arranca una tarea
+    asíncrona para procesar la cola de notificaciones. Se detiene con
+    `stop_bot`.
 
     Args:
         app: Instancia de Flask para compartir contexto con el bot.
@@ -265,6 +871,10 @@ def build_and_run_bot(app):
     if not token:
         logger.warning('❌ TELEGRAM_BOT_TOKEN no configurado')
         return None
+    webhook_url = Config.TELEGRAM_WEBHOOK_URL
+    if webhook_url and not Config.TELEGRAM_WEBHOOK_SECRET:
+        logger.error('❌ TELEGRAM_WEBHOOK_URL requiere TELEGRAM_WEBHOOK_SECRET; se usará polling')
+        webhook_url = None
     
     logger.info('🚀 Configurando bot de Telegram...')
     
@@ -285,39 +895,81 @@ def build_and_run_bot(app):
             finalice.
             """
             logger.info('🔧 Inicializando aplicación Telegram...')
-            application = ApplicationBuilder().token(token).build()
+            builder = (
+                ApplicationBuilder()
+                .token(token)
+                .concurrent_updates(max(1, Config.BOT_CONCURRENT_UPDATES))
+            )
+            if Config.TELEGRAM_API_BASE_URL:
+                builder = builder.base_url(Config.TELEGRAM_API_BASE_URL)
+            if webhook_url:
+                # Sin Updater: los updates llegan por la ruta /telegram/webhook (vía la DB)
+                builder = builder.updater(None)
+            application = builder.build()
             application.bot_data['flask_app'] = app
             
             # Registrar handlers
             application.add_handler(CommandHandler('start', start))
+            application.add_handler(CommandHandler('pendientes', pendientes))
+            application.add_handler(CallbackQueryHandler(handle_pending_callback, pattern=r'^pend:'))
             application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
             application.add_error_handler(error_handler)
+            if webhook_url:
+                # Updates del webhook: saltar los ya procesados y marcar los terminados
+                application.add_handler(TypeHandler(Update, _skip_processed_update), group=-1)
+                application.add_handler(TypeHandler(Update, _mark_update_processed), group=99)
             
-            # Guardar referencia en la app
+            # Guardar referencias en la app (stop_bot las usa)
+            stop_event = asyncio.Event()
             app.config['TELEGRAM_APP'] = application
+            app.config['TELEGRAM_LOOP'] = asyncio.get_running_loop()
+            app.config['TELEGRAM_STOP'] = stop_event
             
             logger.info('🤖 Iniciando bot de Telegram...')
             
             # Iniciar procesamiento de cola en paralelo
             logger.info('📤 Iniciando procesador de cola de notificaciones...')
-            queue_task = asyncio.create_task(process_notification_queue(application))
+            tasks = [asyncio.create_task(process_notification_queue(application))]
             
             try:
-                # Iniciar polling
-                logger.info('🔄 Iniciando polling de Telegram...')
                 await application.initialize()
                 await application.start()
-                await application.updater.start_polling()
+                if webhook_url:
+                    logger.info('🔗 Registrando webhook de Telegram...')
+                    await application.bot.set_webhook(
+                        url=webhook_url,
+                        secret_token=Config.TELEGRAM_WEBHOOK_SECRET,
+                        allowed_updates=Update.ALL_TYPES,
+                    )
+                    tasks.append(asyncio.create_task(consume_inbound_updates(application)))
+                else:
+                    # Iniciar polling
+                    logger.info('🔄 Iniciando polling de Telegram...')
+                    await application.updater.start_polling()
                 
                 logger.info('✅ Bot de Telegram iniciado correctamente')
                 
-                # Mantener corriendo
-                await queue_task
+                # Mantener corriendo hasta stop_bot (o hasta que falle una tarea)
+                stop_task = asyncio.create_task(stop_event.wait())
+                tasks.append(stop_task)
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task is not stop_task and task.exception():
+                        raise task.exception()
                 
             except Exception as e:
                 logger.exception('❌ Error en bot de Telegram: %s', e)
             finally:
                 logger.info('🔄 Deteniendo bot de Telegram...')
+                app.config.pop('TELEGRAM_LOOP', None)
+                app.config.pop('TELEGRAM_STOP', None)
+                app.config.pop('TELEGRAM_APP', None)
+                if application.updater and application.updater.running:
+                    await application.updater.stop()
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await notification_dispatcher.drain(timeout=10)
                 await application.stop()
                 await application.shutdown()
                 logger.info('✅ Bot de Telegram detenido')
@@ -334,7 +986,7 @@ def build_and_run_bot(app):
     
     # Ejecutar en hilo daemon
     logger.info('🧵 Iniciando hilo del bot de Telegram...')
-    bot_thread = Thread(target=_run_bot, daemon=True)
+    bot_thread = Thread(target=_run_bot, daemon=True, name='telegram-bot')
     bot_thread.start()
     
     return bot_thread
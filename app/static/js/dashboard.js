@@ -1,7 +1,16 @@
 document.addEventListener('DOMContentLoaded', () => {
   function hashString(s){ let h = 0; for(let i=0;i<s.length;i++){ h = ((h<<5)-h) + s.charCodeAt(i); h|=0; } return h; }
   function colorForCategory(cat){ const hue = Math.abs(hashString(cat||'')) % 360; return `hsl(${hue} 70% 55%)`; }
-  function peso(v){ try{ return new Intl.NumberFormat('es-CL', {style:'currency', currency:'CLP', maximumFractionDigits:0}).format(v||0);}catch{ return v; } }
+  // Moneda por defecto y decimales por moneda (ISO 4217) entregados por el servidor
+  const totalBox = document.getElementById('total');
+  const DEFAULT_CURRENCY = totalBox?.dataset.currency || 'CLP';
+  const EXPONENTS = JSON.parse(totalBox?.dataset.exponents || '{}');
+  function exponent(cur){ return EXPONENTS[cur] ?? 2; }
+  // Formatea un monto en unidades menores (entero) en su moneda
+  function money(minor, cur=DEFAULT_CURRENCY){
+    const exp = exponent(cur); const v = (minor||0) / Math.pow(10, exp);
+    try{ return new Intl.NumberFormat('es-CL', {style:'currency', currency:cur, minimumFractionDigits:exp, maximumFractionDigits:exp}).format(v);}catch{ return `${v.toFixed(exp)} ${cur}`; }
+  }
 
   async function fetchTx(){
     const fromFilters = (window.Filters?.getQueryString && window.Filters.getQueryString()) || '';
@@ -23,7 +32,7 @@ document.addEventListener('DOMContentLoaded', () => {
       const left = document.createElement('div'); left.className = 'd-flex align-items-center gap-2';
       const swatch = document.createElement('span'); swatch.style.cssText = `display:inline-block;width:12px;height:12px;border-radius:50%;background:${colors[i]}`;
       const name = document.createElement('span'); name.textContent = lab;
-      const val = document.createElement('span'); val.textContent = peso(values[i]);
+      const val = document.createElement('span'); val.textContent = money(values[i]);
       left.appendChild(swatch); left.appendChild(name);
       item.appendChild(left); item.appendChild(val);
       el.appendChild(item);
@@ -31,18 +40,32 @@ document.addEventListener('DOMContentLoaded', () => {
   }
 
   async function render(){
-    const data = await fetchTx();
-    const total = data.reduce((s,t)=> s + (t.amount||0), 0);
-    const totalEl = document.getElementById('total'); if(totalEl) totalEl.textContent = peso(total);
+    // Sumas exactas en enteros (amount_minor) por moneda; los gráficos usan la moneda por defecto
+    const all = await fetchTx();
+    const currencyOf = t => t.currency || DEFAULT_CURRENCY;
+    const minor = t => (t.amount_minor ?? Math.round((t.amount||0) * Math.pow(10, exponent(currencyOf(t)))));
+    const data = all.filter(t=> currencyOf(t) === DEFAULT_CURRENCY);
+    const total = data.reduce((s,t)=> s + minor(t), 0);
+    if(totalBox) totalBox.textContent = money(total);
+
+    // Otras monedas: total por moneda, fuera de los gráficos
+    const others = {};
+    all.forEach(t=>{ const c = currencyOf(t); if(c !== DEFAULT_CURRENCY){ others[c] = others[c] || {sum:0, n:0}; others[c].sum += minor(t); others[c].n++; } });
+    const othersEl = document.getElementById('other-currencies');
+    if(othersEl){
+      const parts = Object.keys(others).sort().map(c=> `${money(others[c].sum, c)} (${others[c].n})`);
+      othersEl.textContent = parts.length ? `Otras monedas, no incluidas en los gráficos: ${parts.join(' · ')}` : '';
+    }
 
     const byCat = {};
-    data.forEach(t=>{ const c=(t.category||'otros').toLowerCase(); byCat[c]=(byCat[c]||0)+(t.amount||0); });
+    data.forEach(t=>{ const c=(t.category||'otros').toLowerCase(); byCat[c]=(byCat[c]||0)+minor(t); });
     const labels = Object.keys(byCat);
     const values = labels.map(k=> byCat[k]);
+    const major = values.map(v=> v / Math.pow(10, exponent(DEFAULT_CURRENCY)));
     const colors = labels.map(cat=> colorForCategory(cat));
 
-    const barCfg = { type:'bar', data:{ labels, datasets:[{ label:'CLP', data: values, backgroundColor: colors }]}, options:{ responsive:true, maintainAspectRatio:false, plugins:{ legend:{ display:false } } } };
-    const pieCfg = { type:'doughnut', data:{ labels, datasets:[{ data: values, backgroundColor: colors }]}, options:{ responsive:true, maintainAspectRatio:false, plugins:{ legend:{ display:false } } } };
+    const barCfg = { type:'bar', data:{ labels, datasets:[{ label:DEFAULT_CURRENCY, data: major, backgroundColor: colors }]}, options:{ responsive:true, maintainAspectRatio:false, plugins:{ legend:{ display:false } } } };
+    const pieCfg = { type:'doughnut', data:{ labels, datasets:[{ data: major, backgroundColor: colors }]}, options:{ responsive:true, maintainAspectRatio:false, plugins:{ legend:{ display:false } } } };
 
     const barCanvas = document.getElementById('catChart');
     const pieCanvas = document.getElementById('pieChart');
@@ -39,15 +39,54 @@ document.addEventListener('DOMContentLoaded', () => {
       ts // hidden timestamp for proper sorting
     ];
   }
-  async function saveChange(id, field, value){
+  // Ediciones en cola: se envían juntas a /api/transactions/bulk_update (un commit)
+  const pending = new Map();
+  let flushTimer = null;
+  function saveChange(id, field, value){
+    pending.set(id, Object.assign(pending.get(id) || {id}, {[field]: value}));
+    clearTimeout(flushTimer);
+    flushTimer = setTimeout(flushChanges, 800);
+  }
+  async function flushChanges(keepalive){
+    clearTimeout(flushTimer);
+    if(!pending.size) return;
+    const changes = Array.from(pending.values());
+    pending.clear();
     try{
-      const res = await fetch('/api/update_transaction', {
-        method:'POST', headers:{'Content-Type':'application/json'},
-        body: JSON.stringify({id, [field]: value})
+      const res = await fetch('/api/transactions/bulk_update', {
+        method:'POST', headers:{'Content-Type':'application/json'}, keepalive: !!keepalive,
+        body: JSON.stringify({changes})
       });
       if(res.status === 401){ window.location = '/login'; return; }
-      if(!res.ok){ showErr('No se pudo guardar el cambio.'); }
-    }catch(e){ showErr('No se pudo guardar el cambio.'); }
+      if(!res.ok){ showErr('No se pudieron guardar los cambios.'); return; }
+      const out = await res.json();
+      const failed = (out.results||[]).filter(r=> !r.ok);
+      if(failed.length){ showErr(`No se guardaron ${failed.length} cambio(s): ` + failed.map(r=> `#${r.id} ${r.error}`).join(', ')); }
+    }catch(e){ showErr('No se pudieron guardar los cambios.'); }
+  }
+  document.addEventListener('visibilitychange', ()=>{ if(document.visibilityState === 'hidden') flushChanges(true); });
+  async function postRecategorize(body){
+    const qs = (window.Filters?.getQueryString && window.Filters.getQueryString()) || '';
+    const res = await fetch('/api/transactions/recategorize' + (qs? ('?' + qs) : ''), {
+      method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(body)
+    });
+    if(res.status === 401){ window.location = '/login'; return null; }
+    if(!res.ok) throw new Error('HTTP ' + res.status);
+    return await res.json();
+  }
+  async function recategorizeFiltered(){
+    const category = (window.prompt('Nueva categoría para todas las transacciones que calzan con los filtros actuales:')||'').trim();
+    if(!category) return;
+    try{
+      await flushChanges();
+      // El servidor cuenta todas las que calzan (la tabla está limitada a 2000 filas)
+      const preview = await postRecategorize({category, dry_run: true});
+      if(!preview) return;
+      if(!preview.matched){ window.alert('Ninguna transacción calza con los filtros actuales.'); return; }
+      if(!window.confirm(`Se asignará "${category}" a ${preview.matched} transacción(es) que calzan con los filtros. ¿Continuar?`)) return;
+      if(!await postRecategorize({category})) return;
+      await reload();
+    }catch(e){ showErr('No se pudo recategorizar.'); }
   }
   async function reload(){
     const data = await fetchData();
@@ -83,6 +122,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
       ]
     });
+    document.getElementById('recategorizeBtn')?.addEventListener('click', recategorizeFiltered);
     // Inline editing for category & description
     $('#txTable tbody').on('dblclick','td', function(){
       const cell = table.cell(this);
@@ -98,7 +138,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if(e.type==='blur' || e.key==='Enter'){
           const val = input.val();
           cell.data(val).draw();
-          await saveChange(id, idx===4?'category':'description', val);
+          saveChange(id, idx===4?'category':'description', val);
         }
       });
     });
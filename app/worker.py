@@ -0,0 +1,67 @@
+"""Proceso de servicios en segundo plano (bot de Telegram y poller de correos).
+
+Uso:
+  python -m app.worker            # bot + poller
+  python -m app.worker poller     # solo poller de correos
+  python -m app.worker bot        # solo bot de Telegram (polling o webhook)
+
+Se pueden correr varios workers a la vez: las cuentas se reparten entre
+los pollers vivos (`account.id % N`) y solo el worker que tome el lease
+`telegram-bot` ejecuta el bot; el resto queda en standby y lo reemplaza si
+muere (ver `app.services.coordination`).
+
+El bot corre aquí en ambos modos: en modo webhook (`TELEGRAM_WEBHOOK_URL`)
+los workers web (`app.wsgi`) persisten los updates y el bot los consume de
+la DB.
+
+Las métricas del worker (poller, LLM, bot, outbox, leases) viven en este
+proceso y no aparecen en el `/metrics` del servidor web: se exponen en
+`http://WORKER_METRICS_HOST:WORKER_METRICS_PORT/metrics` (default
+127.0.0.1:9101, 0 desactiva), con el mismo acceso que `/metrics`
+(`METRICS_TOKEN` o `METRICS_ALLOWED_IPS`).
+"""
+import argparse
+import logging
+import time
+
+from .config import Config
+from .factory import create_app, start_background_services
+from .services.metrics import start_http_server
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ejecuta el bot de Telegram y/o el poller de correos')
+    parser.add_argument('service', nargs='?', choices=('all', 'poller', 'bot'), default='all',
+                        help='Servicio a ejecutar (default: all)')
+    args = parser.parse_args(argv)
+
+    bot = args.service in ('all', 'bot')
+    poller = args.service in ('all', 'poller')
+
+    app = create_app()
+    threads = start_background_services(app, bot=bot, poller=poller)
+    if not threads:
+        raise SystemExit('No hay servicios que ejecutar (¿falta TELEGRAM_BOT_TOKEN?)')
+    logger.info('👷 Worker en ejecución: %s', ', '.join(t.name for t in threads))
+
+    if Config.WORKER_METRICS_PORT:
+        try:
+            start_http_server(Config.WORKER_METRICS_HOST, Config.WORKER_METRICS_PORT,
+                              Config.METRICS_TOKEN, Config.METRICS_ALLOWED_IPS)
+            logger.info('📈 Métricas del worker en http://%s:%s/metrics',
+                        Config.WORKER_METRICS_HOST, Config.WORKER_METRICS_PORT)
+        except OSError as e:
+            logger.error('❌ No se pudo abrir el puerto de métricas %s: %s', Config.WORKER_METRICS_PORT, e)
+
+    try:
+        # Los hilos son daemon: el proceso principal se mantiene vivo mientras alguno siga corriendo
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info('🛑 Worker detenido')
+
+
+if __name__ == '__main__':
+    main()
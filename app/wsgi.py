@@ -0,0 +1,10 @@
+"""Entry point WSGI del servidor web (p.ej. `gunicorn app.wsgi:app`).
+
+No arranca servicios: el bot y el poller corren aparte con
+`python -m app.worker`. En modo webhook cualquier worker WSGI recibe el
+update en `/telegram/webhook` y lo persiste en la DB; el worker que tiene el
+lease `telegram-bot` lo consume desde ahí.
+"""
+from .factory import create_app
+
+app = create_app()
@@ -0,0 +1,33 @@
+"""Entorno de Alembic de la app.
+
+La conexión la entrega `app.services.migrations` (misma configuración de
+motor que la app, PRAGMA de SQLite incluidos); usar
+`python -m app.scripts.migrate` en vez del comando `alembic`.
+"""
+from alembic import context
+
+from app import models  # noqa: F401  (registra las tablas en la metadata)
+from app.services.database import db
+
+config = context.config
+
+
+def run_migrations_online():
+    connection = config.attributes.get('connection')
+    if connection is None:
+        raise RuntimeError('Ejecutar las migraciones con `python -m app.scripts.migrate`')
+    context.configure(
+        connection=connection,
+        target_metadata=db.metadata,
+        # SQLite no soporta ALTER de columnas: autogenerate emite batch_alter_table
+        render_as_batch=connection.dialect.name == 'sqlite',
+        compare_type=True,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    raise RuntimeError('El modo offline (--sql) no está soportado: las revisiones inspeccionan la base')
+run_migrations_online()
@@ -0,0 +1,109 @@
+"""Esquema base (accounts, users, transaction, outbox, telegram_messages, worker_leases)
+
+Idempotente: crea solo las tablas, columnas e índices que falten, para
+adoptar bases creadas antes con `db.create_all()`.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tables():
+    return {
+        'accounts': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('imap_host', sa.String(255), nullable=False),
+            sa.Column('imap_user_encrypted', sa.LargeBinary(), nullable=False),
+            sa.Column('imap_password_encrypted', sa.LargeBinary(), nullable=False),
+            sa.Column('enabled', sa.Boolean(), nullable=False, server_default=sa.text('1')),
+            sa.Column('last_checked', sa.DateTime(timezone=True), server_default=sa.text("'2025-08-01 00:00:00'")),
+            sa.Column('created_at', sa.DateTime(timezone=True)),
+        ],
+        'users': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(80), nullable=False),
+            sa.Column('password_hash', sa.LargeBinary(), nullable=False),
+            sa.Column('account_id', sa.Integer(), sa.ForeignKey('accounts.id'), nullable=False),
+            sa.Column('chat_id', sa.String(50)),
+            sa.Column('created_at', sa.DateTime(timezone=True)),
+        ],
+        'transaction': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('date', sa.DateTime(timezone=True)),
+            sa.Column('amount', sa.Float(), nullable=False),
+            sa.Column('merchant', sa.String(255)),
+            sa.Column('type', sa.String(50)),
+            sa.Column('description', sa.Text()),
+            sa.Column('category', sa.String(100)),
+            sa.Column('raw_email_id', sa.String(255), unique=True),
+            sa.Column('created_at', sa.DateTime(timezone=True)),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        ],
+        'notification_outbox': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('transaction_id', sa.Integer(), sa.ForeignKey('transaction.id'), nullable=False),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('chat_id', sa.String(50), nullable=False),
+            sa.Column('status', sa.String(20), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('last_error', sa.Text()),
+            sa.Column('created_at', sa.DateTime(timezone=True)),
+            sa.Column('sent_at', sa.DateTime(timezone=True)),
+        ],
+        'telegram_messages': [
+            sa.Column('chat_id', sa.String(50), primary_key=True),
+            sa.Column('message_id', sa.BigInteger(), primary_key=True, autoincrement=False),
+            sa.Column('transaction_id', sa.Integer(), sa.ForeignKey('transaction.id'), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True)),
+        ],
+        'worker_leases': [
+            sa.Column('name', sa.String(100), primary_key=True),
+            sa.Column('holder', sa.String(255), nullable=False),
+            sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=False),
+        ],
+    }
+
+
+# (nombre, tabla, columnas, unique)
+_INDEXES = [
+    ('ix_users_username', 'users', ['username'], True),
+    ('ix_users_chat_id', 'users', ['chat_id'], True),
+    ('ix_transaction_date', 'transaction', ['date'], False),
+    ('ix_transaction_user_id', 'transaction', ['user_id'], False),
+    ('ix_notification_outbox_transaction_id', 'notification_outbox', ['transaction_id'], False),
+    ('ix_notification_outbox_status_next', 'notification_outbox', ['status', 'next_attempt_at'], False),
+    ('ix_telegram_messages_transaction_id', 'telegram_messages', ['transaction_id'], False),
+    ('ix_worker_leases_expires_at', 'worker_leases', ['expires_at'], False),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = set(inspector.get_table_names())
+
+    for name, columns in _tables().items():  # orden de dependencias (FK)
+        if name not in existing:
+            op.create_table(name, *columns)
+
+    # Bases muy antiguas: `accounts.enabled` se agregó después de la tabla
+    if 'accounts' in existing and 'enabled' not in {c['name'] for c in inspector.get_columns('accounts')}:
+        with op.batch_alter_table('accounts') as batch:
+            batch.add_column(sa.Column('enabled', sa.Boolean(), nullable=False, server_default=sa.text('1')))
+
+    for name, table, columns, unique in _INDEXES:
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True)
+
+
+def downgrade():
+    for name in reversed(list(_tables())):
+        op.drop_table(name)
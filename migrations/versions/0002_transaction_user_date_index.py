@@ -0,0 +1,24 @@
+"""Índice compuesto (user_id, date) en transaction
+
+Los listados (`get_transactions_for_user`, pendientes) filtran por usuario y
+ordenan o acotan por fecha; con índices separados SQLite elige uno y ordena
+el resto en memoria.
+
+Revision ID: 0002_transaction_user_date
+Revises: 0001_baseline
+Create Date: 2026-10-19
+"""
+from app.services.migrations import create_index_online, drop_index_online
+
+revision = '0002_transaction_user_date'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index_online('ix_transaction_user_date', 'transaction', ['user_id', 'date'])
+
+
+def downgrade():
+    drop_index_online('ix_transaction_user_date', 'transaction')
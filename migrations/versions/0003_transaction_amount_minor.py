@@ -0,0 +1,67 @@
+"""Montos en unidades menores (BigInteger) más moneda en transaction
+
+Reemplaza `amount` (Float) por `amount_minor` + `currency`. Las filas
+existentes son CLP (sin decimales): `amount_minor = ROUND(amount)`.
+
+Revision ID: 0003_transaction_amount_minor
+Revises: 0002_transaction_user_date
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003_transaction_amount_minor'
+down_revision = '0002_transaction_user_date'
+branch_labels = None
+depends_on = None
+
+# Filas por UPDATE al copiar montos (acota la duración de cada sentencia)
+BATCH_SIZE = 5000
+
+# Copia fija de money.CURRENCY_EXPONENTS al escribir esta revisión: la
+# migración no debe cambiar si la tabla de la app cambia después
+CURRENCY_EXPONENTS = {
+    'CLP': 0, 'JPY': 0, 'KRW': 0, 'PYG': 0, 'ISK': 0,
+    'CLF': 4, 'BHD': 3, 'KWD': 3, 'OMR': 3, 'TND': 3,
+}
+
+
+def _to_major_sql():
+    """CASE que divide `amount_minor` por 10**exponente de cada moneda (2 si no está listada)."""
+    by_exp = {}
+    for code, exp in sorted(CURRENCY_EXPONENTS.items()):
+        by_exp.setdefault(exp, []).append(f"'{code}'")
+    whens = ' '.join(f"WHEN currency IN ({', '.join(codes)}) THEN amount_minor / {10 ** exp:.1f}"
+                     for exp, codes in sorted(by_exp.items()) if exp != 2)
+    return f'CASE {whens} ELSE amount_minor / 100.0 END'
+
+
+def _backfill(bind, assignment, where):
+    max_id = bind.execute(sa.text('SELECT MAX(id) FROM "transaction"')).scalar() or 0
+    for low in range(0, max_id + 1, BATCH_SIZE):
+        bind.execute(sa.text(f'UPDATE "transaction" SET {assignment} WHERE id >= :low AND id < :high AND {where}'),
+                     {'low': low, 'high': low + BATCH_SIZE})
+
+
+def upgrade():
+    with op.batch_alter_table('transaction') as batch:
+        batch.add_column(sa.Column('amount_minor', sa.BigInteger(), nullable=True))
+        batch.add_column(sa.Column('currency', sa.String(3), nullable=False, server_default='CLP'))
+
+    _backfill(op.get_bind(), 'amount_minor = CAST(ROUND(COALESCE(amount, 0)) AS BIGINT)', 'amount_minor IS NULL')
+
+    with op.batch_alter_table('transaction') as batch:
+        batch.alter_column('amount_minor', existing_type=sa.BigInteger(), nullable=False)
+        batch.drop_column('amount')
+
+
+def downgrade():
+    with op.batch_alter_table('transaction') as batch:
+        batch.add_column(sa.Column('amount', sa.Float(), nullable=True))
+
+    _backfill(op.get_bind(), f'amount = {_to_major_sql()}', 'amount IS NULL')
+
+    with op.batch_alter_table('transaction') as batch:
+        batch.alter_column('amount', existing_type=sa.Float(), nullable=False)
+        batch.drop_column('currency')
+        batch.drop_column('amount_minor')
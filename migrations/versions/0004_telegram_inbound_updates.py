@@ -0,0 +1,30 @@
+"""Tabla telegram_inbound_updates (updates del webhook pendientes)
+
+Los workers web persisten cada update recibido por `/telegram/webhook` y el
+bot líder (`app.worker`) los consume, en vez de exigir que el update llegue
+justo al proceso que ejecuta el bot.
+
+Revision ID: 0004_telegram_inbound_updates
+Revises: 0003_transaction_amount_minor
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004_telegram_inbound_updates'
+down_revision = '0003_transaction_amount_minor'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'telegram_inbound_updates',
+        sa.Column('update_id', sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('received_at', sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade():
+    op.drop_table('telegram_inbound_updates')
@@ -0,0 +1,27 @@
+"""Columna labelled_at en transaction (etiquetado desde /pendientes)
+
+/pendientes solo asigna la categoría; `labelled_at` marca que el usuario
+la confirmó, para sacar la transacción de las pendientes sin tocar
+`description`.
+
+Revision ID: 0005_transaction_labelled_at
+Revises: 0004_telegram_inbound_updates
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005_transaction_labelled_at'
+down_revision = '0004_telegram_inbound_updates'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transaction') as batch:
+        batch.add_column(sa.Column('labelled_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('transaction') as batch:
+        batch.drop_column('labelled_at')
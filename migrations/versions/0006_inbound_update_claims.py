@@ -0,0 +1,31 @@
+"""Lease y marca de procesado en telegram_inbound_updates
+
+El bot reclama cada update con `claimed_until` y lo marca en `processed_at`
+al terminar los handlers, en vez de borrarlo al encolarlo: un update no se
+pierde si el bot muere a mitad, ni se procesa dos veces.
+
+Revision ID: 0006_inbound_update_claims
+Revises: 0005_transaction_labelled_at
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006_inbound_update_claims'
+down_revision = '0005_transaction_labelled_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('telegram_inbound_updates') as batch:
+        batch.add_column(sa.Column('claimed_until', sa.DateTime(timezone=True), nullable=True))
+        batch.add_column(sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True))
+        batch.create_index('ix_telegram_inbound_updates_processed_at', ['processed_at'])
+
+
+def downgrade():
+    with op.batch_alter_table('telegram_inbound_updates') as batch:
+        batch.drop_index('ix_telegram_inbound_updates_processed_at')
+        batch.drop_column('processed_at')
+        batch.drop_column('claimed_until')